@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+MyCV-Platform Auto Tuner
+Sweeps inference settings on this machine and keeps the fastest one within a latency budget as its run profile
+"""
+
+import os
+import json
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Sequence, Set
+
+from app.utils.environment_detector import EnvironmentDetector
+from app.utils.model_backends import compare_detections
+
+PROFILE_VERSION = 1
+MACHINE_PROFILE_PATH = "data/profiles/machine_profile.json"
+
+# Run settings (argparse destinations) a profile sets
+PROFILE_SETTINGS = ('torch_threads', 'batch_size', 'imgsz', 'backend')
+
+# Of those, the ones only valid for the detector they were measured on;
+# the rest apply to the whole process
+MODEL_SETTINGS = ('imgsz', 'backend')
+
+
+def thread_candidates(cpu_threads: int) -> List[int]:
+    """Powers of two up to the machine's thread count, plus the count itself"""
+    candidates = []
+    threads = 1
+    while threads < cpu_threads:
+        candidates.append(threads)
+        threads *= 2
+    candidates.append(max(1, cpu_threads))
+    return candidates
+
+
+def detection_agreement(reference: Sequence[List[Dict[str, Any]]],
+                        candidate: Sequence[List[Dict[str, Any]]], iou_threshold: float = 0.5) -> float:
+    """Share of boxes matched between two runs over the same frames (1.0 when both find nothing)"""
+    matched = 0
+    total = 0
+    for ref, cand in zip(reference, candidate):
+        matched += compare_detections(ref, cand, iou_threshold, confidence_tolerance=1.0)['matched']
+        total += max(len(ref), len(cand))
+    return matched / total if total else 1.0
+
+
+def select_config(measurements: List[Dict[str, Any]], latency_budget_ms: float,
+                  min_agreement: float) -> Optional[Dict[str, Any]]:
+    """Highest-throughput measurement whose batch latency fits the budget
+
+    Measurements below min_agreement with the reference detections are
+    never picked. When none fits the budget, the lowest latency wins.
+    """
+    eligible = [m for m in measurements if m['agreement'] is None or m['agreement'] >= min_agreement]
+    within_budget = [m for m in eligible if m['latency_ms'] <= latency_budget_ms]
+    if within_budget:
+        return max(within_budget, key=lambda m: m['images_per_sec'])
+    return min(eligible, key=lambda m: m['latency_ms']) if eligible else None
+
+
+def load_profile(path: str, fingerprint: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """The saved profile, or None when missing, outdated or tuned on different hardware"""
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'r') as f:
+            profile = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if profile.get('version') != PROFILE_VERSION or profile.get('fingerprint') != fingerprint:
+        return None
+    return profile
+
+
+def save_profile(path: str, profile: Dict[str, Any]) -> None:
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(profile, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def explicit_settings(parser, argv: Sequence[str]) -> Set[str]:
+    """Profile settings given in argv, however spelled (--opt value, --opt=value, abbreviations)
+
+    argv is parsed a second time with every profile setting defaulting to a
+    sentinel; whatever no longer holds the sentinel was given explicitly.
+    """
+    sentinel = object()
+    defaults = {name: parser.get_default(name) for name in PROFILE_SETTINGS}
+    parser.set_defaults(**{name: sentinel for name in PROFILE_SETTINGS})
+    try:
+        parsed, _ = parser.parse_known_args(argv)
+    finally:
+        parser.set_defaults(**defaults)
+    return {name for name in PROFILE_SETTINGS if getattr(parsed, name, sentinel) is not sentinel}
+
+
+def apply_profile(args, settings: Dict[str, Any], parser, argv: Sequence[str], model: str) -> Dict[str, Any]:
+    """Copy profile settings onto parsed args, except those given on the command line
+
+    MODEL_SETTINGS only go to args.model_settings[model], the detector the
+    profile was tuned on; other detectors keep the command line values.
+    """
+    given = explicit_settings(parser, argv)
+    model_settings = dict(getattr(args, 'model_settings', {}).get(model, {}))
+    applied = {}
+    for name in PROFILE_SETTINGS:
+        if settings.get(name) is None or name in given:
+            continue
+        if name in MODEL_SETTINGS:
+            model_settings[name] = settings[name]
+        else:
+            setattr(args, name, settings[name])
+        applied[name] = settings[name]
+    args.model_settings = dict(getattr(args, 'model_settings', {}), **{model: model_settings})
+    return applied
+
+
+class AutoTuner:
+    """Times a detector over a grid of backend, input size, thread count and batch size
+
+    Timing runs on EnvironmentDetector.mock_frames, so it needs no test
+    images. When real frames are given, every (backend, input size) is
+    also checked against the reference setting's detections on them, so a
+    resolution or backend that is fast but finds different objects is not
+    picked.
+    """
+
+    def __init__(self, detector: Optional[EnvironmentDetector] = None, latency_budget_ms: float = 500.0,
+                 min_agreement: float = 0.9):
+        self.detector = detector or EnvironmentDetector()
+        self.latency_budget_ms = latency_budget_ms
+        self.min_agreement = min_agreement
+
+    def measure(self, model, infer: Callable[[Any, List[Any], int], Any], frames: List[Any], imgsz: int,
+                batch_size: int) -> Dict[str, float]:
+        """Throughput and slowest batch latency of infer(model, batch, imgsz) over the frames"""
+        batches = [frames[i:i + batch_size] for i in range(0, len(frames), batch_size)]
+        # Warm up so backend setup and the first-shape allocation are not timed
+        infer(model, batches[0], imgsz)
+
+        latencies = []
+        start = time.perf_counter()
+        for batch in batches:
+            batch_start = time.perf_counter()
+            infer(model, batch, imgsz)
+            latencies.append(time.perf_counter() - batch_start)
+        elapsed = time.perf_counter() - start
+        return {
+            'images_per_sec': len(frames) / elapsed if elapsed > 0 else 0.0,
+            'latency_ms': max(latencies) * 1000
+        }
+
+    def sweep(self, load_model: Callable[[str], Any], infer: Callable[[Any, List[Any], int], Any],
+              backends: Sequence[str], imgsz_values: Sequence[int], threads: Sequence[int],
+              batch_sizes: Sequence[int], detect: Optional[Callable[[Any, List[Any], int], List[Any]]] = None,
+              reference_frames: Optional[List[Any]] = None,
+              reference: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """One measurement per configuration; backends that fail to load are skipped
+
+        reference ({'backend', 'imgsz'}) names the setting whose detections
+        on reference_frames the others are compared with. Thread counts are
+        only swept for the 'pytorch' backend; other backends are measured
+        once per batch size with torch_threads None.
+        """
+        import torch
+
+        frames = self.detector.mock_frames(max(2, 2 * max(batch_sizes)))
+        check = detect is not None and bool(reference_frames) and reference is not None
+        expected = None
+        if check:
+            expected = detect(load_model(reference['backend']), reference_frames, reference['imgsz'])
+
+        original_threads = torch.get_num_threads()
+        measurements = []
+        try:
+            for backend in backends:
+                try:
+                    model = load_model(backend)
+                except Exception as e:
+                    measurements.append({'backend': backend, 'error': str(e)})
+                    continue
+
+                for imgsz in imgsz_values:
+                    agreement = None
+                    if check:
+                        agreement = detection_agreement(expected, detect(model, reference_frames, imgsz))
+                    # Letterbox up front so only inference is timed
+                    for frame in frames:
+                        frame.letterbox(imgsz)
+                    # Torch threads only affect the PyTorch backend; exported runtimes keep their own pools
+                    backend_threads = threads if backend == 'pytorch' else [None]
+                    for thread_count in backend_threads:
+                        torch.set_num_threads(thread_count or original_threads)
+                        for batch_size in batch_sizes:
+                            measurement = {'backend': backend, 'imgsz': imgsz, 'torch_threads': thread_count,
+                                           'batch_size': batch_size, 'agreement': agreement}
+                            measurement.update(self.measure(model, infer, frames, imgsz, batch_size))
+                            measurements.append(measurement)
+                    for frame in frames:
+                        frame.release_cache()
+        finally:
+            torch.set_num_threads(original_threads)
+        return measurements
+
+    def profile(self, measurements: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """The machine profile for the best measurement, or None when nothing could be measured"""
+        measured = [m for m in measurements if 'error' not in m]
+        best = select_config(measured, self.latency_budget_ms, self.min_agreement)
+        if best is None:
+            return None
+        return {
+            'version': PROFILE_VERSION,
+            'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'fingerprint': self.detector.hardware_fingerprint(),
+            'latency_budget_ms': self.latency_budget_ms,
+            'min_agreement': self.min_agreement,
+            'within_budget': best['latency_ms'] <= self.latency_budget_ms,
+            'settings': {name: best[name] for name in PROFILE_SETTINGS},
+            'best': best,
+            'measurements': measurements
+        }
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+MyCV-Platform Box Fusion
+Merges YOLO11m and best.pt detections with class-aware NMS or weighted box fusion
+"""
+
+import numpy as np
+from typing import Dict, List, Optional
+
+
+def _pairwise_overlap(boxes_a: np.ndarray, boxes_b: np.ndarray):
+    """Pairwise intersection areas plus each set's box areas"""
+    boxes_a = np.asarray(boxes_a, dtype=np.float32).reshape(-1, 4)
+    boxes_b = np.asarray(boxes_b, dtype=np.float32).reshape(-1, 4)
+
+    top_left = np.maximum(boxes_a[:, None, :2], boxes_b[None, :, :2])
+    bottom_right = np.minimum(boxes_a[:, None, 2:], boxes_b[None, :, 2:])
+    intersection = np.clip(bottom_right - top_left, 0, None).prod(axis=2)
+
+    area_a = (boxes_a[:, 2:] - boxes_a[:, :2]).clip(0).prod(axis=1)
+    area_b = (boxes_b[:, 2:] - boxes_b[:, :2]).clip(0).prod(axis=1)
+    return intersection, area_a, area_b
+
+
+def box_iou(boxes_a: np.ndarray, boxes_b: np.ndarray) -> np.ndarray:
+    """Pairwise IoU between two sets of xyxy boxes"""
+    intersection, area_a, area_b = _pairwise_overlap(boxes_a, boxes_b)
+    union = area_a[:, None] + area_b[None, :] - intersection
+    return np.where(union > 0, intersection / np.maximum(union, 1e-9), 0.0)
+
+
+def box_ios(boxes_a: np.ndarray, boxes_b: np.ndarray) -> np.ndarray:
+    """Pairwise intersection over the smaller box's area
+
+    Unlike IoU this stays high when one box is a clipped part of the
+    other, e.g. an object cut in two by a tile border.
+    """
+    intersection, area_a, area_b = _pairwise_overlap(boxes_a, boxes_b)
+    smaller = np.minimum(area_a[:, None], area_b[None, :])
+    return np.where(smaller > 0, intersection / np.maximum(smaller, 1e-9), 0.0)
+
+
+def nms(boxes: np.ndarray, scores: np.ndarray, labels: Optional[np.ndarray] = None,
+        iou_threshold: float = 0.5, metric: str = 'iou') -> np.ndarray:
+    """Class-aware greedy NMS; returns the kept indices, best score first
+
+    The overlap matrix is computed once for all boxes, so the greedy pass
+    is one boolean row operation per kept box. metric='ios' matches on
+    intersection over the smaller box instead of IoU.
+    """
+    if metric not in ('iou', 'ios'):
+        raise ValueError(f"Unknown NMS metric: {metric}")
+    boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+    if len(boxes) == 0:
+        return np.zeros(0, dtype=np.int64)
+
+    order = np.argsort(-np.asarray(scores, dtype=np.float32), kind='stable')
+    boxes = boxes[order]
+    overlap = box_iou(boxes, boxes) if metric == 'iou' else box_ios(boxes, boxes)
+    suppresses = np.triu(overlap > iou_threshold, k=1)
+    if labels is not None:
+        labels = np.asarray(labels)[order]
+        suppresses &= labels[:, None] == labels[None, :]
+
+    suppressed = np.zeros(len(boxes), dtype=bool)
+    for i in range(len(boxes)):
+        if not suppressed[i]:
+            suppressed |= suppresses[i]
+    return order[~suppressed]
+
+
+def cluster_boxes(boxes: np.ndarray, scores: np.ndarray, labels: np.ndarray,
+                  iou_threshold: float = 0.55) -> List[np.ndarray]:
+    """Greedy clustering around the highest-scoring remaining box
+
+    Returns one index array per cluster; the first index is the cluster
+    leader. Only boxes with the same label can join a cluster.
+    """
+    if len(boxes) == 0:
+        return []
+
+    order = np.argsort(-scores, kind='stable')
+    iou = box_iou(boxes, boxes)
+    same_label = labels[:, None] == labels[None, :]
+    candidates = (iou > iou_threshold) & same_label
+
+    assigned = np.zeros(len(boxes), dtype=bool)
+    clusters = []
+    for leader in order:
+        if assigned[leader]:
+            continue
+        members = np.flatnonzero(candidates[leader] & ~assigned)
+        members = np.concatenate(([leader], members[members != leader]))
+        assigned[members] = True
+        clusters.append(members)
+    return clusters
+
+
+def fuse_detections(detections_by_model: Dict[str, List[dict]], method: str = 'nms',
+                    iou_threshold: float = 0.55, class_agnostic: bool = False) -> List[dict]:
+    """Merge several models' detection lists into one deduplicated list
+
+    method='nms' keeps the highest-confidence box of each overlapping group;
+    method='wbf' averages the group's boxes weighted by confidence. Every
+    fused detection lists the models that proposed it under 'sources' and
+    their individual confidences under 'source_confidences'.
+    """
+    if method not in ('nms', 'wbf'):
+        raise ValueError(f"Unknown fusion method: {method}")
+
+    flat = [(model_name, det) for model_name, dets in detections_by_model.items() for det in dets]
+    if not flat:
+        return []
+
+    boxes = np.array([det['bbox'] for _, det in flat], dtype=np.float32)
+    scores = np.array([det['confidence'] for _, det in flat], dtype=np.float32)
+    if class_agnostic:
+        labels = np.zeros(len(flat), dtype=np.int64)
+    else:
+        _, labels = np.unique([det['class_name'] for _, det in flat], return_inverse=True)
+
+    model_count = max(1, len(detections_by_model))
+    fused = []
+    for members in cluster_boxes(boxes, scores, labels, iou_threshold):
+        _, leader = flat[members[0]]
+        member_scores = scores[members]
+
+        if method == 'wbf':
+            bbox = (boxes[members] * member_scores[:, None]).sum(axis=0) / member_scores.sum()
+            contributing = len({flat[i][0] for i in members})
+            confidence = float(member_scores.mean()) * min(contributing, model_count) / model_count
+        else:
+            bbox = boxes[members[0]]
+            confidence = float(member_scores[0])
+
+        source_confidences = {}
+        for i in members:
+            model_name, det = flat[i]
+            source_confidences[model_name] = max(source_confidences.get(model_name, 0.0), float(det['confidence']))
+
+        fused.append({
+            'bbox': bbox.tolist(),
+            'confidence': confidence,
+            'class_id': leader['class_id'],
+            'class_name': leader['class_name'],
+            'sources': sorted(source_confidences),
+            'source_confidences': source_confidences
+        })
+
+    return fused
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+MyCV-Platform Box Tracker
+IoU tracker with constant-velocity propagation between detector frames
+"""
+
+import numpy as np
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.utils.box_fusion import box_iou
+
+
+class Track:
+    """One tracked object
+
+    bbox is the current (possibly propagated) box; detected_bbox and
+    last_detected remember the last detector hit, which velocity is
+    measured from. segmented_bbox is the box SAM2 last segmented.
+    """
+
+    __slots__ = ('track_id', 'bbox', 'detected_bbox', 'velocity', 'class_id', 'class_name',
+                 'confidence', 'first_seen', 'last_detected', 'hits', 'segmented_bbox', 'segmented_at', 'mask')
+
+    def __init__(self, track_id: int, detection: Dict[str, Any], frame_index: int):
+        self.track_id = track_id
+        self.bbox = np.array(detection['bbox'], dtype=np.float32)
+        self.detected_bbox = self.bbox.copy()
+        self.velocity = np.zeros(4, dtype=np.float32)
+        self.class_id = detection['class_id']
+        self.class_name = detection['class_name']
+        self.confidence = detection['confidence']
+        self.first_seen = frame_index
+        self.last_detected = frame_index
+        self.hits = 1
+        self.segmented_bbox = None
+        self.segmented_at = None
+        self.mask = None
+
+    def as_detection(self) -> Dict[str, Any]:
+        """Detection dict for the current box, usable as a SAM2 prompt"""
+        return {
+            'bbox': self.bbox.tolist(),
+            'confidence': self.confidence,
+            'class_id': self.class_id,
+            'class_name': self.class_name,
+            'track_id': self.track_id
+        }
+
+
+class BoxTracker:
+    """Greedy IoU matching of detections to tracks, one class at a time
+
+    update() takes a detector frame; predict() moves every track along its
+    velocity for frames the detector skipped. Tracks unmatched for more
+    than max_age frames are dropped.
+    """
+
+    def __init__(self, iou_threshold: float = 0.3, max_age: int = 30, class_agnostic: bool = False):
+        self.iou_threshold = iou_threshold
+        self.max_age = max_age
+        self.class_agnostic = class_agnostic
+        self.tracks = []
+        self.next_id = 1
+        self.frame_index = None
+
+    def predict(self, frame_index: int, frame_shape: Optional[Tuple[int, int]] = None) -> List[Track]:
+        """Propagate every track's box to frame_index"""
+        steps = 0 if self.frame_index is None else frame_index - self.frame_index
+        if steps > 0:
+            for track in self.tracks:
+                track.bbox = track.bbox + track.velocity * steps
+                if frame_shape is not None:
+                    height, width = frame_shape[:2]
+                    track.bbox = np.clip(track.bbox, 0, [width, height, width, height]).astype(np.float32)
+        self.frame_index = frame_index
+        return self.tracks
+
+    def update(self, detections: List[Dict[str, Any]], frame_index: int,
+               frame_shape: Optional[Tuple[int, int]] = None) -> List[Track]:
+        """Match a detector frame against the propagated tracks"""
+        self.predict(frame_index, frame_shape)
+
+        matched_tracks = set()
+        matched_detections = set()
+        if self.tracks and detections:
+            iou = box_iou(np.array([track.bbox for track in self.tracks]),
+                          np.array([det['bbox'] for det in detections]))
+            if not self.class_agnostic:
+                same_class = np.array([[track.class_name == det['class_name'] for det in detections]
+                                       for track in self.tracks])
+                iou = np.where(same_class, iou, 0.0)
+
+            while iou.size and iou.max() >= self.iou_threshold:
+                t, d = np.unravel_index(np.argmax(iou), iou.shape)
+                self._hit(self.tracks[t], detections[d], frame_index)
+                matched_tracks.add(t)
+                matched_detections.add(d)
+                iou[t, :] = 0
+                iou[:, d] = 0
+
+        survivors = [track for index, track in enumerate(self.tracks)
+                     if index in matched_tracks or frame_index - track.last_detected <= self.max_age]
+        for index, detection in enumerate(detections):
+            if index not in matched_detections:
+                survivors.append(Track(self.next_id, detection, frame_index))
+                self.next_id += 1
+        self.tracks = survivors
+        return self.tracks
+
+    @staticmethod
+    def _hit(track: Track, detection: Dict[str, Any], frame_index: int) -> None:
+        bbox = np.array(detection['bbox'], dtype=np.float32)
+        elapsed = frame_index - track.last_detected
+        if elapsed > 0:
+            track.velocity = (bbox - track.detected_bbox) / elapsed
+        track.bbox = bbox
+        track.detected_bbox = bbox.copy()
+        track.confidence = detection['confidence']
+        track.last_detected = frame_index
+        track.hits += 1
+
+    def needs_segmentation(self, iou_threshold: float = 0.85) -> List[Track]:
+        """Tracks that are new or whose box drifted from the last segmented box"""
+        stale = []
+        for track in self.tracks:
+            if track.segmented_bbox is None:
+                stale.append(track)
+            elif box_iou(track.bbox, track.segmented_bbox)[0, 0] < iou_threshold:
+                stale.append(track)
+        return stale
+
+    @staticmethod
+    def mark_segmented(track: Track, mask, frame_index: int) -> None:
+        track.mask = mask
+        track.segmented_bbox = track.bbox.copy()
+        track.segmented_at = frame_index
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+MyCV-Platform Detector Cascade
+Runs the cheapest YOLO11 tier first and escalates only images whose detections are ambiguous
+"""
+
+import time
+import numpy as np
+from collections import Counter, defaultdict
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from app.utils.box_fusion import box_iou
+
+# Used for any key missing from the `cascade` section of config/models.yaml
+CASCADE_DEFAULTS = {
+    'tiers': ['yolo11n', 'yolo11m'],
+    'min_confidence': 0.6,
+    'conflict_iou': 0.5,
+    'escalate_on_empty': True
+}
+
+
+def load_cascade_config(config_path: str) -> Dict[str, Any]:
+    """The cascade settings plus each tier's checkpoint filename from config/models.yaml"""
+    import yaml
+
+    with open(config_path, 'r') as f:
+        config = yaml.safe_load(f) or {}
+
+    cascade = dict(CASCADE_DEFAULTS, **(config.get('cascade') or {}))
+    yolo_models = (config.get('yolo') or {}).get('models') or {}
+    unknown = [tier for tier in cascade['tiers'] if tier not in yolo_models]
+    if unknown:
+        raise ValueError(f"Cascade tiers not listed under yolo.models in {config_path}: {', '.join(unknown)}")
+    if not cascade['tiers']:
+        raise ValueError(f"No cascade tiers configured in {config_path}")
+
+    cascade['filenames'] = {tier: yolo_models[tier]['filename'] for tier in cascade['tiers']}
+    return cascade
+
+
+def ambiguity_reasons(detections: List[Dict[str, Any]], min_confidence: float, conflict_iou: float,
+                      escalate_on_empty: bool = True) -> List[str]:
+    """Why a tier's detections are not trusted; empty when they are clear
+
+    'empty': no boxes at all; 'low_confidence': the best box scores below
+    min_confidence; 'class_conflict': boxes with different class names
+    overlap by at least conflict_iou.
+    """
+    if not detections:
+        return ['empty'] if escalate_on_empty else []
+
+    reasons = []
+    if max(det['confidence'] for det in detections) < min_confidence:
+        reasons.append('low_confidence')
+
+    class_names = np.array([det['class_name'] for det in detections])
+    if len(set(class_names)) > 1:
+        iou = box_iou(np.array([det['bbox'] for det in detections]), np.array([det['bbox'] for det in detections]))
+        different = class_names[:, None] != class_names[None, :]
+        if np.any((iou >= conflict_iou) & different):
+            reasons.append('class_conflict')
+    return reasons
+
+
+class CascadeStats:
+    """Where images finished in the cascade and why they escalated"""
+
+    def __init__(self, tiers: Sequence[str]):
+        self.tiers = list(tiers)
+        self.images = 0
+        self.final_tier = Counter()
+        self.reasons = Counter()
+        self.tier_images = Counter()
+        self.tier_seconds = defaultdict(float)
+
+    def merge(self, other: 'CascadeStats') -> None:
+        """Fold in the counts of another process's cascade"""
+        self.images += other.images
+        self.final_tier.update(other.final_tier)
+        self.reasons.update(other.reasons)
+        self.tier_images.update(other.tier_images)
+        for tier, seconds in other.tier_seconds.items():
+            self.tier_seconds[tier] += seconds
+
+    def summary(self) -> Dict[str, Any]:
+        escalated = self.images - self.final_tier.get(self.tiers[0], 0)
+        return {
+            'tiers': self.tiers,
+            'images': self.images,
+            'escalated': escalated,
+            'escalation_rate': escalated / self.images if self.images else 0.0,
+            'final_tier': {tier: self.final_tier.get(tier, 0) for tier in self.tiers},
+            'reasons': dict(self.reasons),
+            'tier_ms_per_image': {
+                tier: self.tier_seconds[tier] * 1000 / self.tier_images[tier]
+                for tier in self.tiers if self.tier_images[tier]
+            },
+            'detect_ms_per_image': sum(self.tier_seconds.values()) * 1000 / self.images if self.images else 0.0
+        }
+
+
+class DetectorCascade:
+    """YOLO tiers ordered cheapest first, with the escalation thresholds
+
+    run() sends every frame through the first tier, then moves only the
+    ambiguous ones on to the next. The last tier's detections are kept
+    whatever they look like.
+    """
+
+    def __init__(self, models: Dict[str, Any], config: Dict[str, Any]):
+        self.tiers = list(config['tiers'])
+        self.models = models
+        self.min_confidence = config['min_confidence']
+        self.conflict_iou = config['conflict_iou']
+        self.escalate_on_empty = config['escalate_on_empty']
+        self.stats = CascadeStats(self.tiers)
+
+    def run(self, frames: Sequence[Any],
+            detect: Callable[[Any, str, Sequence[Any]], List[List[Dict[str, Any]]]]) -> List[List[Dict[str, Any]]]:
+        """Detections per frame; detect(model, tier, frames) returns one list per frame"""
+        results: List[Optional[List[Dict[str, Any]]]] = [None] * len(frames)
+        pending = list(range(len(frames)))
+
+        for level, tier in enumerate(self.tiers):
+            if not pending:
+                break
+            start = time.perf_counter()
+            tier_detections = detect(self.models[tier], tier, [frames[i] for i in pending])
+            self.stats.tier_seconds[tier] += time.perf_counter() - start
+            self.stats.tier_images[tier] += len(pending)
+
+            last_tier = level == len(self.tiers) - 1
+            escalate = []
+            for index, detections in zip(pending, tier_detections):
+                reasons = [] if last_tier else ambiguity_reasons(
+                    detections, self.min_confidence, self.conflict_iou, self.escalate_on_empty
+                )
+                if reasons:
+                    self.stats.reasons.update(reasons)
+                    escalate.append(index)
+                else:
+                    results[index] = detections
+                    self.stats.final_tier[tier] += 1
+            pending = escalate
+
+        self.stats.images += len(frames)
+        return results
@@ -6,9 +6,8 @@ Detects virtual environment, GPU/CPU mode, and mock data capabilities
 
 import os
 import sys
-import torch
 import numpy as np
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
 from termcolor import colored
 import platform
 import subprocess
@@ -57,10 +56,16 @@ class EnvironmentDetector:
             'gpu_name': None,
             'cuda_version': None,
             'gpu_memory': None,
+            'cpu_count': os.cpu_count(),
+            'cpu_threads': None,
             'mode': 'CPU'
         }
         
         try:
+            # Deferred so probes that never reach this check skip the torch import
+            import torch
+            
+            gpu_info['cpu_threads'] = torch.get_num_threads()
             if torch.cuda.is_available():
                 gpu_info['cuda_available'] = True
                 gpu_info['gpu_count'] = torch.cuda.device_count()
@@ -78,7 +83,7 @@ class EnvironmentDetector:
                 gpu_info['mode'] = 'CPU'
                 self.log_message("⚠️  PyTorch CUDA not available - will use CPU mode", 'warning')
                 self.log_message(f"   PyTorch Version: {torch.__version__}", 'info')
-                self.log_message(f"   CPU Threads: {torch.get_num_threads()}", 'info')
+                self.log_message(f"   CPU Threads: {gpu_info['cpu_threads']} (cores: {gpu_info['cpu_count']})", 'info')
                 self.log_message("💻 CPU MODE: Using CPU for inference", 'warning')
                 
         except Exception as e:
@@ -87,6 +92,12 @@ class EnvironmentDetector:
         
         return gpu_info
     
+    def threads_per_worker(self, workers: int, gpu_info: Optional[Dict[str, Any]] = None) -> int:
+        """Split the available CPU threads evenly across worker processes"""
+        gpu_info = gpu_info or self.check_gpu_capabilities()
+        available = gpu_info.get('cpu_threads') or gpu_info.get('cpu_count') or 1
+        return max(1, available // max(1, workers))
+    
     def check_nvidia_smi(self) -> Optional[Dict[str, Any]]:
         """Check NVIDIA-SMI availability and GPU info"""
         try:
@@ -130,6 +141,8 @@ class EnvironmentDetector:
         }
         
         try:
+            import torch
+            
             self.log_message("🧪 Testing PyTorch with mock data...", 'info')
             
             # Test basic tensor operations
@@ -168,13 +181,48 @@ class EnvironmentDetector:
         
         return mock_results
     
+    def mock_frames(self, count: int = 8, size: int = 640, seed: int = 0) -> List[Any]:
+        """Deterministic size x size synthetic frames, for timing inference without test images"""
+        from app.utils.image_frame import ImageFrame
+        from app.utils.synthetic_images import synthetic_image
+        
+        return [
+            ImageFrame(synthetic_image(size, size, objects=8, seed=seed + i)[0], name=f"mock_{i}")
+            for i in range(count)
+        ]
+    
+    def hardware_fingerprint(self) -> Dict[str, Any]:
+        """What a tuned run profile depends on; a profile is only reused on a matching machine"""
+        fingerprint = {
+            'machine': platform.machine(),
+            'processor': platform.processor(),
+            'cpu_count': os.cpu_count(),
+            'torch_version': None,
+            'gpu_name': None
+        }
+        try:
+            import torch
+            
+            fingerprint['torch_version'] = torch.__version__
+            if torch.cuda.is_available():
+                fingerprint['gpu_name'] = torch.cuda.get_device_name(0)
+        except ImportError:
+            pass
+        return fingerprint
+    
     def get_system_info(self) -> Dict[str, Any]:
         """Get general system information"""
+        try:
+            import torch
+            pytorch_version = torch.__version__
+        except ImportError:
+            pytorch_version = None
+        
         return {
             'platform': platform.platform(),
             'python_version': sys.version,
             'python_executable': sys.executable,
-            'pytorch_version': torch.__version__,
+            'pytorch_version': pytorch_version,
             'numpy_version': np.__version__,
             'cwd': os.getcwd()
         }
@@ -208,7 +256,7 @@ class EnvironmentDetector:
             self.log_message(f"   GPU: {results['gpu_capabilities']['gpu_name']}", 'info')
             self.log_message(f"   GPU Memory: {results['gpu_capabilities']['gpu_memory']:.1f} GB", 'info')
         else:
-            self.log_message(f"   CPU Threads: {torch.get_num_threads()}", 'info')
+            self.log_message(f"   CPU Threads: {results['gpu_capabilities']['cpu_threads']}", 'info')
 
 
 def main():
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+MyCV-Platform Image Frame
+Decodes an image once and shares its buffers with both YOLO models and SAM2
+"""
+
+import os
+import hashlib
+import numpy as np
+from typing import Optional, Tuple
+
+
+class ImageFrame:
+    """A decoded image shared by every pipeline stage
+
+    The BGR buffer is read from disk once. The RGB view and any letterboxed
+    detector input are derived on first use and cached, so consumers never
+    re-decode or re-convert the same image.
+    """
+
+    def __init__(self, bgr: np.ndarray, path: Optional[str] = None, name: Optional[str] = None):
+        self.bgr = bgr
+        self.path = path
+        self.name = name or (os.path.basename(path) if path else 'frame')
+        self._rgb = None
+        self._letterboxed = {}
+        self._content_hash = None
+
+    @classmethod
+    def from_path(cls, path: str) -> 'ImageFrame':
+        """Decode an image file into a frame"""
+        import cv2
+
+        bgr = cv2.imread(path)
+        if bgr is None:
+            raise ValueError(f"Could not read image: {path}")
+        return cls(bgr, path=path)
+
+    @classmethod
+    def from_bytes(cls, data: bytes, name: str = 'upload') -> 'ImageFrame':
+        """Decode an encoded image (JPEG/PNG bytes) into a frame"""
+        import cv2
+
+        bgr = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+        if bgr is None:
+            raise ValueError(f"Could not decode image: {name}")
+        return cls(bgr, name=name)
+
+    @property
+    def height(self) -> int:
+        return self.bgr.shape[0]
+
+    @property
+    def width(self) -> int:
+        return self.bgr.shape[1]
+
+    @property
+    def content_hash(self) -> str:
+        """Hash of the decoded pixels, computed once"""
+        if self._content_hash is None:
+            digest = hashlib.blake2b(digest_size=16)
+            digest.update(f"{self.bgr.shape}|{self.bgr.dtype}".encode())
+            digest.update(np.ascontiguousarray(self.bgr).data)
+            self._content_hash = digest.hexdigest()
+        return self._content_hash
+
+    @property
+    def rgb(self) -> np.ndarray:
+        """RGB buffer, converted once on first access"""
+        if self._rgb is None:
+            import cv2
+
+            self._rgb = cv2.cvtColor(self.bgr, cv2.COLOR_BGR2RGB)
+        return self._rgb
+
+    def letterbox(self, imgsz: int = 640) -> Tuple[np.ndarray, float, Tuple[float, float]]:
+        """Square letterboxed RGB input as a CHW float32 array in [0, 1]
+
+        Uses the same grey (114) padding as ultralytics. Returns the array,
+        the resize ratio and the (pad_x, pad_y) offsets, cached per size.
+        """
+        if imgsz not in self._letterboxed:
+            import cv2
+
+            ratio = min(imgsz / self.height, imgsz / self.width)
+            new_w, new_h = int(round(self.width * ratio)), int(round(self.height * ratio))
+            pad_x, pad_y = (imgsz - new_w) / 2, (imgsz - new_h) / 2
+
+            resized = self.rgb
+            if (new_w, new_h) != (self.width, self.height):
+                resized = cv2.resize(resized, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+
+            top, left = int(round(pad_y - 0.1)), int(round(pad_x - 0.1))
+            bottom, right = imgsz - new_h - top, imgsz - new_w - left
+            padded = cv2.copyMakeBorder(resized, top, bottom, left, right,
+                                        cv2.BORDER_CONSTANT, value=(114, 114, 114))
+
+            chw = np.ascontiguousarray(padded.transpose(2, 0, 1), dtype=np.float32)
+            chw /= 255.0
+            self._letterboxed[imgsz] = (chw, ratio, (float(left), float(top)))
+
+        return self._letterboxed[imgsz]
+
+    def letterbox_tensor(self, imgsz: int = 640):
+        """Letterboxed input as a 1x3xHxW torch tensor sharing the cached array"""
+        import torch
+
+        chw, _, _ = self.letterbox(imgsz)
+        return torch.from_numpy(chw).unsqueeze(0)
+
+    def scale_boxes(self, boxes: np.ndarray, imgsz: int = 640) -> np.ndarray:
+        """Map xyxy boxes from letterboxed coordinates back to this frame"""
+        _, ratio, (pad_x, pad_y) = self.letterbox(imgsz)
+
+        boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4).copy()
+        boxes[:, [0, 2]] = (boxes[:, [0, 2]] - pad_x) / ratio
+        boxes[:, [1, 3]] = (boxes[:, [1, 3]] - pad_y) / ratio
+        boxes[:, [0, 2]] = boxes[:, [0, 2]].clip(0, self.width)
+        boxes[:, [1, 3]] = boxes[:, [1, 3]].clip(0, self.height)
+        return boxes
+
+    def release_cache(self) -> None:
+        """Drop derived buffers once all consumers are done with them"""
+        self._rgb = None
+        self._letterboxed = {}
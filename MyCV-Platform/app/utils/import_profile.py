@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+MyCV-Platform Import Profile
+Summarizes `python -X importtime` for the CLI entry points to keep cold start fast
+"""
+
+import os
+import sys
+import time
+import argparse
+import subprocess
+from collections import defaultdict
+from typing import Any, Dict, List
+
+from termcolor import colored
+
+# Entry points measured by default, as importable module names
+ENTRY_POINTS = [
+    'run_yolo_sam_integration',
+    'visualize_results',
+    'app.utils.environment_detector',
+    'model_server'
+]
+
+# Heavy packages that should only load on code paths that need them
+HEAVY_PACKAGES = ('torch', 'ultralytics', 'matplotlib', 'onnxruntime', 'openvino')
+
+
+def parse_importtime(stderr: str) -> List[Dict[str, Any]]:
+    """Parse `-X importtime` lines into {module, self_us, cumulative_us, depth} records"""
+    records = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        try:
+            self_us, cumulative_us, name = line[len('import time:'):].split('|', 2)
+            records.append({
+                'module': name.strip(),
+                'self_us': int(self_us),
+                'cumulative_us': int(cumulative_us),
+                'depth': (len(name) - len(name.lstrip())) // 2
+            })
+        except ValueError:
+            continue
+    return records
+
+
+def summarize_imports(records: List[Dict[str, Any]], top: int = 10) -> Dict[str, Any]:
+    """Total import time plus the costliest top-level packages"""
+    by_package = defaultdict(int)
+    for record in records:
+        by_package[record['module'].split('.')[0]] += record['self_us']
+
+    loaded = {record['module'].split('.')[0] for record in records}
+    return {
+        'total_ms': sum(by_package.values()) / 1000,
+        'modules': len(records),
+        'top_packages': [
+            {'package': package, 'ms': us / 1000}
+            for package, us in sorted(by_package.items(), key=lambda item: item[1], reverse=True)[:top]
+        ],
+        'heavy_loaded': sorted(loaded.intersection(HEAVY_PACKAGES))
+    }
+
+
+def profile_entry_point(module: str, top: int = 10) -> Dict[str, Any]:
+    """Import one module in a fresh interpreter and summarize what it pulled in"""
+    start = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f"import {module}"],
+        capture_output=True, text=True, cwd=os.getcwd()
+    )
+    wall_ms = (time.perf_counter() - start) * 1000
+
+    report = summarize_imports(parse_importtime(completed.stderr), top)
+    report.update({'entry_point': module, 'wall_ms': wall_ms, 'ok': completed.returncode == 0})
+    if completed.returncode != 0:
+        report['error'] = completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else 'import failed'
+    return report
+
+
+def main():
+    """Print an import-time report for each entry point"""
+    parser = argparse.ArgumentParser(description="Summarize import time of the MyCV-Platform entry points")
+    parser.add_argument('modules', nargs='*', default=ENTRY_POINTS,
+                        help="Modules to import (default: the CLI entry points)")
+    parser.add_argument('--top', type=int, default=8, help="Packages listed per entry point (default: 8)")
+    parser.add_argument('--budget-ms', type=float, default=1000,
+                        help="Flag entry points whose cold import exceeds this (default: 1000)")
+    args = parser.parse_args()
+
+    over_budget = False
+    for module in args.modules:
+        report = profile_entry_point(module, args.top)
+        if not report['ok']:
+            print(colored(f"ERROR: {module}: {report['error']}", 'red'))
+            over_budget = True
+            continue
+
+        within = report['wall_ms'] <= args.budget_ms
+        over_budget |= not within
+        color = 'green' if within else 'yellow'
+        print(colored(f"{module}: {report['wall_ms']:.0f} ms cold start, "
+                      f"{report['total_ms']:.0f} ms in {report['modules']} imports", color))
+        for entry in report['top_packages']:
+            print(f"   {entry['package']:<24} {entry['ms']:>8.1f} ms")
+        if report['heavy_loaded']:
+            print(colored(f"   heavy packages at import: {', '.join(report['heavy_loaded'])}", 'yellow'))
+
+    sys.exit(1 if over_budget else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+MyCV-Platform Mask Codec
+Compact per-image mask files (COCO-style RLE or bit-packed) instead of one PNG per mask
+"""
+
+import os
+import json
+import numpy as np
+from typing import Any, Dict, List
+
+from app.utils.mask_tile import MaskTile, as_tile
+
+MASK_FORMATS = ('png', 'rle', 'packbits')
+MASK_FILE_SUFFIXES = {
+    'rle': '_masks.rle.json',
+    'packbits': '_masks.npz'
+}
+
+
+def to_binary(mask: np.ndarray) -> np.ndarray:
+    """Collapse a SAM mask ((1, H, W) or (H, W), float/bool/uint8) to a 2D bool array"""
+    if isinstance(mask, MaskTile):
+        return mask.to_full()
+    mask = np.asarray(mask)
+    if mask.ndim == 3:
+        mask = mask[0]
+    if mask.dtype == bool:
+        return mask
+    if mask.dtype == np.uint8:
+        return mask > 127
+    return mask > 0.5
+
+
+def _run_lengths(flat: np.ndarray) -> np.ndarray:
+    """Alternating zero/one run lengths, always starting with a (possibly empty) zero run"""
+    flat = flat.astype(np.int8)
+    changes = np.flatnonzero(np.diff(flat)) + 1
+    counts = np.diff(np.concatenate(([0], changes, [flat.size])))
+    if flat.size and flat[0] == 1:
+        counts = np.concatenate(([0], counts))
+    return counts
+
+
+def encode_rle(mask) -> Dict[str, Any]:
+    """COCO-style uncompressed RLE (column-major, runs start with zeros)
+
+    MaskTiles are encoded from their tile columns only; the columns left and
+    right of the tile are all zeros and fold into the first and last runs.
+    """
+    if not isinstance(mask, MaskTile):
+        mask = to_binary(mask)
+        return {'size': [int(mask.shape[0]), int(mask.shape[1])],
+                'counts': _run_lengths(mask.ravel(order='F')).tolist()}
+
+    height, width = mask.frame_shape
+    columns = np.zeros((height, mask.tile.shape[1]), dtype=bool)
+    columns[mask.y:mask.y + mask.tile.shape[0]] = mask.tile
+    counts = _run_lengths(columns.ravel(order='F'))
+    if counts.size == 0:
+        counts = np.zeros(1, dtype=np.int64)
+
+    counts[0] += mask.x * height
+    trailing = (width - mask.x - mask.tile.shape[1]) * height
+    if counts.size % 2 == 1:
+        counts[-1] += trailing
+    elif trailing:
+        counts = np.concatenate((counts, [trailing]))
+    return {'size': [int(height), int(width)], 'counts': counts.tolist()}
+
+
+def decode_rle(rle: Dict[str, Any]) -> np.ndarray:
+    """Inverse of encode_rle; returns a 2D bool array"""
+    height, width = rle['size']
+    counts = np.asarray(rle['counts'], dtype=np.int64)
+    values = np.arange(counts.size) % 2 == 1
+    flat = np.repeat(values, counts)
+    return flat.reshape((height, width), order='F')
+
+
+def mask_file_path(output_dir: str, image_name: str, mask_format: str) -> str:
+    """Where the compact mask file for image_name lives"""
+    return os.path.join(output_dir, f"{image_name}{MASK_FILE_SUFFIXES[mask_format]}")
+
+
+def _mask_metadata(index: int, mask_data: Dict[str, Any]) -> Dict[str, Any]:
+    meta = {
+        'index': index,
+        'class_name': mask_data['class_name'],
+        'bbox': [float(v) for v in mask_data['bbox']],
+        'confidence': float(mask_data['confidence'])
+    }
+    if 'sources' in mask_data:
+        meta['sources'] = mask_data['sources']
+    if 'detection_index' in mask_data:
+        meta['detection_index'] = mask_data['detection_index']
+    return meta
+
+
+def write_masks(path: str, sam_masks: List[Dict[str, Any]], mask_format: str) -> int:
+    """Write all masks of one image to a single file; returns bytes written"""
+    if mask_format == 'rle':
+        records = []
+        for i, mask_data in enumerate(sam_masks):
+            record = _mask_metadata(i, mask_data)
+            record.update(encode_rle(mask_data['mask']))
+            records.append(record)
+        with open(path, 'w') as f:
+            json.dump({'format': 'rle', 'masks': records}, f, separators=(',', ':'))
+
+    elif mask_format == 'packbits':
+        # Only each mask's tile is packed; origins place it back in the frame
+        tiles = [as_tile(mask_data['mask']) for mask_data in sam_masks]
+        packed = [np.packbits(tile.tile, axis=None) for tile in tiles]
+        offsets = np.cumsum([0] + [chunk.size for chunk in packed]).astype(np.int64)
+        shapes = np.array([tile.tile.shape for tile in tiles], dtype=np.int32).reshape(-1, 2)
+        origins = np.array([(tile.x, tile.y) for tile in tiles], dtype=np.int32).reshape(-1, 2)
+        frame_shapes = np.array([tile.frame_shape for tile in tiles], dtype=np.int32).reshape(-1, 2)
+        meta = json.dumps([_mask_metadata(i, mask_data) for i, mask_data in enumerate(sam_masks)])
+        with open(path, 'wb') as f:
+            np.savez(f, packed=np.concatenate(packed) if packed else np.zeros(0, dtype=np.uint8),
+                     offsets=offsets, shapes=shapes, origins=origins, frame_shapes=frame_shapes,
+                     meta=np.array(meta))
+
+    else:
+        raise ValueError(f"Unsupported compact mask format: {mask_format}")
+
+    return os.path.getsize(path)
+
+
+def read_masks(path: str) -> List[Dict[str, Any]]:
+    """Read a compact mask file; each entry has a MaskTile 'mask' plus its metadata"""
+    if path.endswith(MASK_FILE_SUFFIXES['rle']):
+        with open(path, 'r') as f:
+            records = json.load(f)['masks']
+        masks = []
+        for record in records:
+            entry = {key: value for key, value in record.items() if key not in ('size', 'counts')}
+            entry['mask'] = MaskTile.from_full(decode_rle(record))
+            masks.append(entry)
+        return masks
+
+    if path.endswith(MASK_FILE_SUFFIXES['packbits']):
+        with np.load(path) as data:
+            packed, offsets, shapes = data['packed'], data['offsets'], data['shapes']
+            # Files written before tiles existed hold full-frame masks
+            origins = data['origins'] if 'origins' in data else np.zeros_like(shapes)
+            frame_shapes = data['frame_shapes'] if 'frame_shapes' in data else shapes
+            meta = json.loads(str(data['meta']))
+        masks = []
+        for i, entry in enumerate(meta):
+            height, width = shapes[i]
+            bits = np.unpackbits(packed[offsets[i]:offsets[i + 1]], count=int(height * width))
+            entry['mask'] = MaskTile(bits.reshape(height, width), origins[i][0], origins[i][1], frame_shapes[i])
+            masks.append(entry)
+        return masks
+
+    raise ValueError(f"Unknown mask file type: {path}")
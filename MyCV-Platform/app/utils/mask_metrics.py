@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+MyCV-Platform Mask Metrics
+Per-mask shape measurements and one compact summary record per image, computed from in-memory mask tiles
+"""
+
+import os
+import json
+import shutil
+import threading
+import numpy as np
+from collections import Counter
+from typing import Any, Dict, List, Optional, Sequence
+
+from app.utils.mask_tile import MaskTile, as_tile
+
+# Polygon outlines are simplified to within this fraction of their perimeter
+POLYGON_EPSILON = 0.005
+
+METRICS_FILE = "metrics.jsonl"
+
+
+def _mosaic(tiles: Sequence[MaskTile]):
+    """All tiles side by side in one uint8 image, one empty column apart, plus each tile's column offset"""
+    widths = np.array([tile.tile.shape[1] for tile in tiles], dtype=np.int64)
+    heights = np.array([tile.tile.shape[0] for tile in tiles], dtype=np.int64)
+    offsets = np.concatenate(([1], np.cumsum(widths + 1)[:-1] + 1))
+    mosaic = np.zeros((int(heights.max()) + 2, int(offsets[-1] + widths[-1]) + 1), dtype=np.uint8)
+    for tile, offset in zip(tiles, offsets):
+        height, width = tile.tile.shape
+        mosaic[1:height + 1, offset:offset + width] = tile.tile
+    return mosaic, offsets
+
+
+def shape_metrics(masks: Sequence[Any], polygon_epsilon: float = POLYGON_EPSILON) -> List[Dict[str, Any]]:
+    """Area, perimeter and simplified outline of each mask, in frame pixels
+
+    Every tile is traced in a single cv2.findContours call over a mosaic of
+    all tiles, and each outer contour is attributed back to its tile by
+    column. The perimeter adds up all outer contours of a mask; the polygon
+    is the largest one, as [[x, y], ...] in frame coordinates.
+    """
+    import cv2
+
+    tiles = [as_tile(mask) for mask in masks]
+    metrics = [{'area': tile.area, 'perimeter': 0.0, 'polygon': []} for tile in tiles]
+    traced = [i for i, tile in enumerate(tiles) if tile.tile.size]
+    if not traced:
+        return metrics
+
+    mosaic, offsets = _mosaic([tiles[i] for i in traced])
+    contours, _ = cv2.findContours(mosaic, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    if not contours:
+        return metrics
+
+    owners = np.searchsorted(offsets, [int(contour[0, 0, 0]) for contour in contours], side='right') - 1
+    largest = {}
+    for contour, owner in zip(contours, owners):
+        entry = metrics[traced[owner]]
+        entry['perimeter'] += cv2.arcLength(contour, True)
+        contour_area = cv2.contourArea(contour)
+        if owner not in largest or contour_area > largest[owner][0]:
+            largest[owner] = (contour_area, contour)
+
+    for owner, (_, contour) in largest.items():
+        tile = tiles[traced[owner]]
+        polygon = cv2.approxPolyDP(contour, polygon_epsilon * cv2.arcLength(contour, True), True)[:, 0, :]
+        shift = np.array([tile.x - offsets[owner], tile.y - 1])
+        metrics[traced[owner]]['polygon'] = (polygon + shift).tolist()
+    return metrics
+
+
+def image_summary(image_name: str, model: str, detections: List[Dict[str, Any]],
+                  masks: Optional[List[Dict[str, Any]]] = None, frame_shape: Optional[Sequence[int]] = None,
+                  polygon_epsilon: float = POLYGON_EPSILON) -> Dict[str, Any]:
+    """One record with the counts and shape measurements of an image's detections
+
+    cv_quantity and cv_waste_type (the most frequent class) map directly
+    onto the deposits table; weight and quality grade need calibration
+    downstream, so the record carries their inputs instead: mask areas,
+    fill ratios (mask area / box area) and confidences. As in the results
+    store, masks[i] belongs to detections[mask['detection_index']] when set.
+    """
+    masks = masks or []
+    boxes = np.array([det['bbox'] for det in detections], dtype=np.float64).reshape(-1, 4)
+    box_areas = np.clip(boxes[:, 2] - boxes[:, 0], 0, None) * np.clip(boxes[:, 3] - boxes[:, 1], 0, None)
+    confidences = np.array([det['confidence'] for det in detections], dtype=np.float64)
+
+    mask_index = np.array([mask.get('detection_index', i) for i, mask in enumerate(masks)], dtype=np.int64)
+    shapes = shape_metrics([mask['mask'] for mask in masks], polygon_epsilon)
+    areas = np.array([shape['area'] for shape in shapes], dtype=np.float64)
+    fill_ratios = areas / np.maximum(box_areas[mask_index], 1.0) if masks else areas
+
+    objects = [
+        {'class_name': det['class_name'], 'confidence': round(float(det['confidence']), 4),
+         'bbox': [round(float(v), 1) for v in det['bbox']]}
+        for det in detections
+    ]
+    for index, shape, fill_ratio in zip(mask_index, shapes, fill_ratios):
+        objects[index].update(area=shape['area'], perimeter=round(shape['perimeter'], 1),
+                              fill_ratio=round(float(fill_ratio), 4), polygon=shape['polygon'])
+
+    class_counts = Counter(det['class_name'] for det in detections)
+    frame_area = int(frame_shape[0]) * int(frame_shape[1]) if frame_shape is not None else None
+    if frame_area is None and masks:
+        frame_area = int(np.prod(as_tile(masks[0]['mask']).frame_shape))
+    return {
+        'image': image_name,
+        'model': model,
+        'cv_quantity': len(detections),
+        'cv_waste_type': class_counts.most_common(1)[0][0] if class_counts else None,
+        'class_counts': dict(class_counts),
+        'mean_confidence': round(float(confidences.mean()), 4) if len(detections) else None,
+        'segmented': len(masks),
+        'mask_area': int(areas.sum()),
+        'mask_coverage': round(float(areas.sum()) / frame_area, 6) if frame_area else None,
+        'mean_fill_ratio': round(float(fill_ratios.mean()), 4) if masks else None,
+        'objects': objects
+    }
+
+
+class MetricsWriter:
+    """Appends image summaries to a JSON-lines file, one compact line per (image, model)
+
+    Lines are only ever appended; when an image is re-processed the newest
+    line for its (image, model) supersedes the older ones.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.records = 0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+
+    def write(self, record: Dict[str, Any]) -> None:
+        line = json.dumps(record, separators=(',', ':')) + '\n'
+        with self._lock:
+            with open(self.path, 'a') as f:
+                f.write(line)
+            self.records += 1
+
+    def merge(self, other_path: str, remove: bool = False) -> None:
+        """Append every line of another metrics file (e.g. a worker's) to this one"""
+        with self._lock:
+            with open(other_path, 'r') as src, open(self.path, 'a') as dst:
+                shutil.copyfileobj(src, dst)
+        if remove:
+            os.remove(other_path)
+
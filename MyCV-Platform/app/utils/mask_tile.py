@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+MyCV-Platform Mask Tiles
+Holds each segmentation mask as a boolean tile clipped to its bounds plus an offset
+"""
+
+import numpy as np
+from typing import List, Tuple
+
+
+class MaskTile:
+    """Boolean mask stored only over its bounding box
+
+    Memory is proportional to the object's box instead of the full frame,
+    which matters for crowded, high-resolution trays. (x, y) is the tile's
+    top-left corner in frame coordinates.
+    """
+
+    __slots__ = ('tile', 'x', 'y', 'frame_height', 'frame_width')
+
+    def __init__(self, tile: np.ndarray, x: int, y: int, frame_shape: Tuple[int, int]):
+        self.tile = tile.astype(bool, copy=False)
+        self.x = int(x)
+        self.y = int(y)
+        self.frame_height, self.frame_width = int(frame_shape[0]), int(frame_shape[1])
+
+    @staticmethod
+    def _bounds(rows: np.ndarray, cols: np.ndarray) -> Tuple[int, int, int, int]:
+        row_idx = np.flatnonzero(rows)
+        col_idx = np.flatnonzero(cols)
+        if row_idx.size == 0:
+            return 0, 0, 0, 0
+        return int(col_idx[0]), int(row_idx[0]), int(col_idx[-1]) + 1, int(row_idx[-1]) + 1
+
+    @classmethod
+    def from_full(cls, mask: np.ndarray, threshold: float = 0.5) -> 'MaskTile':
+        """Crop a full-frame mask ((1, H, W) or (H, W), any dtype) to its pixels"""
+        mask = np.asarray(mask)
+        if mask.ndim == 3:
+            mask = mask[0]
+        if mask.dtype == np.uint8:
+            binary = mask > 127
+        elif mask.dtype == bool:
+            binary = mask
+        else:
+            binary = mask > threshold
+
+        x1, y1, x2, y2 = cls._bounds(binary.any(axis=1), binary.any(axis=0))
+        return cls(binary[y1:y2, x1:x2].copy(), x1, y1, binary.shape)
+
+    @classmethod
+    def from_tensor(cls, mask, threshold: float = 0.5) -> 'MaskTile':
+        """Crop a single (H, W) mask tensor on its device before copying to host"""
+        binary = mask > threshold if mask.dtype.is_floating_point else mask.bool()
+        rows = binary.any(dim=1).cpu().numpy()
+        cols = binary.any(dim=0).cpu().numpy()
+        x1, y1, x2, y2 = cls._bounds(rows, cols)
+        return cls(binary[y1:y2, x1:x2].cpu().numpy(), x1, y1, tuple(binary.shape))
+
+    @property
+    def frame_shape(self) -> Tuple[int, int]:
+        return self.frame_height, self.frame_width
+
+    @property
+    def bbox(self) -> List[int]:
+        """Tight [x1, y1, x2, y2] box around the mask pixels"""
+        return [self.x, self.y, self.x + self.tile.shape[1], self.y + self.tile.shape[0]]
+
+    @property
+    def area(self) -> int:
+        return int(np.count_nonzero(self.tile))
+
+    @property
+    def nbytes(self) -> int:
+        return self.tile.nbytes
+
+    def to_full(self) -> np.ndarray:
+        """Expand back to a full-frame bool mask (allocates H x W)"""
+        full = np.zeros(self.frame_shape, dtype=bool)
+        full[self.y:self.y + self.tile.shape[0], self.x:self.x + self.tile.shape[1]] = self.tile
+        return full
+
+    def iou(self, other: 'MaskTile') -> float:
+        """Intersection over union, computed only over the two tiles' joint box"""
+        x1, y1 = min(self.x, other.x), min(self.y, other.y)
+        x2 = max(self.x + self.tile.shape[1], other.x + other.tile.shape[1])
+        y2 = max(self.y + self.tile.shape[0], other.y + other.tile.shape[0])
+        if x2 <= x1 or y2 <= y1:
+            return 0.0
+
+        canvas = np.zeros((2, y2 - y1, x2 - x1), dtype=bool)
+        for layer, tile in enumerate((self, other)):
+            canvas[layer, tile.y - y1:tile.y - y1 + tile.tile.shape[0],
+                   tile.x - x1:tile.x - x1 + tile.tile.shape[1]] = tile.tile
+        union = np.count_nonzero(canvas[0] | canvas[1])
+        return np.count_nonzero(canvas[0] & canvas[1]) / union if union else 0.0
+
+    def region(self, image: np.ndarray) -> np.ndarray:
+        """View of image covering this tile, for in-place drawing"""
+        return image[self.y:self.y + self.tile.shape[0], self.x:self.x + self.tile.shape[1]]
+
+
+def as_tile(mask) -> MaskTile:
+    """Accept either a MaskTile or a full-frame array"""
+    return mask if isinstance(mask, MaskTile) else MaskTile.from_full(mask)
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+MyCV-Platform Model Backends
+Exports YOLO checkpoints to ONNX / OpenVINO once and loads them for CPU inference
+"""
+
+import os
+import importlib.util
+import numpy as np
+from typing import Any, Dict, List
+
+from app.utils.box_fusion import box_iou
+
+BACKENDS = ('pytorch', 'onnx', 'openvino')
+
+# Python package each exported backend needs at runtime
+BACKEND_PACKAGES = {
+    'onnx': 'onnxruntime',
+    'openvino': 'openvino'
+}
+
+
+def backend_available(backend: str) -> bool:
+    """Whether the runtime for a backend is importable"""
+    package = BACKEND_PACKAGES.get(backend)
+    return package is None or importlib.util.find_spec(package) is not None
+
+
+def exported_path(weights_path: str, backend: str) -> str:
+    """Where ultralytics writes the exported artifact, next to the .pt file"""
+    stem, _ = os.path.splitext(weights_path)
+    if backend == 'onnx':
+        return f"{stem}.onnx"
+    if backend == 'openvino':
+        return f"{stem}_openvino_model"
+    return weights_path
+
+
+def export_model(weights_path: str, backend: str, imgsz: int = 640) -> str:
+    """Export weights for a backend unless an up-to-date export is cached
+
+    Exports use a dynamic batch axis so batched letterboxed tensors work
+    the same way they do with the PyTorch checkpoint.
+    """
+    from ultralytics import YOLO
+
+    target = exported_path(weights_path, backend)
+    if backend == 'pytorch':
+        return target
+    if os.path.exists(target) and os.path.getmtime(target) >= os.path.getmtime(weights_path):
+        return target
+
+    exported = YOLO(weights_path).export(format=backend, imgsz=imgsz, dynamic=True, verbose=False)
+    return str(exported)
+
+
+def load_detector(weights_path: str, backend: str = 'pytorch', imgsz: int = 640):
+    """Load a YOLO detector through the requested backend"""
+    from ultralytics import YOLO
+
+    if backend == 'pytorch':
+        return YOLO(weights_path)
+    return YOLO(export_model(weights_path, backend, imgsz), task='detect')
+
+
+def compare_detections(reference: List[Dict[str, Any]], candidate: List[Dict[str, Any]],
+                       iou_threshold: float = 0.9, confidence_tolerance: float = 0.05) -> Dict[str, Any]:
+    """Match a backend's detections against the PyTorch reference for one image
+
+    Boxes are matched greedily by IoU within the same class. The check passes
+    when every box has a partner above iou_threshold and confidences differ
+    by at most confidence_tolerance.
+    """
+    report = {
+        'reference': len(reference),
+        'candidate': len(candidate),
+        'matched': 0,
+        'mean_iou': None,
+        'max_confidence_diff': 0.0,
+        'passed': len(reference) == len(candidate) == 0
+    }
+    if not reference or not candidate:
+        return report
+
+    ref_boxes = np.array([det['bbox'] for det in reference], dtype=np.float32)
+    cand_boxes = np.array([det['bbox'] for det in candidate], dtype=np.float32)
+    same_class = np.array([[r['class_id'] == c['class_id'] for c in candidate] for r in reference])
+    iou = np.where(same_class, box_iou(ref_boxes, cand_boxes), 0.0)
+
+    matched_ious = []
+    confidence_diffs = []
+    while iou.size and iou.max() >= iou_threshold:
+        r, c = np.unravel_index(np.argmax(iou), iou.shape)
+        matched_ious.append(float(iou[r, c]))
+        confidence_diffs.append(abs(reference[r]['confidence'] - candidate[c]['confidence']))
+        iou[r, :] = 0
+        iou[:, c] = 0
+
+    report['matched'] = len(matched_ious)
+    report['mean_iou'] = float(np.mean(matched_ious)) if matched_ious else 0.0
+    report['max_confidence_diff'] = float(max(confidence_diffs)) if confidence_diffs else 0.0
+    report['passed'] = (report['matched'] == len(reference) == len(candidate)
+                        and report['max_confidence_diff'] <= confidence_tolerance)
+    return report
@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+"""
+MyCV-Platform Model Cache
+Converts .pt checkpoints once into memory-mappable copies that worker processes load zero-copy
+"""
+
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+import multiprocessing
+from typing import Any, Dict, Optional, Tuple
+
+from termcolor import colored
+
+MODEL_CACHE_DIR = "data/models/cache"
+CONFIG_PATH = "config/models.yaml"
+MODELS_DIR = "data/models"
+
+# Fields of /proc/self/smaps_rollup reported by memory_usage(), in kB there
+SMAPS_FIELDS = {'Rss': 'rss_mb', 'Pss': 'pss_mb', 'Shared_Clean': 'shared_clean_mb'}
+
+
+def cache_path(weights_path: str, cache_dir: str = MODEL_CACHE_DIR) -> str:
+    """Where the memory-mappable copy of a checkpoint lives
+
+    The name is keyed on the checkpoint's resolved path, size and mtime, so
+    two checkpoints sharing a filename (e.g. best.pt of different runs) get
+    separate copies, and replacing a checkpoint gives it a new one.
+    """
+    real_path = os.path.realpath(weights_path)
+    stat = os.stat(real_path)
+    key = f"{real_path}:{stat.st_size}:{stat.st_mtime_ns}".encode()
+    stem, _ = os.path.splitext(os.path.basename(weights_path))
+    return os.path.join(cache_dir, f"{stem}.{hashlib.blake2b(key, digest_size=8).hexdigest()}.mmap.pt")
+
+
+def load_mapped(path: str) -> Dict[str, Any]:
+    """torch.load with tensor storages mapped from the file instead of read into the heap"""
+    import torch
+
+    try:
+        return torch.load(path, map_location='cpu', mmap=True, weights_only=False)
+    except TypeError:
+        # torch < 2.1 cannot mmap; the cache still loads, just without page sharing
+        return torch.load(path, map_location='cpu', weights_only=False)
+
+
+def _save_atomic(checkpoint: Dict[str, Any], target: str) -> None:
+    import torch
+
+    os.makedirs(os.path.dirname(target) or '.', exist_ok=True)
+    tmp_path = f"{target}.{os.getpid()}.tmp"
+    torch.save(checkpoint, tmp_path)
+    os.replace(tmp_path, target)
+
+
+def build_cache(weights_path: str, kind: str, cache_dir: str = MODEL_CACHE_DIR) -> str:
+    """Write the memory-mappable copy of a YOLO ('yolo') or SAM2 ('sam') checkpoint
+
+    ultralytics checkpoints hold FP16 weights that are converted to FP32,
+    and YOLO's Conv+BN pairs are fused, on every load; both allocate new
+    tensors per process. The cache stores the module after those steps, so
+    loading it needs no conversion and every process maps the same pages.
+    A changed checkpoint maps to a new cache_path, so it is rebuilt there.
+    """
+    if kind not in ('yolo', 'sam'):
+        raise ValueError(f"Unknown model kind: {kind}")
+    target = cache_path(weights_path, cache_dir)
+    if os.path.exists(target):
+        return target
+
+    if kind == 'sam':
+        from ultralytics import SAM
+
+        model = SAM(weights_path).model.float().eval()
+        _save_atomic({'model': model, 'source': weights_path}, target)
+    else:
+        from ultralytics import YOLO
+
+        yolo = YOLO(weights_path)
+        model = yolo.model.float().fuse(verbose=False).eval()
+        train_args = (yolo.ckpt or {}).get('train_args', {})
+        _save_atomic({'model': model, 'train_args': train_args, 'source': weights_path}, target)
+    return target
+
+
+_wrappers = {}
+
+
+def _mapped_model_class(kind: str):
+    """YOLO/SAM subclass whose _load maps a cache file instead of unpickling a private copy"""
+    if kind in _wrappers:
+        return _wrappers[kind]
+
+    from ultralytics import SAM, YOLO
+
+    if kind == 'sam':
+        class MappedSAM(SAM):
+            def _load(self, weights, task=None):
+                self.model = load_mapped(weights)['model'].eval()
+
+        _wrappers[kind] = MappedSAM
+    else:
+        class MappedYOLO(YOLO):
+            def _load(self, weights, task=None):
+                # Mirrors Model._load for .pt files, minus the copying attempt_load_one_weight
+                checkpoint = load_mapped(weights)
+                self.model = checkpoint['model'].eval()
+                self.ckpt = checkpoint
+                self.task = self.model.args['task']
+                self.overrides = self.model.args = self._reset_ckpt_args(self.model.args)
+                self.ckpt_path = weights
+                self.overrides['model'] = weights
+                self.overrides['task'] = self.task
+                self.model_name = weights
+
+        _wrappers[kind] = MappedYOLO
+    return _wrappers[kind]
+
+
+def load_cached_yolo(weights_path: str, cache_dir: str = MODEL_CACHE_DIR):
+    """ultralytics YOLO model backed by the memory-mapped cache, built on first use"""
+    return _mapped_model_class('yolo')(build_cache(weights_path, 'yolo', cache_dir))
+
+
+def load_cached_sam(weights_path: str, cache_dir: str = MODEL_CACHE_DIR):
+    """ultralytics SAM model backed by the memory-mapped cache, built on first use"""
+    return _mapped_model_class('sam')(build_cache(weights_path, 'sam', cache_dir))
+
+
+def memory_usage() -> Dict[str, Optional[float]]:
+    """RSS, PSS and clean shared memory of this process in MB (Linux only, else None)
+
+    PSS splits every shared page between the processes mapping it, so the
+    PSS of all workers added up is what they really cost together.
+    """
+    usage = {name: None for name in SMAPS_FIELDS.values()}
+    try:
+        with open('/proc/self/smaps_rollup', 'r') as f:
+            for line in f:
+                field, _, value = line.partition(':')
+                if field in SMAPS_FIELDS:
+                    usage[SMAPS_FIELDS[field]] = int(value.split()[0]) / 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return usage
+
+
+def configured_checkpoints(config_path: str = CONFIG_PATH, models_dir: str = MODELS_DIR,
+                           cache_dir: str = MODEL_CACHE_DIR) -> Dict[str, Tuple[str, str]]:
+    """Checkpoints named in config/models.yaml that exist under models_dir: filename -> (path, kind)"""
+    import yaml
+
+    with open(config_path, 'r') as f:
+        config = yaml.safe_load(f)
+
+    found = {}
+    cache_root = os.path.abspath(cache_dir)
+    for root, _, names in os.walk(models_dir):
+        if os.path.abspath(root).startswith(cache_root):
+            continue
+        for name in sorted(names):
+            found.setdefault(name, os.path.join(root, name))
+
+    checkpoints = {}
+    for section in ('yolo', 'trained', 'sam'):
+        for entry in ((config.get(section) or {}).get('models') or {}).values():
+            filename = entry.get('filename')
+            if filename in found and filename.endswith('.pt'):
+                checkpoints[filename] = (found[filename], 'sam' if section == 'sam' else 'yolo')
+    return checkpoints
+
+
+def _measure_worker(mode, checkpoints, cache_dir, loaded, done, results):
+    """Load every checkpoint in a fresh process and report time and memory"""
+    # Import before timing so only loading is measured
+    import torch
+    from ultralytics import SAM, YOLO
+
+    report = {'mode': mode, 'pid': os.getpid()}
+    models = []
+    try:
+        start = time.perf_counter()
+        for path, kind in checkpoints.values():
+            if mode == 'mmap':
+                models.append(load_cached_sam(path, cache_dir) if kind == 'sam' else load_cached_yolo(path, cache_dir))
+            else:
+                models.append(SAM(path) if kind == 'sam' else YOLO(path))
+        report['load_seconds'] = time.perf_counter() - start
+        report['after_load'] = memory_usage()
+        # Measure PSS once every worker holds its models, so shared pages are split
+        loaded.wait(timeout=600)
+        report.update(memory_usage())
+    except Exception as e:
+        report['error'] = f"{type(e).__name__}: {e}"
+        loaded.abort()
+    results.put(report)
+    try:
+        done.wait(timeout=60)
+    except Exception:
+        pass
+
+
+def compare_loading(checkpoints: Dict[str, Tuple[str, str]], workers: int = 2,
+                    cache_dir: str = MODEL_CACHE_DIR) -> Dict[str, Any]:
+    """Load time and per-worker memory for pickled checkpoints vs the mmap cache
+
+    Each mode starts `workers` spawned processes that load every checkpoint
+    and stay alive together while memory is measured.
+    """
+    for path, kind in checkpoints.values():
+        build_cache(path, kind, cache_dir)
+
+    context = multiprocessing.get_context('spawn')
+    report = {'workers': workers, 'checkpoints': {name: path for name, (path, _) in checkpoints.items()}, 'modes': {}}
+    for mode in ('pickle', 'mmap'):
+        loaded = context.Barrier(workers)
+        done = context.Barrier(workers + 1)
+        results = context.Queue()
+        processes = [context.Process(target=_measure_worker, args=(mode, checkpoints, cache_dir, loaded, done, results))
+                     for _ in range(workers)]
+        for process in processes:
+            process.start()
+        worker_reports = [results.get(timeout=900) for _ in processes]
+        try:
+            done.wait(timeout=60)
+        except Exception:
+            pass
+        for process in processes:
+            process.join()
+
+        measured = [worker for worker in worker_reports if 'error' not in worker]
+        summary = {'workers': worker_reports}
+        if measured:
+            summary['mean_load_seconds'] = sum(w['load_seconds'] for w in measured) / len(measured)
+            for field in SMAPS_FIELDS.values():
+                values = [w[field] for w in measured if w[field] is not None]
+                summary[f"mean_{field}"] = sum(values) / len(values) if values else None
+            pss = [w['pss_mb'] for w in measured if w['pss_mb'] is not None]
+            summary['total_pss_mb'] = sum(pss) if pss else None
+        report['modes'][mode] = summary
+    return report
+
+
+def format_mb(value: Optional[float]) -> str:
+    return f"{value:.0f} MB" if value is not None else "n/a"
+
+
+def main():
+    """Build the cache for the configured checkpoints and compare loading with and without it"""
+    parser = argparse.ArgumentParser(description="Build the memory-mapped model cache and report its effect")
+    parser.add_argument('--config', default=CONFIG_PATH, help=f"Model configuration (default: {CONFIG_PATH})")
+    parser.add_argument('--models-dir', default=MODELS_DIR,
+                        help=f"Where the configured checkpoints are looked up (default: {MODELS_DIR})")
+    parser.add_argument('--cache-dir', default=MODEL_CACHE_DIR,
+                        help=f"Where the memory-mapped copies are written (default: {MODEL_CACHE_DIR})")
+    parser.add_argument('--workers', type=int, default=2,
+                        help="Concurrent processes per mode in the report (default: 2)")
+    parser.add_argument('--build-only', action='store_true', help="Build the cache and skip the report")
+    parser.add_argument('--output', default="data/output/benchmarks/model_cache.json",
+                        help="Where to write the JSON report")
+    args = parser.parse_args()
+
+    checkpoints = configured_checkpoints(args.config, args.models_dir, args.cache_dir)
+    if not checkpoints:
+        print(colored(f"ERROR: no checkpoint from {args.config} found under {args.models_dir}", 'red'))
+        sys.exit(1)
+
+    for name, (path, kind) in checkpoints.items():
+        start = time.perf_counter()
+        target = build_cache(path, kind, args.cache_dir)
+        print(colored(f"{name}: {target} ({time.perf_counter() - start:.1f}s)", 'green'))
+    if args.build_only:
+        return
+
+    report = compare_loading(checkpoints, args.workers, args.cache_dir)
+    for mode, summary in report['modes'].items():
+        for worker in summary['workers']:
+            if 'error' in worker:
+                print(colored(f"ERROR: {mode} worker {worker['pid']}: {worker['error']}", 'red'))
+        if 'mean_load_seconds' not in summary:
+            continue
+        print(f"{mode:<7} load {summary['mean_load_seconds']:.2f}s/worker, RSS {format_mb(summary['mean_rss_mb'])}, "
+              f"PSS {format_mb(summary['mean_pss_mb'])}/worker, {format_mb(summary['total_pss_mb'])} "
+              f"across {report['workers']} workers")
+
+    os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(colored(f"Report saved: {args.output}", 'green'))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+MyCV-Platform INT8 Quantization
+Builds and caches INT8 variants of best.pt (static, ONNX Runtime) and SAM2_b (dynamic, PyTorch)
+"""
+
+import os
+from typing import Callable, List, Sequence, Union
+
+from app.utils.image_frame import ImageFrame
+from app.utils.model_backends import backend_available, export_model
+
+
+def int8_path(weights_path: str, suffix: str) -> str:
+    """Cache location for an INT8 artifact next to its FP32 weights"""
+    stem, _ = os.path.splitext(weights_path)
+    return f"{stem}.int8{suffix}"
+
+
+def is_fresh(artifact_path: str, source_path: str) -> bool:
+    """An artifact is reusable when it exists and is newer than its source"""
+    return os.path.exists(artifact_path) and os.path.getmtime(artifact_path) >= os.path.getmtime(source_path)
+
+
+def calibration_frames(image_dir: str, limit: int = 32) -> List[ImageFrame]:
+    """Deterministic calibration set: the first `limit` .jpg files by name (none if image_dir is missing)"""
+    if not os.path.isdir(image_dir):
+        return []
+    names = sorted(f for f in os.listdir(image_dir) if f.endswith('.jpg'))[:limit]
+    return [ImageFrame.from_path(os.path.join(image_dir, name)) for name in names]
+
+
+def quantize_yolo_int8(weights_path: str,
+                       frames: Union[Sequence[ImageFrame], Callable[[], Sequence[ImageFrame]]],
+                       imgsz: int = 640) -> str:
+    """Static INT8 quantization of a YOLO checkpoint through ONNX Runtime
+
+    Activations are calibrated on the frames' letterboxed inputs, which are
+    exactly what the detector sees at inference time. frames may be a
+    callable, so the calibration set is only decoded when the cache is
+    stale. Returns the path of the cached .int8.onnx model.
+    """
+    target = int8_path(weights_path, '.onnx')
+    if is_fresh(target, weights_path):
+        return target
+    if not backend_available('onnx'):
+        raise RuntimeError("onnxruntime is required for INT8 YOLO quantization")
+    if callable(frames):
+        frames = frames()
+    if not frames:
+        raise ValueError("INT8 calibration needs at least one image")
+
+    import onnx
+    from onnxruntime.quantization import (
+        CalibrationDataReader, QuantFormat, QuantType, quantize_static
+    )
+
+    fp32_path = export_model(weights_path, 'onnx', imgsz)
+    fp32_model = onnx.load(fp32_path)
+    input_name = fp32_model.graph.input[0].name
+
+    class LetterboxCalibrationReader(CalibrationDataReader):
+        def __init__(self):
+            self.inputs = iter([{input_name: frame.letterbox(imgsz)[0][None]} for frame in frames])
+
+        def get_next(self):
+            return next(self.inputs, None)
+
+    quantize_static(fp32_path, target, LetterboxCalibrationReader(),
+                    quant_format=QuantFormat.QDQ, activation_type=QuantType.QUInt8,
+                    weight_type=QuantType.QInt8, per_channel=True)
+
+    # Keep the ultralytics metadata (class names, stride, imgsz) on the INT8 model
+    int8_model = onnx.load(target)
+    del int8_model.metadata_props[:]
+    int8_model.metadata_props.extend(fp32_model.metadata_props)
+    onnx.save(int8_model, target)
+
+    for frame in frames:
+        frame.release_cache()
+    return target
+
+
+def quantize_sam_int8(sam_model, weights_path: str):
+    """Dynamic INT8 quantization of SAM2's Linear layers, cached on disk
+
+    The Hiera image encoder and the mask decoder are dominated by Linear
+    layers, which dynamic quantization covers without calibration data.
+    Replaces sam_model.model in place and returns the quantized module.
+    """
+    import torch
+
+    target = int8_path(weights_path, '.pt')
+    if is_fresh(target, weights_path):
+        quantized = torch.load(target, map_location='cpu', weights_only=False)
+    else:
+        quantized = torch.ao.quantization.quantize_dynamic(
+            sam_model.model.cpu().eval(), {torch.nn.Linear}, dtype=torch.qint8
+        )
+        torch.save(quantized, target)
+
+    sam_model.model = quantized
+    sam_model.predictor = None
+    return quantized
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+MyCV-Platform Result Manifest
+Tracks which (image, model, SAM checkpoint) results are already on disk so re-runs only redo stale stages
+"""
+
+import os
+import json
+import hashlib
+import threading
+from typing import Any, Dict, List, Optional
+
+MANIFEST_VERSION = 1
+
+# Detector models each result set depends on
+RESULT_DEPENDENCIES = {
+    'yolo11m': ['yolo11m'],
+    'best_pt': ['best_pt'],
+    'fused': ['yolo11m', 'best_pt']
+}
+
+
+def fingerprint(*parts: Any) -> str:
+    """Short stable hash of JSON-serializable parts"""
+    payload = json.dumps(parts, sort_keys=True, default=str).encode()
+    return hashlib.blake2b(payload, digest_size=12).hexdigest()
+
+
+class ResultManifest:
+    """manifest.json in the results directory
+
+    Each image is keyed by name and remembers, per result set, the
+    fingerprint of its detection stage (image content + detector weights +
+    detector settings) and of its segmentation stage (detection fingerprint
+    + SAM2 checkpoint + mask settings). A stage re-runs only when its
+    fingerprint changes. Mask metrics are a third stage that only depends
+    on the segmentation, so they can be added to results already on disk. File hashes are cached by size and mtime so
+    unchanged files are not re-read.
+    """
+
+    def __init__(self, output_dir: str, model_paths: Dict[str, str],
+                 detect_config: Optional[Dict[str, Any]] = None, segment_config: Optional[Dict[str, Any]] = None,
+                 dependencies: Optional[Dict[str, List[str]]] = None):
+        self.path = os.path.join(output_dir, "manifest.json")
+        self.dependencies = dict(RESULT_DEPENDENCIES, **(dependencies or {}))
+        self.detect_config = detect_config or {}
+        self.segment_config = segment_config or {}
+        self.files = {}
+        self.images = {}
+        self._lock = threading.Lock()
+        self._load()
+        self.model_hashes = {key: self.file_hash(path) for key, path in model_paths.items() if os.path.exists(path)}
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def _load(self) -> None:
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get('version') == MANIFEST_VERSION:
+            self.files = data.get('files', {})
+            self.images = data.get('images', {})
+
+    def save(self) -> None:
+        """Atomically write the manifest"""
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        with self._lock:
+            data = {'version': MANIFEST_VERSION, 'files': self.files, 'images': self.images}
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(data, f, indent=1)
+            os.replace(tmp_path, self.path)
+
+    def file_hash(self, path: str) -> str:
+        """Content hash of a file, reused while its size and mtime are unchanged"""
+        stat = os.stat(path)
+        key = os.path.abspath(path)
+        cached = self.files.get(key)
+        if cached and cached['size'] == stat.st_size and cached['mtime'] == stat.st_mtime:
+            return cached['hash']
+
+        digest = hashlib.blake2b(digest_size=16)
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+        with self._lock:
+            self.files[key] = {'size': stat.st_size, 'mtime': stat.st_mtime, 'hash': digest.hexdigest()}
+        return self.files[key]['hash']
+
+    def stage_keys(self, image_path: str, result_key: str) -> Dict[str, str]:
+        """Current detection and segmentation fingerprints for one result set"""
+        detect = fingerprint(
+            self.file_hash(image_path),
+            [self.model_hashes.get(model) for model in self.dependencies[result_key]],
+            self.detect_config.get(result_key, self.detect_config.get('*'))
+        )
+        segment = fingerprint(detect, self.model_hashes.get('sam2_b'), self.segment_config)
+        return {'detect': detect, 'segment': segment}
+
+    def plan(self, image_path: str, result_keys: List[str]) -> Dict[str, Dict[str, bool]]:
+        """Which stages of each result set need to run for this image"""
+        recorded = self.images.get(os.path.basename(image_path), {})
+        plan = {}
+        for result_key in result_keys:
+            current = self.stage_keys(image_path, result_key)
+            previous = recorded.get(result_key, {})
+            detect = previous.get('detect') != current['detect']
+            segment = detect or previous.get('segment') != current['segment']
+            plan[result_key] = {
+                'detect': detect,
+                'segment': segment,
+                'metrics': segment or previous.get('metrics') != current['segment']
+            }
+        return plan
+
+    def is_complete(self, image_path: str, result_keys: List[str], metrics: bool = False) -> bool:
+        """True when every stage of every result set is up to date (including metrics, if asked)"""
+        return not any(stages['segment'] or (metrics and stages['metrics'])
+                       for stages in self.plan(image_path, result_keys).values())
+
+    def record(self, image_path: str, result_key: str, metrics: bool = False) -> None:
+        """Mark a result set as written with the current fingerprints
+
+        metrics=True also marks its mask metrics as written; otherwise any
+        earlier metrics record of the result set no longer counts.
+        """
+        keys = self.stage_keys(image_path, result_key)
+        if metrics:
+            keys['metrics'] = keys['segment']
+        with self._lock:
+            self.images.setdefault(os.path.basename(image_path), {})[result_key] = keys
+
+    def merge(self, other: 'ResultManifest') -> None:
+        """Fold in records made by another copy (e.g. a worker process)"""
+        with self._lock:
+            self.files.update(other.files)
+            for image_name, results in other.images.items():
+                self.images.setdefault(image_name, {}).update(results)
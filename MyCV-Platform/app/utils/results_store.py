@@ -0,0 +1,321 @@
+#!/usr/bin/env python3
+"""
+MyCV-Platform Results Store
+Append-only columnar store for detections and bit-packed masks, memory-mapped for reads
+"""
+
+import os
+import json
+import shutil
+import threading
+import numpy as np
+from typing import Any, Dict, List, Optional
+
+from app.utils.mask_tile import MaskTile, as_tile
+
+STORE_VERSION = 2
+
+# Up to this many models can be named as a fused detection's sources
+MAX_SOURCES = 8
+
+DETECTION_DTYPE = np.dtype([
+    ('write_id', '<u4'),            # one id per append(); the newest write of an (image, model) wins
+    ('image_id', '<u4'),
+    ('model_id', '<u2'),
+    ('class_id', '<i4'),
+    ('class_name_id', '<u4'),
+    ('confidence', '<f4'),
+    ('bbox', '<f4', (4,)),
+    ('source_mask', '<u4'),         # bit i set: model_id i proposed this (fused) detection
+    ('source_confidences', '<f4', (MAX_SOURCES,)),
+    ('segmented', '<i1'),           # SAM policy mark: 1 / 0, -1 when the detection has none
+    ('skip_reason_id', '<u2'),      # 1 + index into skip_reasons, 0 when not skipped
+    ('mask_offset', '<u8'),         # byte offset of the packed tile in masks.bin
+    ('mask_length', '<u4'),         # 0 when the detection has no mask
+    ('mask_x', '<u4'),
+    ('mask_y', '<u4'),
+    ('mask_width', '<u4'),
+    ('mask_height', '<u4'),
+    ('frame_height', '<u4'),
+    ('frame_width', '<u4'),
+])
+
+DETECTIONS_FILE = 'detections.bin'
+MASKS_FILE = 'masks.bin'
+INDEX_FILE = 'index.json'
+
+
+class ResultsStore:
+    """A directory of fixed-width detection records plus one packed mask blob
+
+    detections.bin is a flat array of DETECTION_DTYPE records and masks.bin
+    the concatenated np.packbits of every mask tile; both are only ever
+    appended to and are read through np.memmap without copying. Each file
+    is mapped once and remapped only after it has grown.
+    index.json holds the string tables (images, models, class names, SAM
+    skip reasons) and
+    the newest write id per (image, model), so re-processing an image
+    supersedes its old rows instead of rewriting the files.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        self._lock = threading.Lock()
+        self.images = []
+        self.models = []
+        self.class_names = []
+        self.skip_reasons = []
+        self.latest = {}
+        self.next_write_id = 1
+        self._maps = {}
+        self._load_index()
+        self._truncate_unindexed()
+        self._lookup = {
+            'images': {name: i for i, name in enumerate(self.images)},
+            'models': {name: i for i, name in enumerate(self.models)},
+            'class_names': {name: i for i, name in enumerate(self.class_names)},
+            'skip_reasons': {name: i for i, name in enumerate(self.skip_reasons)}
+        }
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.root, name)
+
+    def _load_index(self) -> None:
+        if not os.path.exists(self._path(INDEX_FILE)):
+            return
+        with open(self._path(INDEX_FILE), 'r') as f:
+            index = json.load(f)
+        if index.get('version') != STORE_VERSION:
+            raise ValueError(f"Unsupported results store version: {index.get('version')}")
+        self.images = index['images']
+        self.models = index['models']
+        self.class_names = index['class_names']
+        self.skip_reasons = index['skip_reasons']
+        self.latest = index['latest']
+        self.next_write_id = index['next_write_id']
+
+    def _truncate_unindexed(self) -> None:
+        """Drop detection rows appended after the last flush
+
+        A run that stops before flush() leaves rows whose write ids
+        index.json never handed out; the next run would reuse those ids and
+        read the orphans back as its own. Write ids only grow, so the
+        orphans are always the tail of detections.bin.
+        """
+        path = self._path(DETECTIONS_FILE)
+        if not os.path.exists(path):
+            return
+        rows = os.path.getsize(path) // DETECTION_DTYPE.itemsize
+        if rows:
+            write_ids = np.memmap(path, dtype=DETECTION_DTYPE, mode='r', shape=(rows,))['write_id']
+            rows = int(np.searchsorted(write_ids, self.next_write_id))
+            del write_ids
+        if rows * DETECTION_DTYPE.itemsize != os.path.getsize(path):
+            os.truncate(path, rows * DETECTION_DTYPE.itemsize)
+
+    def _mapped(self, name: str, dtype) -> np.ndarray:
+        """Read-only map of one data file, reused until the file grows"""
+        path = self._path(name)
+        size = os.path.getsize(path) if os.path.exists(path) else 0
+        cached = self._maps.get(name)
+        if cached is None or cached[0] != size:
+            rows = size // np.dtype(dtype).itemsize
+            data = np.memmap(path, dtype=dtype, mode='r', shape=(rows,)) if rows else np.zeros(0, dtype=dtype)
+            self._maps[name] = cached = (size, data)
+        return cached[1]
+
+    def _write_ids(self) -> np.ndarray:
+        """Contiguous copy of the write_id column, rebuilt only when detections.bin grows"""
+        records = self.records(latest_only=False)
+        cached = self._maps.get('write_ids')
+        if cached is None or cached[0] is not records:
+            self._maps['write_ids'] = cached = (records, np.ascontiguousarray(records['write_id']))
+        return cached[1]
+
+    def flush(self) -> None:
+        """Atomically write index.json; records appended before this become visible to readers"""
+        with self._lock:
+            index = {
+                'version': STORE_VERSION,
+                'images': self.images,
+                'models': self.models,
+                'class_names': self.class_names,
+                'skip_reasons': self.skip_reasons,
+                'latest': self.latest,
+                'next_write_id': self.next_write_id
+            }
+            tmp_path = self._path(INDEX_FILE + '.tmp')
+            with open(tmp_path, 'w') as f:
+                json.dump(index, f)
+            os.replace(tmp_path, self._path(INDEX_FILE))
+
+    def _intern(self, table: str, name: str) -> int:
+        lookup = self._lookup[table]
+        if name not in lookup:
+            lookup[name] = len(lookup)
+            getattr(self, table).append(name)
+        return lookup[name]
+
+    def append(self, image_name: str, model: str, detections: List[Dict[str, Any]],
+               masks: Optional[List[Dict[str, Any]]] = None) -> int:
+        """Append one (image, model) result
+
+        A mask belongs to detections[mask['detection_index']] when it has
+        that key (not every detection was segmented), else masks[i] belongs
+        to detections[i].
+        """
+        masks_by_detection = {mask.get('detection_index', i): mask for i, mask in enumerate(masks or [])}
+        with self._lock:
+            write_id = self.next_write_id
+            self.next_write_id += 1
+            image_id = self._intern('images', image_name)
+            model_id = self._intern('models', model)
+
+            records = np.zeros(len(detections), dtype=DETECTION_DTYPE)
+            with open(self._path(MASKS_FILE), 'ab') as mask_file:
+                mask_offset = mask_file.tell()
+                for i, det in enumerate(detections):
+                    record = records[i]
+                    record['write_id'] = write_id
+                    record['image_id'] = image_id
+                    record['model_id'] = model_id
+                    record['class_id'] = det['class_id']
+                    record['class_name_id'] = self._intern('class_names', det['class_name'])
+                    record['confidence'] = det['confidence']
+                    record['bbox'] = det['bbox']
+                    record['segmented'] = int(det['segmented']) if 'segmented' in det else -1
+                    if det.get('sam_skip_reason') is not None:
+                        record['skip_reason_id'] = self._intern('skip_reasons', det['sam_skip_reason']) + 1
+                    for source, confidence in det.get('source_confidences', {}).items():
+                        source_id = self._intern('models', source)
+                        if source_id < MAX_SOURCES:
+                            record['source_mask'] |= 1 << source_id
+                            record['source_confidences'][source_id] = confidence
+
+                    if i in masks_by_detection:
+                        tile = as_tile(masks_by_detection[i]['mask'])
+                        packed = np.packbits(tile.tile, axis=None)
+                        mask_file.write(packed.tobytes())
+                        record['mask_offset'] = mask_offset
+                        record['mask_length'] = packed.size
+                        record['mask_x'], record['mask_y'] = tile.x, tile.y
+                        record['mask_height'], record['mask_width'] = tile.tile.shape
+                        record['frame_height'], record['frame_width'] = tile.frame_shape
+                        mask_offset += packed.size
+
+            with open(self._path(DETECTIONS_FILE), 'ab') as detection_file:
+                detection_file.write(records.tobytes())
+            self.latest[f"{image_id}:{model_id}"] = write_id
+        return write_id
+
+    def records(self, latest_only: bool = True) -> np.ndarray:
+        """All detection records, memory-mapped (a filtered copy when latest_only)"""
+        records = self._mapped(DETECTIONS_FILE, DETECTION_DTYPE)
+        if not latest_only:
+            return records
+        return records[np.isin(records['write_id'], np.fromiter(self.latest.values(), dtype=np.uint32))]
+
+    def query(self, class_name: Optional[str] = None, min_confidence: Optional[float] = None,
+              image: Optional[str] = None, model: Optional[str] = None, latest_only: bool = True) -> np.ndarray:
+        """Records filtered by class name, confidence, image and/or model"""
+        records = self.records(latest_only)
+        keep = np.ones(len(records), dtype=bool)
+        for column, table, name in (('class_name_id', 'class_names', class_name),
+                                    ('image_id', 'images', image),
+                                    ('model_id', 'models', model)):
+            if name is not None:
+                if name not in self._lookup[table]:
+                    return records[:0]
+                keep &= records[column] == self._lookup[table][name]
+        if min_confidence is not None:
+            keep &= records['confidence'] >= min_confidence
+        return records[keep]
+
+    def mask(self, record) -> Optional[MaskTile]:
+        """Unpack one record's mask tile from the memory-mapped blob"""
+        if record['mask_length'] == 0:
+            return None
+        offset = int(record['mask_offset'])
+        blob = self._mapped(MASKS_FILE, np.uint8)[offset:offset + int(record['mask_length'])]
+        height, width = int(record['mask_height']), int(record['mask_width'])
+        tile = np.unpackbits(blob, count=height * width).reshape(height, width).astype(bool)
+        return MaskTile(tile, record['mask_x'], record['mask_y'], (record['frame_height'], record['frame_width']))
+
+    def to_detection(self, record) -> Dict[str, Any]:
+        """A record as the detection dict save_results writes to JSON"""
+        detection = {
+            'bbox': [float(v) for v in record['bbox']],
+            'confidence': float(record['confidence']),
+            'class_id': int(record['class_id']),
+            'class_name': self.class_names[record['class_name_id']]
+        }
+        if record['source_mask']:
+            source_ids = [i for i in range(MAX_SOURCES) if record['source_mask'] & (1 << i)]
+            source_confidences = {self.models[i]: float(record['source_confidences'][i]) for i in source_ids}
+            detection['sources'] = sorted(source_confidences)
+            detection['source_confidences'] = source_confidences
+        if record['segmented'] >= 0:
+            detection['segmented'] = bool(record['segmented'])
+        if record['skip_reason_id']:
+            detection['sam_skip_reason'] = self.skip_reasons[record['skip_reason_id'] - 1]
+        return detection
+
+    def result(self, image_name: str, model: str):
+        """(detections, masks) of the newest write for one image and model, or None"""
+        if image_name not in self._lookup['images'] or model not in self._lookup['models']:
+            return None
+        key = f"{self._lookup['images'][image_name]}:{self._lookup['models'][model]}"
+        if key not in self.latest:
+            return None
+        # Rows are appended in write id order, so one write is a contiguous span
+        write_ids = self._write_ids()
+        start, end = np.searchsorted(write_ids, [self.latest[key], self.latest[key] + 1])
+        records = self.records(latest_only=False)[start:end]
+
+        detections = [self.to_detection(record) for record in records]
+        masks = []
+        for index, (record, detection) in enumerate(zip(records, detections)):
+            tile = self.mask(record)
+            if tile is not None:
+                masks.append(dict(detection, mask=tile, detection_index=index))
+        return detections, masks
+
+    def results(self):
+        """Yield (image_name, model) for every stored result"""
+        for key in self.latest:
+            image_id, model_id = (int(part) for part in key.split(':'))
+            yield self.images[image_id], self.models[model_id]
+
+    def export_json(self, output_dir: str, mask_format: Optional[str] = None) -> int:
+        """Write the per-image <image>_<model>_detections.json files (and masks) save_results would"""
+        from app.utils.mask_codec import mask_file_path, write_masks
+
+        os.makedirs(output_dir, exist_ok=True)
+        exported = 0
+        for image_name, model in self.results():
+            detections, masks = self.result(image_name, model)
+            result_name = f"{image_name}_{model}"
+            with open(os.path.join(output_dir, f"{result_name}_detections.json"), 'w') as f:
+                json.dump(detections, f, indent=2)
+            if mask_format and mask_format != 'png' and masks:
+                write_masks(mask_file_path(output_dir, result_name, mask_format), masks, mask_format)
+            elif mask_format == 'png' and masks:
+                import cv2
+
+                mask_dir = os.path.join(output_dir, f"{result_name}_masks")
+                os.makedirs(mask_dir, exist_ok=True)
+                for i, mask_data in enumerate(masks):
+                    mask_file = os.path.join(mask_dir, f"mask_{i+1}_{mask_data['class_name']}.png")
+                    cv2.imwrite(mask_file, mask_data['mask'].to_full().astype(np.uint8) * 255)
+            exported += 1
+        return exported
+
+    def merge(self, other_root: str, remove: bool = False) -> None:
+        """Append every current result of another store (e.g. a worker's) to this one"""
+        other = ResultsStore(other_root)
+        for image_name, model in other.results():
+            detections, masks = other.result(image_name, model)
+            self.append(image_name, model, detections, masks)
+        if remove:
+            shutil.rmtree(other_root, ignore_errors=True)
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+MyCV-Platform SAM2 Embedding Cache
+Keeps SAM2 image-encoder outputs so several box-prompt sets reuse one encoder pass
+"""
+
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+
+def feature_nbytes(features: Any) -> int:
+    """Approximate memory held by a (nested) SAM2 feature structure"""
+    if hasattr(features, 'element_size') and hasattr(features, 'nelement'):
+        return features.element_size() * features.nelement()
+    if hasattr(features, 'nbytes'):
+        return int(features.nbytes)
+    if isinstance(features, dict):
+        return sum(feature_nbytes(value) for value in features.values())
+    if isinstance(features, (list, tuple)):
+        return sum(feature_nbytes(value) for value in features)
+    return 0
+
+
+class SamEmbeddingCache:
+    """LRU cache of SAM2 image embeddings keyed by image content hash
+
+    Bounded both by entry count and by total feature bytes; the least
+    recently used embedding is evicted first.
+    """
+
+    def __init__(self, max_entries: int = 4, max_bytes: int = 512 * 1024 ** 2):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._entries
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return cached features for key, or None on a miss"""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def put(self, key: str, features: Any) -> None:
+        """Store features for key, evicting old entries to stay within bounds"""
+        size = feature_nbytes(features)
+        if key in self._entries:
+            self.current_bytes -= self._entries.pop(key)[1]
+        if self.max_entries <= 0 or size > self.max_bytes:
+            return
+
+        self._entries[key] = (features, size)
+        self.current_bytes += size
+
+        while len(self._entries) > self.max_entries or self.current_bytes > self.max_bytes:
+            _, (_, evicted_size) = self._entries.popitem(last=False)
+            self.current_bytes -= evicted_size
+            self.evictions += 1
+
+    def clear(self) -> None:
+        """Drop all cached embeddings"""
+        self._entries.clear()
+        self.current_bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and current memory use"""
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'bytes': self.current_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / lookups if lookups else 0.0
+        }
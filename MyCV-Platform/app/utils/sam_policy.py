@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+MyCV-Platform SAM Policy
+Per-class rules deciding which detections are worth a SAM2 prompt and which keep only their box
+"""
+
+import threading
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+MASK_MODES = ('required', 'bbox_only')
+
+# Used for any key missing from the `sam_policy` section of config/models.yaml
+SAM_POLICY_DEFAULTS = {
+    'mask': 'required',
+    'min_confidence': 0.0,
+    'min_box_area': 0.0
+}
+
+
+def load_sam_policy(config_path: str) -> 'SamPolicy':
+    """The `sam_policy` section of config/models.yaml as a SamPolicy"""
+    import yaml
+
+    with open(config_path, 'r') as f:
+        config = yaml.safe_load(f) or {}
+    section = config.get('sam_policy') or {}
+    return SamPolicy(section.get('default'), section.get('classes'))
+
+
+class SamPolicy:
+    """Default and per-class rules for prompting SAM2
+
+    A rule has a mask mode ('required' or 'bbox_only'), a minimum
+    detection confidence and a minimum box area in pixels; class rules
+    override the default key by key. The policy also counts how many
+    prompts it let through and why the others were skipped.
+    """
+
+    def __init__(self, default: Optional[Dict[str, Any]] = None,
+                 classes: Optional[Dict[str, Dict[str, Any]]] = None):
+        self.default = dict(SAM_POLICY_DEFAULTS, **(default or {}))
+        self.classes = {name: dict(self.default, **(rule or {})) for name, rule in (classes or {}).items()}
+        for name, rule in [('default', self.default)] + list(self.classes.items()):
+            if rule['mask'] not in MASK_MODES:
+                raise ValueError(f"Unknown SAM policy mask mode for {name}: {rule['mask']}")
+        self.considered = 0
+        self.skipped = Counter()
+        self.skipped_classes = Counter()
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def rule(self, class_name: str) -> Dict[str, Any]:
+        return self.classes.get(class_name, self.default)
+
+    def skip_reason(self, detection: Dict[str, Any]) -> Optional[str]:
+        """Why a detection gets no SAM2 prompt, or None when it should be segmented"""
+        rule = self.rule(detection['class_name'])
+        if rule['mask'] == 'bbox_only':
+            return 'bbox_only'
+        if detection['confidence'] < rule['min_confidence']:
+            return 'low_confidence'
+        x1, y1, x2, y2 = detection['bbox']
+        if max(0.0, x2 - x1) * max(0.0, y2 - y1) < rule['min_box_area']:
+            return 'small_box'
+        return None
+
+    def select(self, detections: List[Dict[str, Any]]) -> Tuple[List[int], Dict[int, str]]:
+        """Indices of the detections to prompt SAM2 with, and the skip reason of every other one"""
+        prompt_indices = []
+        skipped = {}
+        for index, detection in enumerate(detections):
+            reason = self.skip_reason(detection)
+            if reason is None:
+                prompt_indices.append(index)
+            else:
+                skipped[index] = reason
+
+        with self._lock:
+            self.considered += len(detections)
+            self.skipped.update(skipped.values())
+            self.skipped_classes.update(detections[index]['class_name'] for index in skipped)
+        return prompt_indices, skipped
+
+    @staticmethod
+    def annotate(detections: List[Dict[str, Any]], skipped: Dict[int, str]) -> List[Dict[str, Any]]:
+        """Copies of the detections marked 'segmented', with 'sam_skip_reason' where skipped"""
+        annotated = []
+        for index, detection in enumerate(detections):
+            # Detections reloaded from an earlier run carry the old marks
+            detection = {key: value for key, value in detection.items() if key not in ('segmented', 'sam_skip_reason')}
+            if index in skipped:
+                annotated.append(dict(detection, segmented=False, sam_skip_reason=skipped[index]))
+            else:
+                annotated.append(dict(detection, segmented=True))
+        return annotated
+
+    def merge(self, other: 'SamPolicy') -> None:
+        """Fold in the counts of another process's policy"""
+        with self._lock:
+            self.considered += other.considered
+            self.skipped.update(other.skipped)
+            self.skipped_classes.update(other.skipped_classes)
+
+    def summary(self) -> Dict[str, Any]:
+        skipped = sum(self.skipped.values())
+        return {
+            'detections': self.considered,
+            'prompted': self.considered - skipped,
+            'skipped': skipped,
+            'skip_rate': skipped / self.considered if self.considered else 0.0,
+            'reasons': dict(self.skipped),
+            'skipped_by_class': dict(self.skipped_classes)
+        }
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+MyCV-Platform Sliced Inference
+Cuts high-resolution frames into overlapping tiles and merges the tiles' detections back
+"""
+
+import numpy as np
+from typing import Any, Dict, List, Sequence, Tuple
+
+from app.utils.box_fusion import nms
+from app.utils.image_frame import ImageFrame
+
+Window = Tuple[int, int, int, int]
+
+
+def _axis_starts(length: int, size: int, stride: int) -> List[int]:
+    """Tile start offsets along one axis; the last tile is flush with the edge"""
+    if length <= size:
+        return [0]
+    starts = list(range(0, length - size, stride))
+    starts.append(length - size)
+    return starts
+
+
+def slice_windows(width: int, height: int, slice_size: int, overlap: float = 0.2) -> List[Window]:
+    """xyxy windows of at most slice_size pixels covering the whole frame
+
+    Neighbouring windows share at least `overlap` of slice_size, so an
+    object smaller than that is fully inside at least one tile.
+    """
+    if not 0 <= overlap < 1:
+        raise ValueError(f"overlap must be in [0, 1), got {overlap}")
+    stride = max(1, int(slice_size * (1 - overlap)))
+    return [
+        (x, y, min(x + slice_size, width), min(y + slice_size, height))
+        for y in _axis_starts(height, slice_size, stride)
+        for x in _axis_starts(width, slice_size, stride)
+    ]
+
+
+def crop_tiles(frame: ImageFrame, windows: Sequence[Window]) -> List[ImageFrame]:
+    """One ImageFrame per window, viewing the frame's BGR buffer without copying"""
+    return [
+        ImageFrame(frame.bgr[y1:y2, x1:x2], name=f"{frame.name}@{x1},{y1}")
+        for x1, y1, x2, y2 in windows
+    ]
+
+
+def merge_tile_detections(tile_detections: Sequence[List[Dict[str, Any]]], windows: Sequence[Window],
+                          iou_threshold: float = 0.5, metric: str = 'ios') -> List[Dict[str, Any]]:
+    """Shift each tile's detections to frame coordinates and suppress duplicates
+
+    Objects in the overlap are found by several tiles, often clipped by a
+    tile border, so the default metric is intersection over the smaller
+    box. Detections are returned best confidence first.
+    """
+    flat = []
+    for detections, (x1, y1, _, _) in zip(tile_detections, windows):
+        offset = np.array([x1, y1, x1, y1], dtype=np.float32)
+        for det in detections:
+            flat.append(dict(det, bbox=(np.asarray(det['bbox'], dtype=np.float32) + offset).tolist()))
+    if not flat:
+        return []
+
+    boxes = np.array([det['bbox'] for det in flat], dtype=np.float32)
+    scores = np.array([det['confidence'] for det in flat], dtype=np.float32)
+    _, labels = np.unique([det['class_name'] for det in flat], return_inverse=True)
+    return [flat[i] for i in nms(boxes, scores, labels, iou_threshold, metric)]
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+MyCV-Platform Streaming Pipeline
+Overlaps image decode, inference and result writing with bounded queues
+"""
+
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List
+
+
+class StageStats:
+    """Busy/idle bookkeeping for one pipeline stage"""
+
+    def __init__(self, name: str, workers: int = 1):
+        self.name = name
+        self.workers = workers
+        self.items = 0
+        self.errors = 0
+        self.busy = 0.0      # time spent doing the stage's own work
+        self.starved = 0.0   # time waiting for input from the previous stage
+        self.blocked = 0.0   # time waiting for room in the next stage's queue
+        self._lock = threading.Lock()
+
+    def add(self, field: str, seconds: float) -> None:
+        with self._lock:
+            setattr(self, field, getattr(self, field) + seconds)
+
+    def count(self, items: int = 1, errors: int = 0) -> None:
+        with self._lock:
+            self.items += items
+            self.errors += errors
+
+    def summary(self, wall_time: float) -> Dict[str, Any]:
+        capacity = max(wall_time * self.workers, 1e-9)
+        return {
+            'workers': self.workers,
+            'items': self.items,
+            'errors': self.errors,
+            'busy_seconds': self.busy,
+            'starved_seconds': self.starved,
+            'blocked_seconds': self.blocked,
+            'occupancy': min(self.busy / capacity, 1.0)
+        }
+
+
+class StreamingPipeline:
+    """Three-stage producer/consumer pipeline
+
+    A prefetch thread decodes items into a bounded queue, the calling thread
+    runs inference on batches pulled from that queue, and a pool of writer
+    threads drains a second bounded queue of write jobs. Full queues block
+    the producer, so memory stays bounded when one stage falls behind.
+    """
+
+    _DONE = object()
+
+    def __init__(self, decode_fn: Callable[[Any], Any], infer_fn: Callable[[List[Any], Callable], None],
+                 batch_size: int = 1, prefetch: int = 4, writer_workers: int = 2, write_queue_size: int = 16):
+        self.decode_fn = decode_fn
+        self.infer_fn = infer_fn
+        self.batch_size = max(1, batch_size)
+        self.writer_workers = max(1, writer_workers)
+        self.decode_queue = queue.Queue(maxsize=max(1, prefetch))
+        self.write_queue = queue.Queue(maxsize=max(1, write_queue_size))
+        self.stats = {
+            'decode': StageStats('decode'),
+            'inference': StageStats('inference'),
+            'write': StageStats('write', self.writer_workers)
+        }
+        self.errors = []
+        self.wall_time = 0.0
+
+    def write(self, fn: Callable, *args, **kwargs) -> None:
+        """Queue a write job; blocks while the writer queue is full"""
+        start = time.perf_counter()
+        self.write_queue.put((fn, args, kwargs))
+        self.stats['inference'].add('blocked', time.perf_counter() - start)
+
+    def _decode_loop(self, items: Iterable[Any]) -> None:
+        stats = self.stats['decode']
+        try:
+            for item in items:
+                start = time.perf_counter()
+                try:
+                    decoded = self.decode_fn(item)
+                except Exception as e:
+                    stats.count(0, errors=1)
+                    self.errors.append(f"decode {item}: {e}")
+                    continue
+                stats.add('busy', time.perf_counter() - start)
+                stats.count()
+
+                start = time.perf_counter()
+                self.decode_queue.put(decoded)
+                stats.add('blocked', time.perf_counter() - start)
+        finally:
+            self.decode_queue.put(self._DONE)
+
+    def _write_loop(self) -> None:
+        stats = self.stats['write']
+        while True:
+            start = time.perf_counter()
+            job = self.write_queue.get()
+            stats.add('starved', time.perf_counter() - start)
+            if job is self._DONE:
+                break
+
+            fn, args, kwargs = job
+            start = time.perf_counter()
+            try:
+                fn(*args, **kwargs)
+                stats.count()
+            except Exception as e:
+                stats.count(0, errors=1)
+                self.errors.append(f"write: {e}")
+            stats.add('busy', time.perf_counter() - start)
+
+    def run(self, items: Iterable[Any]) -> Dict[str, Any]:
+        """Process all items and return the per-stage summary"""
+        stats = self.stats['inference']
+        run_start = time.perf_counter()
+
+        decoder = threading.Thread(target=self._decode_loop, args=(items,), name='decode', daemon=True)
+        writers = [threading.Thread(target=self._write_loop, name=f'write-{i}', daemon=True)
+                   for i in range(self.writer_workers)]
+        decoder.start()
+        for writer in writers:
+            writer.start()
+
+        done = False
+        while not done:
+            batch = []
+            while len(batch) < self.batch_size:
+                start = time.perf_counter()
+                decoded = self.decode_queue.get()
+                stats.add('starved', time.perf_counter() - start)
+                if decoded is self._DONE:
+                    done = True
+                    break
+                batch.append(decoded)
+
+            if not batch:
+                continue
+
+            blocked_before = stats.blocked
+            start = time.perf_counter()
+            try:
+                self.infer_fn(batch, self.write)
+                stats.count(len(batch))
+            except Exception as e:
+                stats.count(0, errors=len(batch))
+                self.errors.append(f"inference: {e}")
+            # Time spent waiting on the writer queue is backpressure, not work
+            stats.add('busy', time.perf_counter() - start - (stats.blocked - blocked_before))
+
+        for _ in writers:
+            self.write_queue.put(self._DONE)
+        decoder.join()
+        for writer in writers:
+            writer.join()
+
+        self.wall_time = time.perf_counter() - run_start
+        return self.summary()
+
+    def summary(self) -> Dict[str, Any]:
+        """Occupancy of each stage over the last run; the busiest is the bottleneck"""
+        stages = {name: stage.summary(self.wall_time) for name, stage in self.stats.items()}
+        return {
+            'wall_seconds': self.wall_time,
+            'stages': stages,
+            'errors': list(self.errors),
+            'bottleneck': max(stages, key=lambda name: stages[name]['occupancy'])
+        }
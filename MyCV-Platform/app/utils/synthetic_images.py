@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+MyCV-Platform Synthetic Images
+Deterministic test images with known object boxes for benchmarks that need no real data
+"""
+
+import cv2
+import numpy as np
+from typing import Any, Dict, List, Tuple
+
+SYNTHETIC_CLASS = 'synthetic'
+
+
+def synthetic_image(width: int, height: int, objects: int, seed: int = 0) -> Tuple[np.ndarray, List[Dict[str, Any]]]:
+    """Draw `objects` filled shapes on a textured background
+
+    The same (width, height, objects, seed) always gives the same pixels.
+    Returns the BGR image and one detection dict per shape, in the format
+    extract_detections produces, so the boxes can prompt SAM2 directly.
+    """
+    rng = np.random.default_rng(seed)
+
+    # Smooth gradient plus noise so JPEG encoding and decoding do real work
+    gradient = np.linspace(40, 200, width, dtype=np.float32)[None, :, None]
+    noise = rng.normal(0, 12, (height, width, 3)).astype(np.float32)
+    image = np.clip(gradient + noise, 0, 255).astype(np.uint8)
+
+    detections = []
+    min_side = max(8, min(width, height) // 20)
+    max_side = max(min_side + 1, min(width, height) // 4)
+    for _ in range(objects):
+        w, h = rng.integers(min_side, max_side, size=2)
+        x1 = int(rng.integers(0, width - w))
+        y1 = int(rng.integers(0, height - h))
+        x2, y2 = x1 + int(w), y1 + int(h)
+        color = tuple(int(c) for c in rng.integers(0, 256, size=3))
+
+        if rng.random() < 0.5:
+            cv2.rectangle(image, (x1, y1), (x2 - 1, y2 - 1), color, -1)
+        else:
+            center = ((x1 + x2) // 2, (y1 + y2) // 2)
+            cv2.ellipse(image, center, ((x2 - x1) // 2, (y2 - y1) // 2), 0, 0, 360, color, -1)
+
+        detections.append({
+            'bbox': [float(x1), float(y1), float(x2), float(y2)],
+            'confidence': 1.0,
+            'class_id': 0,
+            'class_name': SYNTHETIC_CLASS
+        })
+
+    return image, detections
+
+
+def encode_jpeg(image: np.ndarray, quality: int = 95) -> bytes:
+    """Encode a BGR image the way test images arrive on disk"""
+    ok, buffer = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    if not ok:
+        raise ValueError("JPEG encoding failed")
+    return buffer.tobytes()
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+MyCV-Platform Tracing
+Records per-stage wall time, CPU time and RSS as JSON-lines or Chrome-trace spans
+"""
+
+import os
+import json
+import time
+import atexit
+import threading
+from typing import Any, Dict, Optional
+
+TRACE_FORMATS = ('jsonl', 'chrome')
+
+try:
+    _PAGE_SIZE = os.sysconf('SC_PAGE_SIZE')
+except (AttributeError, ValueError, OSError):
+    _PAGE_SIZE = 4096
+
+
+def current_rss_bytes() -> Optional[int]:
+    """Resident memory of this process right now (Linux /proc), else None"""
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class _NullSpan:
+    """Shared no-op span handed out while tracing is off"""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def set(self, **attrs) -> None:
+        pass
+
+
+NULL_SPAN = _NullSpan()
+
+
+class Span:
+    """One timed region; attributes can be added while it is open with set()"""
+
+    __slots__ = ('tracer', 'name', 'attrs', 'start_ns', 'cpu_start', 'rss_start')
+
+    def __init__(self, tracer: 'Tracer', name: str, attrs: Dict[str, Any]):
+        self.tracer = tracer
+        self.name = name
+        self.attrs = attrs
+
+    def __enter__(self):
+        self.tracer._push()
+        self.rss_start = current_rss_bytes()
+        self.cpu_start = time.process_time()
+        self.start_ns = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        wall_ns = time.perf_counter_ns() - self.start_ns
+        cpu_seconds = time.process_time() - self.cpu_start
+        rss_end = current_rss_bytes()
+        if exc_type is not None:
+            self.attrs['error'] = exc_type.__name__
+        self.tracer._finish(self, wall_ns, cpu_seconds, rss_end)
+        return False
+
+    def set(self, **attrs) -> None:
+        self.attrs.update(attrs)
+
+
+class Tracer:
+    """Collects spans from any thread and writes them to one trace file
+
+    A disabled tracer (no path) returns NULL_SPAN from span(), so
+    instrumented code costs one method call per region. CPU time is
+    process-wide, so it includes torch's intra-op threads and, in pipeline
+    mode, any stage running concurrently.
+    """
+
+    def __init__(self, path: Optional[str] = None, trace_format: str = 'jsonl'):
+        if trace_format not in TRACE_FORMATS:
+            raise ValueError(f"Unknown trace format: {trace_format}")
+        self.path = path
+        self.enabled = path is not None
+        self.format = trace_format
+        self.events = []
+        self.thread_names = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._origin_ns = time.perf_counter_ns()
+        self._file = None
+        if self.enabled:
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+            if trace_format == 'jsonl':
+                self._file = open(path, 'w')
+
+    def span(self, name: str, **attrs):
+        """Context manager timing one region"""
+        if not self.enabled:
+            return NULL_SPAN
+        return Span(self, name, attrs)
+
+    def _push(self) -> None:
+        self._local.depth = getattr(self._local, 'depth', 0) + 1
+
+    def _finish(self, span: Span, wall_ns: int, cpu_seconds: float, rss_end: Optional[int]) -> None:
+        depth = self._local.depth = self._local.depth - 1
+        thread = threading.current_thread()
+        event = {
+            'name': span.name,
+            'start_ms': (span.start_ns - self._origin_ns) / 1e6,
+            'wall_ms': wall_ns / 1e6,
+            'cpu_ms': cpu_seconds * 1000,
+            'depth': depth,
+            'thread': thread.name
+        }
+        if rss_end is not None and span.rss_start is not None:
+            event['rss_mb'] = rss_end / 1024 ** 2
+            event['rss_delta_mb'] = (rss_end - span.rss_start) / 1024 ** 2
+        event.update(span.attrs)
+
+        with self._lock:
+            if self._file is not None:
+                self._file.write(json.dumps(event, default=str) + '\n')
+            else:
+                self.thread_names[thread.ident] = thread.name
+                self.events.append((thread.ident, event))
+
+    def close(self) -> None:
+        """Flush the trace file; safe to call more than once"""
+        with self._lock:
+            if not self.enabled:
+                return
+            self.enabled = False
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+                return
+            self._write_chrome_trace()
+
+    def _write_chrome_trace(self) -> None:
+        pid = os.getpid()
+        trace_events = [
+            {'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid, 'args': {'name': name}}
+            for tid, name in self.thread_names.items()
+        ]
+        for tid, event in self.events:
+            args = {key: value for key, value in event.items()
+                    if key not in ('name', 'start_ms', 'wall_ms', 'depth', 'thread')}
+            trace_events.append({
+                'name': event['name'],
+                'ph': 'X',
+                'ts': event['start_ms'] * 1000,
+                'dur': event['wall_ms'] * 1000,
+                'pid': pid,
+                'tid': tid,
+                'args': args
+            })
+        with open(self.path, 'w') as f:
+            json.dump({'traceEvents': trace_events, 'displayTimeUnit': 'ms'}, f, default=str)
+
+
+_tracer = Tracer()
+
+
+def configure_tracing(path: Optional[str], trace_format: Optional[str] = None) -> Tracer:
+    """Install the process-wide tracer; the format defaults from the file extension"""
+    global _tracer
+    _tracer.close()
+    if trace_format is None:
+        trace_format = 'chrome' if path and path.endswith('.json') else 'jsonl'
+    _tracer = Tracer(path, trace_format)
+    if _tracer.enabled:
+        atexit.register(_tracer.close)
+    return _tracer
+
+
+def get_tracer() -> Tracer:
+    return _tracer
+
+
+def span(name: str, **attrs):
+    """Time a region with the process-wide tracer (a no-op while tracing is off)"""
+    return _tracer.span(name, **attrs)
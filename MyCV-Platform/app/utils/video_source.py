@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+MyCV-Platform Video Source
+Reads a video file, camera index, V4L2 device or RTSP/HTTP stream as a generator of ImageFrames
+"""
+
+import time
+import threading
+from typing import Iterator, Optional, Tuple, Union
+
+from app.utils.image_frame import ImageFrame
+
+
+def is_live_source(source: Union[str, int]) -> bool:
+    """Cameras and network streams produce frames whether or not we keep up"""
+    source = str(source)
+    return source.isdigit() or source.startswith('/dev/video') or '://' in source
+
+
+def open_capture(source: Union[str, int]):
+    """cv2.VideoCapture for a file path, camera index ("0"), V4L2 device or stream URL"""
+    import cv2
+
+    target = int(source) if str(source).isdigit() else source
+    capture = cv2.VideoCapture(target)
+    if not capture.isOpened():
+        raise ValueError(f"Could not open video source: {source}")
+    return capture
+
+
+class LatestFrameReader:
+    """Grabs frames on a background thread and keeps only the newest one
+
+    For live sources, processing slower than the camera would otherwise
+    read ever older frames from the driver's buffer; here stale frames are
+    dropped and counted instead.
+    """
+
+    def __init__(self, capture):
+        self.capture = capture
+        self.condition = threading.Condition()
+        self.latest = None
+        self.frame_index = -1
+        self.dropped = 0
+        self.finished = False
+        self.stopped = False
+        self.thread = threading.Thread(target=self._run, name='frame-reader', daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        while not self.stopped:
+            ok, bgr = self.capture.read()
+            with self.condition:
+                if not ok:
+                    self.finished = True
+                    self.condition.notify_all()
+                    return
+                if self.latest is not None:
+                    self.dropped += 1
+                self.frame_index += 1
+                self.latest = (self.frame_index, time.monotonic(), bgr)
+                self.condition.notify_all()
+
+    def read(self) -> Optional[Tuple[int, float, object]]:
+        """Block until a frame newer than the last one read is available"""
+        with self.condition:
+            while self.latest is None and not self.finished:
+                self.condition.wait()
+            latest, self.latest = self.latest, None
+            return latest
+
+    def close(self) -> None:
+        """Stop grabbing; the capture can be released once this returns"""
+        self.stopped = True
+        self.thread.join(timeout=5)
+
+
+def iter_video_frames(source: Union[str, int], max_frames: Optional[int] = None,
+                      drop_stale: Optional[bool] = None) -> Iterator[Tuple[int, float, ImageFrame]]:
+    """Yield (frame_index, timestamp_seconds, ImageFrame) from a video source
+
+    frame_index counts every frame the source produced, so gaps show where
+    stale live frames were dropped. drop_stale defaults to True for live
+    sources and False for files, which are read frame by frame.
+    """
+    import cv2
+
+    capture = open_capture(source)
+    if drop_stale is None:
+        drop_stale = is_live_source(source)
+
+    reader = LatestFrameReader(capture) if drop_stale else None
+    started = time.monotonic()
+    yielded = 0
+    try:
+        while max_frames is None or yielded < max_frames:
+            if reader is not None:
+                latest = reader.read()
+                if latest is None:
+                    break
+                frame_index, captured_at, bgr = latest
+                timestamp = captured_at - started
+            else:
+                ok, bgr = capture.read()
+                if not ok:
+                    break
+                frame_index = yielded
+                timestamp = capture.get(cv2.CAP_PROP_POS_MSEC) / 1000.0
+
+            yield frame_index, timestamp, ImageFrame(bgr, name=f"frame_{frame_index:06d}")
+            yielded += 1
+    finally:
+        if reader is not None:
+            reader.close()
+        capture.release()
@@ -0,0 +1,479 @@
+#!/usr/bin/env python3
+"""
+MyCV-Platform Pipeline Benchmark
+Times decode, detection, segmentation, saving and visualization on synthetic images,
+or the recall and cost of sliced detection per tile size on real images
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import contextlib
+from datetime import datetime
+
+import numpy as np
+
+from run_yolo_sam_integration import (
+    log_message, check_environment, MODEL_PATHS,
+    run_yolo_detection, run_yolo_detection_batch, run_yolo_detection_sliced, run_sam_segmentation, save_results
+)
+from app.utils.image_frame import ImageFrame
+from app.utils.mask_codec import MASK_FORMATS
+from app.utils.synthetic_images import synthetic_image, encode_jpeg
+from app.utils.box_fusion import box_iou, nms
+from app.utils.sliced_inference import slice_windows
+
+STAGES = ('decode', 'detect', 'segment', 'save', 'visualize')
+
+DETECTOR_KEYS = ('yolo11m', 'best_pt')
+
+# Latency percentiles compared against the baseline
+REGRESSION_METRICS = ('p50_ms', 'p95_ms')
+
+
+def parse_sizes(text):
+    """'640x480,1280x720' -> [(640, 480), (1280, 720)]"""
+    sizes = []
+    for item in text.split(','):
+        width, height = item.lower().split('x')
+        sizes.append((int(width), int(height)))
+    return sizes
+
+def parse_ints(text):
+    """'1,4,8' -> [1, 4, 8]"""
+    return [int(item) for item in text.split(',') if item]
+
+def peak_rss_mb():
+    """Peak resident memory of this process so far, in MB (None where unsupported)"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is bytes on macOS and kilobytes on Linux
+    return peak / 1024 ** 2 if sys.platform == 'darwin' else peak / 1024
+
+@contextlib.contextmanager
+def quiet():
+    """Silence the per-object progress logs of the timed functions"""
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+def timed(samples, stage, record, fn, *args):
+    """Call fn(*args) and append its wall time to samples[stage] when recording"""
+    start = time.perf_counter()
+    result = fn(*args)
+    elapsed = time.perf_counter() - start
+    if record:
+        samples.setdefault(stage, []).append(elapsed)
+    return result
+
+def summarize(samples, images_per_sample=1):
+    """Latency percentiles, throughput and peak RSS for one case"""
+    values = np.array(samples, dtype=np.float64) * 1000
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    total_seconds = values.sum() / 1000
+    return {
+        'samples': len(samples),
+        'p50_ms': float(p50),
+        'p95_ms': float(p95),
+        'p99_ms': float(p99),
+        'mean_ms': float(values.mean()),
+        'images_per_sec': len(samples) * images_per_sample / total_seconds if total_seconds > 0 else 0.0,
+        'peak_rss_mb': peak_rss_mb()
+    }
+
+def synthetic_sam(work_dir):
+    """SAM2_b with seeded random weights, for machines without the checkpoint
+
+    ultralytics only builds SAM from a checkpoint file, so the randomly
+    initialised state dict is saved once under a name it recognises.
+    """
+    import torch
+    from ultralytics import SAM
+    from ultralytics.models.sam.build import build_sam2_b
+
+    weights_path = os.path.join(work_dir, "synthetic_sam2_b.pt")
+    if not os.path.exists(weights_path):
+        torch.manual_seed(0)
+        torch.save(build_sam2_b().state_dict(), weights_path)
+    return SAM(weights_path)
+
+def load_benchmark_models(synthetic_models, work_dir):
+    """Load the real checkpoints where present, else same-architecture random weights
+
+    Timings depend on the architecture, not the weights, so synthetic
+    models give comparable numbers on any machine.
+    """
+    import torch
+    from ultralytics import YOLO, SAM
+
+    models = {}
+    sources = {}
+    torch.manual_seed(0)
+
+    for model_key in DETECTOR_KEYS:
+        if os.path.exists(MODEL_PATHS[model_key]) and not synthetic_models:
+            models[model_key] = YOLO(MODEL_PATHS[model_key])
+            sources[model_key] = MODEL_PATHS[model_key]
+        else:
+            models[model_key] = YOLO("yolo11m.yaml")
+            sources[model_key] = 'synthetic:yolo11m.yaml'
+
+    if os.path.exists(MODEL_PATHS['sam2_b']) and not synthetic_models:
+        models['sam2_b'] = SAM(MODEL_PATHS['sam2_b'])
+        sources['sam2_b'] = MODEL_PATHS['sam2_b']
+    else:
+        models['sam2_b'] = synthetic_sam(work_dir)
+        sources['sam2_b'] = 'synthetic:sam2_b'
+
+    for model_key, source in sources.items():
+        level = 'warning' if source.startswith('synthetic') else 'success'
+        log_message(f"   {model_key}: {source}", level)
+    return models, sources
+
+def benchmark_image_stages(models, device, width, height, objects, args, work_dir):
+    """Time every per-image stage for one (size, object count) case
+
+    Every detection sample includes letterboxing, as in the batch stage,
+    so single and batched numbers are comparable.
+    """
+    samples = {}
+    if 'visualize' in args.stages:
+        from visualize_results import create_visualization
+
+    for repeat in range(args.warmup + args.repeats):
+        record = repeat >= args.warmup
+        bgr, prompts = synthetic_image(width, height, objects, seed=args.seed + repeat)
+        data = encode_jpeg(bgr)
+        image_name = f"synthetic_{width}x{height}_{objects}_{repeat}.jpg"
+
+        with quiet():
+            frame = timed(samples, 'decode', record, ImageFrame.from_bytes, data, image_name)
+
+            if 'detect' in args.stages:
+                for model_key in DETECTOR_KEYS:
+                    # Drop the cached letterbox so the second detector does not reuse the first one's
+                    frame.release_cache()
+                    timed(samples, f"detect:{model_key}", record,
+                          run_yolo_detection, models[model_key], frame, model_key, device)
+
+            # Ground-truth boxes prompt SAM2 so object count is controlled exactly
+            masks = []
+            if 'segment' in args.stages:
+                masks = timed(samples, 'segment', record,
+                              run_sam_segmentation, models['sam2_b'], frame, prompts, 'SAM2_b', device)
+
+            if 'save' in args.stages:
+                timed(samples, 'save', record,
+                      save_results, image_name, prompts, masks, work_dir, args.mask_format)
+
+            if 'visualize' in args.stages:
+                image_path = os.path.join(work_dir, image_name)
+                with open(image_path, 'wb') as f:
+                    f.write(data)
+                timed(samples, 'visualize', record, create_visualization, image_path, prompts, masks,
+                      os.path.join(work_dir, f"{image_name}_visualization.png"))
+
+        frame.release_cache()
+
+    return {
+        f"{stage}/{width}x{height}/objects={objects}": summarize(stage_samples)
+        for stage, stage_samples in samples.items()
+        if stage.split(':')[0] in args.stages
+    }
+
+def benchmark_batch_stage(models, device, width, height, batch_size, args):
+    """Time batched detection for one (size, batch size) case"""
+    frames = [ImageFrame(synthetic_image(width, height, 1, seed=args.seed + i)[0], name=f"batch_{i}")
+              for i in range(batch_size)]
+    samples = {}
+
+    for repeat in range(args.warmup + args.repeats):
+        record = repeat >= args.warmup
+        with quiet():
+            for model_key in DETECTOR_KEYS:
+                # Drop cached letterboxes so every sample includes preprocessing
+                for frame in frames:
+                    frame.release_cache()
+                timed(samples, f"detect_batch:{model_key}", record, run_yolo_detection_batch,
+                      models[model_key], frames, model_key, device, batch_size)
+
+    return {
+        f"{stage}/{width}x{height}/batch={batch_size}": summarize(stage_samples, batch_size)
+        for stage, stage_samples in samples.items()
+    }
+
+def load_yolo_labels(label_path, width, height):
+    """Ground-truth xyxy boxes from a YOLO-format label file (class cx cy w h, normalized)"""
+    if not os.path.exists(label_path):
+        return np.zeros((0, 4), dtype=np.float32)
+    rows = np.loadtxt(label_path, ndmin=2, dtype=np.float32)
+    if rows.size == 0:
+        return np.zeros((0, 4), dtype=np.float32)
+    cx, cy, w, h = rows[:, 1] * width, rows[:, 2] * height, rows[:, 3] * width, rows[:, 4] * height
+    return np.stack([cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2], axis=1)
+
+def matched_count(reference_boxes, detected_boxes, iou_threshold=0.5):
+    """Reference boxes matched one-to-one by a detection with IoU >= iou_threshold"""
+    if len(reference_boxes) == 0 or len(detected_boxes) == 0:
+        return 0
+    iou = box_iou(reference_boxes, detected_boxes)
+    matched = 0
+    while iou.size and iou.max() >= iou_threshold:
+        r, d = np.unravel_index(np.argmax(iou), iou.shape)
+        iou[r, :] = 0
+        iou[:, d] = 0
+        matched += 1
+    return matched
+
+def benchmark_slicing(models, device, args):
+    """Recall and detection time per tile size on the images in --slice-images
+
+    Recall is measured against YOLO-format labels in --slice-labels when
+    given. Otherwise the reference is every distinct box found by any tile
+    size, so the numbers show relative recall between the settings.
+    """
+    image_paths = sorted(os.path.join(args.slice_images, name)
+                         for name in os.listdir(args.slice_images) if name.endswith('.jpg'))
+    if not image_paths:
+        raise ValueError(f"No .jpg images in {args.slice_images}")
+    slice_sizes = sorted(set([0] + args.slice_sizes))
+
+    report = {'images': len(image_paths), 'reference': 'labels' if args.slice_labels else 'union', 'models': {}}
+    for model_key in DETECTOR_KEYS:
+        model = models[model_key]
+        samples = {size: [] for size in slice_sizes}
+        tiles = {size: 0 for size in slice_sizes}
+        detected = {size: [] for size in slice_sizes}
+        references = []
+
+        for image_path in image_paths:
+            frame = ImageFrame.from_path(image_path)
+            with quiet():
+                run_yolo_detection(model, frame, model_key, device)
+                for size in slice_sizes:
+                    # Every size letterboxes from scratch, like the tiles of a sliced pass do
+                    frame.release_cache()
+                    start = time.perf_counter()
+                    if size:
+                        detections = run_yolo_detection_sliced(model, frame, model_key, device, size,
+                                                               args.slice_overlap, batch_size=max(args.batch_sizes))
+                    else:
+                        detections = run_yolo_detection(model, frame, model_key, device)
+                    samples[size].append(time.perf_counter() - start)
+                    # A sliced pass runs every tile plus the whole frame, unless one tile covers it
+                    windows = len(slice_windows(frame.width, frame.height, size, args.slice_overlap)) if size else 1
+                    tiles[size] += windows + 1 if windows > 1 else 1
+                    detected[size].append(np.array([det['bbox'] for det in detections], dtype=np.float32).reshape(-1, 4))
+
+            if args.slice_labels:
+                label_path = os.path.join(args.slice_labels, os.path.splitext(os.path.basename(image_path))[0] + '.txt')
+                references.append(load_yolo_labels(label_path, frame.width, frame.height))
+            else:
+                boxes = np.concatenate([detected[size][-1] for size in slice_sizes])
+                # Areas rank the union so the largest of overlapping duplicates is kept
+                areas = (boxes[:, 2:] - boxes[:, :2]).prod(axis=1)
+                references.append(boxes[nms(boxes, areas, iou_threshold=0.5)])
+            frame.release_cache()
+
+        total_reference = sum(len(boxes) for boxes in references)
+        model_report = {}
+        for size in slice_sizes:
+            matched = sum(matched_count(reference, boxes) for reference, boxes in zip(references, detected[size]))
+            stats = summarize(samples[size])
+            stats.update({
+                'tiles_per_image': tiles[size] / len(image_paths),
+                'ms_per_tile': sum(samples[size]) * 1000 / tiles[size],
+                'detections': sum(len(boxes) for boxes in detected[size]),
+                'recall': matched / total_reference if total_reference else None
+            })
+            model_report['full' if size == 0 else str(size)] = stats
+
+        full = model_report['full']
+        for stats in model_report.values():
+            stats['recall_gain'] = (stats['recall'] - full['recall']) if full['recall'] is not None else None
+            stats['time_cost'] = stats['p50_ms'] / full['p50_ms'] if full['p50_ms'] > 0 else None
+        report['models'][model_key] = model_report
+    return report
+
+def compare_to_baseline(cases, baseline, tolerance):
+    """Cases whose latency grew by more than tolerance over the baseline"""
+    regressions = []
+    for case, stats in cases.items():
+        reference = baseline.get('cases', {}).get(case)
+        if not reference:
+            continue
+        for metric in REGRESSION_METRICS:
+            if reference[metric] > 0 and stats[metric] > reference[metric] * (1 + tolerance):
+                regressions.append({
+                    'case': case,
+                    'metric': metric,
+                    'baseline': reference[metric],
+                    'current': stats[metric],
+                    'change': stats[metric] / reference[metric] - 1
+                })
+    return regressions
+
+def run_slicing_report(models, sources, device, args):
+    """Print and save the --slice-sizes comparison"""
+    slicing = benchmark_slicing(models, device, args)
+
+    log_message(f"\n🧩 Sliced detection on {slicing['images']} images (recall vs {slicing['reference']})", 'info')
+    for model_key, model_report in slicing['models'].items():
+        for size, stats in model_report.items():
+            recall = f"{stats['recall']:.3f} ({stats['recall_gain']:+.3f})" if stats['recall'] is not None else "n/a"
+            log_message(f"   {model_key:<8} {size:>5}: recall {recall}, {stats['p50_ms']:>8.1f} ms/image "
+                        f"(x{stats['time_cost']:.2f}), {stats['tiles_per_image']:.1f} tiles, "
+                        f"{stats['ms_per_tile']:.1f} ms/tile", 'info')
+
+    report = {
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'device': device,
+        'models': sources,
+        'config': {
+            'slice_sizes': args.slice_sizes,
+            'slice_overlap': args.slice_overlap,
+            'slice_images': args.slice_images,
+            'slice_labels': args.slice_labels,
+            'batch_size': max(args.batch_sizes)
+        },
+        'slicing': slicing,
+        'peak_rss_mb': peak_rss_mb()
+    }
+    path = os.path.join(os.path.dirname(args.output) or '.', "slicing.json")
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=2)
+    log_message(f"💾 Report saved: {path}", 'success')
+
+def parse_args():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description="MyCV-Platform pipeline benchmark")
+    parser.add_argument('--sizes', type=parse_sizes, default=parse_sizes("640x480,1280x720,1920x1080"),
+                        help="Image sizes as WxH, comma separated (default: 640x480,1280x720,1920x1080)")
+    parser.add_argument('--objects', type=parse_ints, default=[1, 8, 32],
+                        help="Objects per image, comma separated (default: 1,8,32)")
+    parser.add_argument('--batch-sizes', type=parse_ints, default=[1, 4, 8],
+                        help="Detection batch sizes, comma separated (default: 1,4,8)")
+    parser.add_argument('--stages', type=lambda text: text.split(','), default=list(STAGES),
+                        help=f"Stages to time, comma separated (default: {','.join(STAGES)})")
+    parser.add_argument('--repeats', type=int, default=10, help="Timed samples per case (default: 10)")
+    parser.add_argument('--warmup', type=int, default=2, help="Untimed samples per case (default: 2)")
+    parser.add_argument('--seed', type=int, default=0, help="Seed for the synthetic images (default: 0)")
+    parser.add_argument('--mask-format', choices=MASK_FORMATS, default='png',
+                        help="Mask format for the save stage (default: png)")
+    parser.add_argument('--synthetic-models', action='store_true',
+                        help="Use random-weight models even when checkpoints are installed")
+    parser.add_argument('--output', default="data/output/benchmarks/benchmark.json",
+                        help="Where to write the JSON report")
+    parser.add_argument('--baseline', default="data/output/benchmarks/baseline.json",
+                        help="Baseline report to compare against")
+    parser.add_argument('--update-baseline', action='store_true',
+                        help="Write this run's report as the new baseline")
+    parser.add_argument('--tolerance', type=float, default=0.15,
+                        help="Allowed latency growth over the baseline before flagging (default: 0.15)")
+    parser.add_argument('--slice-sizes', type=parse_ints,
+                        help="Instead of the stage benchmark, compare recall and time of sliced detection "
+                             "for these tile sizes against whole-image detection, e.g. 320,640,960")
+    parser.add_argument('--slice-images', default="data/input/test_images",
+                        help="Images for --slice-sizes (default: data/input/test_images)")
+    parser.add_argument('--slice-labels',
+                        help="YOLO-format label files for --slice-images; without them recall is relative "
+                             "to every box any setting found")
+    parser.add_argument('--slice-overlap', type=float, default=0.2,
+                        help="Tile overlap for --slice-sizes (default: 0.2)")
+    return parser.parse_args()
+
+def main():
+    """Main function"""
+    args = parse_args()
+
+    log_message("⏱️  MyCV-Platform Pipeline Benchmark", 'info')
+    log_message("=" * 50, 'info')
+
+    device = check_environment()
+    unknown = set(args.stages) - set(STAGES)
+    if unknown:
+        log_message(f"❌ Unknown stages: {', '.join(sorted(unknown))}", 'error')
+        sys.exit(2)
+
+    with tempfile.TemporaryDirectory(prefix="mycv_benchmark_") as work_dir:
+        log_message("🤖 Loading models...", 'info')
+        models, sources = load_benchmark_models(args.synthetic_models, work_dir)
+
+        if args.slice_sizes:
+            run_slicing_report(models, sources, device, args)
+            return
+
+        cases = {}
+        for width, height in args.sizes:
+            for objects in args.objects:
+                log_message(f"📐 {width}x{height}, {objects} objects", 'info')
+                cases.update(benchmark_image_stages(models, device, width, height, objects, args, work_dir))
+
+            if 'detect' in args.stages:
+                for batch_size in args.batch_sizes:
+                    log_message(f"📦 {width}x{height}, batch size {batch_size}", 'info')
+                    cases.update(benchmark_batch_stage(models, device, width, height, batch_size, args))
+
+    import torch
+
+    report = {
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'device': device,
+        'models': sources,
+        'environment': {
+            'python': platform.python_version(),
+            'torch': torch.__version__,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count()
+        },
+        'config': {
+            'sizes': [f"{width}x{height}" for width, height in args.sizes],
+            'objects': args.objects,
+            'batch_sizes': args.batch_sizes,
+            'stages': args.stages,
+            'repeats': args.repeats,
+            'warmup': args.warmup,
+            'seed': args.seed,
+            'mask_format': args.mask_format
+        },
+        'cases': cases,
+        'peak_rss_mb': peak_rss_mb(),
+        'regressions': []
+    }
+
+    log_message("\n📊 Results (p50 / p95 / p99 ms, images/sec)", 'info')
+    for case, stats in cases.items():
+        log_message(f"   {case:<45} {stats['p50_ms']:>9.1f} {stats['p95_ms']:>9.1f} {stats['p99_ms']:>9.1f} "
+                    f"{stats['images_per_sec']:>8.2f}", 'info')
+
+    if os.path.exists(args.baseline) and not args.update_baseline:
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)
+        if baseline.get('device') != device or baseline.get('models') != sources:
+            log_message("⚠️  Baseline was recorded with a different device or models", 'warning')
+        report['baseline'] = args.baseline
+        report['regressions'] = compare_to_baseline(cases, baseline, args.tolerance)
+        for regression in report['regressions']:
+            log_message(f"🐢 {regression['case']} {regression['metric']}: {regression['baseline']:.1f} → "
+                        f"{regression['current']:.1f} ms ({regression['change']:+.0%})", 'error')
+        if not report['regressions']:
+            log_message(f"✅ No regressions beyond {args.tolerance:.0%} of the baseline", 'success')
+
+    for path in [args.output] + ([args.baseline] if args.update_baseline else []):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(report, f, indent=2)
+        log_message(f"💾 Report saved: {path}", 'success')
+
+    if report['regressions']:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,368 @@
+#!/usr/bin/env python3
+"""
+MyCV-Platform Model Server
+Keeps YOLO11m, best.pt and SAM2_b resident and serves detection over HTTP or a Unix socket
+"""
+
+import os
+import sys
+import json
+import time
+import queue
+import argparse
+import threading
+import socketserver
+from collections import deque
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+import numpy as np
+
+from run_yolo_sam_integration import (
+    log_message, check_environment, load_models,
+    run_yolo_detection_batch, run_sam_segmentation
+)
+from app.utils.image_frame import ImageFrame
+from app.utils.sam_embedding_cache import SamEmbeddingCache
+from app.utils.box_fusion import fuse_detections
+from app.utils.mask_tile import as_tile
+from app.utils.model_backends import BACKENDS
+from app.utils.model_cache import MODEL_CACHE_DIR
+
+DETECTORS = [('yolo11m', 'YOLO11m'), ('best_pt', 'best.pt')]
+
+# Largest request body read into memory, in MB
+MAX_BODY_MB = 32
+
+
+class LatencyTracker:
+    """Rolling window of per-request timings"""
+
+    def __init__(self, window=1000):
+        self.samples = deque(maxlen=window)
+        self.lock = threading.Lock()
+        self.total_requests = 0
+
+    def record(self, sample):
+        with self.lock:
+            self.samples.append(sample)
+            self.total_requests += 1
+
+    def summary(self):
+        with self.lock:
+            samples = list(self.samples)
+            total_requests = self.total_requests
+
+        report = {'total_requests': total_requests, 'window': len(samples)}
+        for field in ('queue_ms', 'inference_ms', 'total_ms', 'batch_size'):
+            values = np.array([sample[field] for sample in samples], dtype=np.float64)
+            if values.size:
+                p50, p95, p99 = np.percentile(values, [50, 95, 99])
+                report[field] = {'p50': p50, 'p95': p95, 'p99': p99, 'mean': float(values.mean())}
+            else:
+                report[field] = None
+        return report
+
+
+class RequestBatcher:
+    """Collects concurrent requests for a short window and processes them together
+
+    The first queued request opens a window of window_ms; every request that
+    arrives before it closes (up to max_batch) joins the same batch. A single
+    worker thread owns the models, so inference is never run concurrently.
+    """
+
+    def __init__(self, process_batch, window_ms=10, max_batch=8):
+        self.process_batch = process_batch
+        self.window = window_ms / 1000.0
+        self.max_batch = max(1, max_batch)
+        self.pending = queue.Queue()
+        self.worker = threading.Thread(target=self._run, name='batcher', daemon=True)
+        self.worker.start()
+
+    def submit(self, request):
+        """Queue a request and return a Future for its result"""
+        future = Future()
+        self.pending.put((request, future, time.perf_counter()))
+        return future
+
+    def _run(self):
+        while True:
+            batch = [self.pending.get()]
+            deadline = time.perf_counter() + self.window
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self.pending.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            started = time.perf_counter()
+            try:
+                results = self.process_batch([request for request, _, _ in batch])
+            except Exception as e:
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                continue
+            inference_ms = (time.perf_counter() - started) * 1000
+
+            for (_, future, queued), result in zip(batch, results):
+                result['latency'] = {
+                    'queue_ms': (started - queued) * 1000,
+                    'inference_ms': inference_ms,
+                    'batch_size': len(batch)
+                }
+                future.set_result(result)
+
+    def depth(self):
+        return self.pending.qsize()
+
+
+class InferenceService:
+    """Resident models plus the batching and bookkeeping around them"""
+
+    def __init__(self, models, device, window_ms=10, max_batch=8, sam_cache_size=4, sam_cache_mb=512):
+        self.models = models
+        self.device = device
+        self.started_at = time.time()
+        self.latency = LatencyTracker()
+        self.embedding_cache = SamEmbeddingCache(sam_cache_size, sam_cache_mb * 1024 ** 2) if sam_cache_size > 0 else None
+        self.batcher = RequestBatcher(self.process_batch, window_ms, max_batch)
+
+    def process_batch(self, requests):
+        """Run both detectors on the whole batch, then SAM2 per request"""
+        frames = [request['frame'] for request in requests]
+        detections = {
+            model_key: run_yolo_detection_batch(self.models[model_key], frames, model_name, self.device, len(frames))
+            for model_key, model_name in DETECTORS
+        }
+
+        results = []
+        for index, request in enumerate(requests):
+            frame = request['frame']
+            per_model = {model_key: detections[model_key][index] for model_key, _ in DETECTORS}
+            result = {'image': frame.name, 'width': frame.width, 'height': frame.height, 'detections': per_model}
+
+            if request.get('fuse'):
+                result['fused'] = fuse_detections(per_model, method=request['fuse'])
+                prompt_sets = {'fused': result['fused']}
+            else:
+                prompt_sets = per_model
+
+            if request.get('segment', True):
+                result['masks'] = {}
+                for key, prompts in prompt_sets.items():
+                    masks = run_sam_segmentation(self.models['sam2_b'], frame, prompts, 'SAM2_b',
+                                                 self.device, self.embedding_cache) if prompts else []
+                    result['masks'][key] = [summarize_mask(mask) for mask in masks]
+
+            frame.release_cache()
+            results.append(result)
+        return results
+
+    def detect(self, frame, segment=True, fuse=None, timeout=60):
+        """Blocking detection for one frame; called from request threads"""
+        start = time.perf_counter()
+        result = self.batcher.submit({'frame': frame, 'segment': segment, 'fuse': fuse}).result(timeout=timeout)
+        result['latency']['total_ms'] = (time.perf_counter() - start) * 1000
+        self.latency.record(result['latency'])
+        return result
+
+    def health(self):
+        return {
+            'status': 'ok',
+            'device': self.device,
+            'models': sorted(self.models),
+            'uptime_seconds': time.time() - self.started_at,
+            'queue_depth': self.batcher.depth(),
+            'sam_embedding_cache': self.embedding_cache.stats() if self.embedding_cache else None
+        }
+
+
+def resolve_image_path(image_path, image_roots):
+    """Real path of a client-named image, which must lie inside one of image_roots
+
+    Symlinks and '..' are resolved first, so a path cannot escape its root.
+    Raises PermissionError when it is outside every root (or none are set).
+    """
+    real_path = os.path.realpath(image_path)
+    for root in image_roots:
+        if os.path.commonpath([real_path, root]) == root:
+            return real_path
+    raise PermissionError(f"image_path is outside the allowed image roots: {image_path}")
+
+
+def summarize_mask(mask_data):
+    """JSON-friendly mask summary: the full mask stays on the server"""
+    tile = as_tile(mask_data['mask'])
+    summary = {
+        'bbox': mask_data['bbox'],
+        'confidence': mask_data['confidence'],
+        'class_name': mask_data['class_name'],
+        'area': tile.area,
+        'mask_bbox': tile.bbox
+    }
+    if 'sources' in mask_data:
+        summary['sources'] = mask_data['sources']
+    return summary
+
+
+class ModelRequestHandler(BaseHTTPRequestHandler):
+    """HTTP API: GET /api/v1/health, GET /api/v1/latency, POST /api/v1/detect"""
+
+    service = None
+    image_roots = ()
+    max_body_bytes = MAX_BODY_MB * 1024 ** 2
+
+    def _send_json(self, payload, status=200):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+        if path == '/api/v1/health':
+            self._send_json(self.service.health())
+        elif path == '/api/v1/latency':
+            self._send_json(self.service.latency.summary())
+        else:
+            self._send_json({'error': 'Not found'}, 404)
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path != '/api/v1/detect':
+            self._send_json({'error': 'Not found'}, 404)
+            return
+
+        params = parse_qs(url.query)
+        segment = params.get('segment', ['1'])[0] not in ('0', 'false', 'no')
+        fuse = params.get('fuse', [None])[0]
+        if fuse not in (None, 'nms', 'wbf'):
+            self._send_json({'error': f"Unknown fusion method: {fuse}"}, 400)
+            return
+
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+        except ValueError:
+            self._send_json({'error': "Invalid Content-Length"}, 400)
+            return
+        if length < 0 or length > self.max_body_bytes:
+            # The unread body stays on the socket, so don't keep the connection
+            self.close_connection = True
+            self._send_json({'error': f"Request body over {self.max_body_bytes} bytes"}, 413)
+            return
+
+        try:
+            body = self.rfile.read(length)
+            if self.headers.get('Content-Type', '').startswith('application/json'):
+                # {"image_path": "..."} for images already on this host, under --image-root
+                frame = ImageFrame.from_path(resolve_image_path(json.loads(body)['image_path'], self.image_roots))
+            else:
+                frame = ImageFrame.from_bytes(body, name=params.get('name', ['upload'])[0])
+        except PermissionError as e:
+            self._send_json({'error': str(e)}, 403)
+            return
+        except (ValueError, KeyError, TypeError, OSError) as e:
+            self._send_json({'error': f"Invalid image: {e}"}, 400)
+            return
+
+        try:
+            self._send_json(self.service.detect(frame, segment=segment, fuse=fuse))
+        except Exception as e:
+            self._send_json({'error': str(e)}, 500)
+
+    def address_string(self):
+        # Unix socket clients have no host/port
+        return self.client_address[0] if isinstance(self.client_address, tuple) else 'unix'
+
+    def log_message(self, format, *args):
+        pass
+
+
+class ThreadingUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """HTTP over a Unix domain socket, one thread per connection"""
+
+    daemon_threads = True
+
+
+def make_server(service, host='127.0.0.1', port=8001, socket_path=None, image_roots=None, max_body_mb=MAX_BODY_MB):
+    """Create (but do not start) an HTTP server bound to TCP or a Unix socket
+
+    JSON image_path requests may only name files under image_roots; without
+    any, only uploaded image bytes are accepted. Bodies over max_body_mb are
+    refused with 413 before being read.
+    """
+    roots = tuple(os.path.realpath(root) for root in image_roots or ())
+    handler = type('BoundModelRequestHandler', (ModelRequestHandler,),
+                   {'service': service, 'image_roots': roots, 'max_body_bytes': int(max_body_mb * 1024 ** 2)})
+    if socket_path:
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        return ThreadingUnixHTTPServer(socket_path, handler)
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def parse_args():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description="MyCV-Platform persistent model server")
+    parser.add_argument('--host', default='127.0.0.1', help="Bind address (default: 127.0.0.1)")
+    parser.add_argument('--port', type=int, default=8001, help="TCP port (default: 8001)")
+    parser.add_argument('--socket', help="Serve on this Unix socket path instead of TCP")
+    parser.add_argument('--image-root', action='append', default=[],
+                        help="Directory whose images clients may name by JSON image_path (repeatable); "
+                             "without it only uploaded image bytes are accepted")
+    parser.add_argument('--max-body-mb', type=float, default=MAX_BODY_MB,
+                        help=f"Largest accepted request body in MB, larger ones get 413 (default: {MAX_BODY_MB})")
+    parser.add_argument('--backend', choices=BACKENDS, default='pytorch',
+                        help="YOLO inference backend (default: pytorch)")
+    parser.add_argument('--model-cache', nargs='?', const=MODEL_CACHE_DIR,
+                        help=f"Memory-map PyTorch checkpoints from converted copies here (default when given: {MODEL_CACHE_DIR})")
+    parser.add_argument('--window-ms', type=float, default=10,
+                        help="How long to wait for concurrent requests to batch together (default: 10)")
+    parser.add_argument('--max-batch', type=int, default=8, help="Max requests per batch (default: 8)")
+    parser.add_argument('--sam-cache-size', type=int, default=4,
+                        help="Max SAM2 image embeddings kept in memory, 0 disables the cache (default: 4)")
+    parser.add_argument('--sam-cache-mb', type=int, default=512,
+                        help="Memory bound for cached SAM2 embeddings in MB (default: 512)")
+    return parser.parse_args()
+
+
+def main():
+    """Main function"""
+    args = parse_args()
+
+    log_message("🛰️  MyCV-Platform Model Server", 'info')
+    log_message("=" * 50, 'info')
+
+    device = check_environment()
+    models = load_models(device, args.backend, model_cache=args.model_cache)
+    if not models:
+        log_message("❌ Failed to load models", 'error')
+        sys.exit(1)
+
+    service = InferenceService(models, device, args.window_ms, args.max_batch,
+                               args.sam_cache_size, args.sam_cache_mb)
+    server = make_server(service, args.host, args.port, args.socket, args.image_root, args.max_body_mb)
+
+    address = args.socket or f"http://{args.host}:{args.port}"
+    log_message(f"✅ Serving on {address} (batch window {args.window_ms:.0f}ms, max batch {args.max_batch})", 'success')
+    log_message("   GET /api/v1/health | GET /api/v1/latency | POST /api/v1/detect", 'info')
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        log_message("👋 Shutting down model server", 'info')
+    finally:
+        server.server_close()
+        if args.socket and os.path.exists(args.socket):
+            os.unlink(args.socket)
+
+
+if __name__ == "__main__":
+    main()
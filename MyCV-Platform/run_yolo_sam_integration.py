@@ -6,14 +6,58 @@ Runs YOLO11m and best.pt models, then uses bounding boxes as prompts for SAM2_b
 
 import os
 import sys
-import cv2
+import time
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 import numpy as np
-import torch
-from ultralytics import YOLO, SAM
 from termcolor import colored
 import json
 from pathlib import Path
 
+from app.utils.image_frame import ImageFrame
+from app.utils.sam_embedding_cache import SamEmbeddingCache
+from app.utils.box_fusion import fuse_detections
+from app.utils.stream_pipeline import StreamingPipeline
+from app.utils.environment_detector import EnvironmentDetector
+from app.utils.mask_codec import MASK_FORMATS, mask_file_path, read_masks, write_masks
+from app.utils.mask_tile import MaskTile, as_tile
+from app.utils.model_backends import BACKENDS, backend_available, compare_detections, load_detector
+from app.utils.quantization import calibration_frames, quantize_sam_int8, quantize_yolo_int8
+from app.utils.result_manifest import ResultManifest
+from app.utils.tracing import TRACE_FORMATS, configure_tracing, get_tracer, span
+from app.utils.video_source import iter_video_frames
+from app.utils.box_tracker import BoxTracker
+from app.utils.results_store import ResultsStore
+from app.utils.sliced_inference import crop_tiles, merge_tile_detections, slice_windows
+from app.utils.model_cache import MODEL_CACHE_DIR, build_cache, load_cached_sam, load_cached_yolo, memory_usage
+from app.utils.detector_cascade import CascadeStats, DetectorCascade, load_cascade_config
+from app.utils.sam_policy import load_sam_policy
+from app.utils.mask_metrics import METRICS_FILE, MetricsWriter, image_summary
+from app.utils.auto_tuner import MACHINE_PROFILE_PATH, AutoTuner, apply_profile, load_profile, save_profile, \
+    thread_candidates
+
+# Square detector input size shared by both YOLO models
+YOLO_IMGSZ = 640
+
+MODEL_PATHS = {
+    'yolo11m': "data/models/yolo/active/yolo11m.pt",
+    'best_pt': "data/models/trained/best.pt",
+    'sam2_b': "data/models/sam/active/sam2_b.pt"
+}
+
+# (model key, display name, detection step, segmentation step)
+DETECTORS = [
+    ('yolo11m', 'YOLO11m', "1️⃣", "2️⃣"),
+    ('best_pt', 'best.pt', "3️⃣", "4️⃣")
+]
+
+# With --cascade, the YOLO11 tier cascade takes YOLO11m's place
+CASCADE_DETECTOR = ('cascade', 'Cascade', "1️⃣", "2️⃣")
+
+# Where the YOLO11 tiers listed in config/models.yaml are installed
+YOLO_MODEL_DIR = os.path.dirname(MODEL_PATHS['yolo11m'])
+
 def log_message(message, level='info'):
     """Print colored log message"""
     colors = {
@@ -27,6 +71,8 @@ def log_message(message, level='info'):
 
 def check_environment():
     """Check virtual environment and GPU availability"""
+    import torch
+    
     log_message("🔍 Checking environment...", 'info')
     
     # Check virtual environment
@@ -46,8 +92,35 @@ def check_environment():
     
     return device
 
-def load_models(device):
-    """Load YOLO and SAM models"""
+def load_yolo_model(weights_path, model_name, backend='pytorch', model_cache=None):
+    """Load a YOLO checkpoint, optionally through an exported ONNX/OpenVINO backend
+    
+    With a model_cache directory, PyTorch weights are memory-mapped from a
+    converted copy there instead of unpickled into this process.
+    """
+    from ultralytics import YOLO
+    
+    if backend != 'pytorch':
+        if backend_available(backend):
+            log_message(f"⚙️  Using {backend} backend for {model_name} (exported once, cached next to the .pt)", 'info')
+            return load_detector(weights_path, backend, YOLO_IMGSZ)
+        log_message(f"⚠️  {backend} runtime not installed, falling back to PyTorch for {model_name}", 'warning')
+    if model_cache:
+        return load_cached_yolo(weights_path, model_cache)
+    return YOLO(weights_path)
+
+def load_models(device, backend='pytorch', quantize=False, calibration_dir="data/input/test_images",
+                model_cache=None, backends=None):
+    """Load YOLO and SAM models
+    
+    backends maps a detector key to its own backend, overriding backend
+    for that detector (see detector_backends). With quantize=True, best.pt and SAM2_b are replaced by cached INT8
+    variants (built on first use, best.pt calibrated on calibration_dir).
+    With a model_cache directory, PyTorch checkpoints are loaded through
+    memory-mapped copies there, which every worker process shares.
+    """
+    from ultralytics import YOLO, SAM
+    
     log_message("📦 Loading models...", 'info')
     
     models = {}
@@ -55,9 +128,11 @@ def load_models(device):
     # Load YOLO11m
     try:
         log_message("Loading YOLO11m model...", 'info')
-        yolo11m_path = "data/models/yolo/active/yolo11m.pt"
+        yolo11m_path = MODEL_PATHS['yolo11m']
         if os.path.exists(yolo11m_path):
-            models['yolo11m'] = YOLO(yolo11m_path)
+            yolo11m_backend = (backends or {}).get('yolo11m', backend)
+            with span('load_model', model='yolo11m', backend=yolo11m_backend):
+                models['yolo11m'] = load_yolo_model(yolo11m_path, 'YOLO11m', yolo11m_backend, model_cache)
             log_message("✅ YOLO11m loaded successfully", 'success')
         else:
             log_message("❌ YOLO11m model not found", 'error')
@@ -69,9 +144,22 @@ def load_models(device):
     # Load best.pt
     try:
         log_message("Loading best.pt model...", 'info')
-        best_pt_path = "data/models/trained/best.pt"
+        best_pt_path = MODEL_PATHS['best_pt']
         if os.path.exists(best_pt_path):
-            models['best_pt'] = YOLO(best_pt_path)
+            best_pt_backend = (backends or {}).get('best_pt', backend)
+            with span('load_model', model='best_pt', backend=best_pt_backend):
+                models['best_pt'] = load_yolo_model(best_pt_path, 'best.pt', best_pt_backend, model_cache)
+            if quantize:
+                try:
+                    with span('quantize_model', model='best_pt'):
+                        # Calibration images are only decoded when the cached INT8 model is stale
+                        int8_model_path = quantize_yolo_int8(
+                            best_pt_path, lambda: calibration_frames(calibration_dir), YOLO_IMGSZ
+                        )
+                        models['best_pt'] = YOLO(int8_model_path, task='detect')
+                    log_message(f"🔢 best.pt INT8 model: {int8_model_path}", 'info')
+                except Exception as e:
+                    log_message(f"⚠️  best.pt INT8 quantization unavailable, using FP32: {e}", 'warning')
             log_message("✅ best.pt loaded successfully", 'success')
         else:
             log_message("❌ best.pt model not found", 'error')
@@ -83,9 +171,16 @@ def load_models(device):
     # Load SAM2_b
     try:
         log_message("Loading SAM2_b model...", 'info')
-        sam2_path = "data/models/sam/active/sam2_b.pt"
+        sam2_path = MODEL_PATHS['sam2_b']
         if os.path.exists(sam2_path):
-            models['sam2_b'] = SAM(sam2_path)
+            with span('load_model', model='sam2_b'):
+                models['sam2_b'] = load_cached_sam(sam2_path, model_cache) if model_cache else SAM(sam2_path)
+            if quantize and device == 'cpu':
+                with span('quantize_model', model='sam2_b'):
+                    quantize_sam_int8(models['sam2_b'], sam2_path)
+                log_message("🔢 SAM2_b Linear layers quantized to INT8", 'info')
+            elif quantize:
+                log_message("⚠️  INT8 SAM2_b is CPU-only, keeping FP32 on GPU", 'warning')
             log_message("✅ SAM2_b loaded successfully", 'success')
         else:
             log_message("❌ SAM2_b model not found", 'error')
@@ -96,30 +191,97 @@ def load_models(device):
     
     return models
 
-def run_yolo_detection(model, image_path, model_name, device):
-    """Run YOLO detection on image"""
-    log_message(f"🔍 Running {model_name} detection on {os.path.basename(image_path)}...", 'info')
+def active_detectors(args):
+    """DETECTORS for this run, with the cascade in YOLO11m's slot under --cascade"""
+    if args.cascade:
+        return [CASCADE_DETECTOR] + DETECTORS[1:]
+    return DETECTORS
+
+def model_setting(args, model_key, name):
+    """A detector's value of a run setting: the machine profile's when it was tuned on that detector"""
+    return getattr(args, 'model_settings', {}).get(model_key, {}).get(name, getattr(args, name))
+
+def detector_backends(args):
+    """Backend of each detector, for load_models"""
+    return {model_key: model_setting(args, model_key, 'backend') for model_key, _, _, _ in DETECTORS}
+
+def cascade_weight_paths(cascade_config):
+    """Checkpoint path of every cascade tier"""
+    return {tier: os.path.join(YOLO_MODEL_DIR, filename) for tier, filename in cascade_config['filenames'].items()}
+
+def load_cascade(models, args):
+    """Build the detector cascade from config/models.yaml, reusing YOLO11m when it is a tier"""
+    cascade_config = load_cascade_config(args.models_config)
+    tier_models = {}
+    for tier, weights_path in cascade_weight_paths(cascade_config).items():
+        if tier == 'yolo11m' and 'yolo11m' in models:
+            tier_models[tier] = models['yolo11m']
+            continue
+        if not os.path.exists(weights_path):
+            log_message(f"❌ Cascade tier {tier} not found at {weights_path}", 'error')
+            return None
+        with span('load_model', model=tier, backend=args.backend):
+            tier_models[tier] = load_yolo_model(weights_path, tier, args.backend, args.model_cache)
     
-    try:
-        # Run detection
-        results = model(image_path, verbose=False)
+    log_message(f"🪜 Detector cascade: {' → '.join(cascade_config['tiers'])} "
+                f"(escalate below {cascade_config['min_confidence']} confidence, "
+                f"on class conflicts above {cascade_config['conflict_iou']} IoU"
+                f"{', on empty results' if cascade_config['escalate_on_empty'] else ''})", 'info')
+    return DetectorCascade(tier_models, cascade_config)
+
+class FailedResult(list):
+    """Empty result of a detection or segmentation that raised
+    
+    Iterates like [], so callers that only read results need no special
+    case, but failed() tells it apart from a genuinely empty result so it
+    is never recorded in the manifest as done.
+    """
+
+def failed(result):
+    return isinstance(result, FailedResult)
+
+def extract_detections(result, model, frame=None, imgsz=YOLO_IMGSZ):
+    """Convert a single ultralytics result into detection dicts
+    
+    When the result came from a frame's letterboxed tensor (of size imgsz),
+    boxes are mapped back to the frame's original pixel coordinates.
+    """
+    detections = []
+    if result.boxes is not None:
+        boxes = result.boxes.xyxy.cpu().numpy()  # x1, y1, x2, y2
+        if frame is not None:
+            boxes = frame.scale_boxes(boxes, imgsz)
+        confidences = result.boxes.conf.cpu().numpy()
+        classes = result.boxes.cls.cpu().numpy()
         
-        # Extract bounding boxes
-        detections = []
-        for result in results:
-            if result.boxes is not None:
-                boxes = result.boxes.xyxy.cpu().numpy()  # x1, y1, x2, y2
-                confidences = result.boxes.conf.cpu().numpy()
-                classes = result.boxes.cls.cpu().numpy()
-                
-                for i, (box, conf, cls) in enumerate(zip(boxes, confidences, classes)):
-                    detection = {
-                        'bbox': box.tolist(),  # [x1, y1, x2, y2]
-                        'confidence': float(conf),
-                        'class_id': int(cls),
-                        'class_name': model.names[int(cls)] if hasattr(model, 'names') else f'class_{int(cls)}'
-                    }
-                    detections.append(detection)
+        for box, conf, cls in zip(boxes, confidences, classes):
+            detection = {
+                'bbox': box.tolist(),  # [x1, y1, x2, y2]
+                'confidence': float(conf),
+                'class_id': int(cls),
+                'class_name': model.names[int(cls)] if hasattr(model, 'names') else f'class_{int(cls)}'
+            }
+            detections.append(detection)
+    
+    return detections
+
+def run_yolo_detection(model, image, model_name, device, imgsz=YOLO_IMGSZ):
+    """Run YOLO detection on an image path or a decoded ImageFrame"""
+    frame = image if isinstance(image, ImageFrame) else None
+    image_label = frame.name if frame is not None else os.path.basename(image)
+    log_message(f"🔍 Running {model_name} detection on {image_label}...", 'info')
+    
+    try:
+        # Run detection; frames reuse their cached letterboxed tensor
+        with span('detect', model=model_name, image=image_label) as detect_span:
+            source = frame.letterbox_tensor(imgsz) if frame is not None else image
+            results = model(source, verbose=False)
+            
+            # Extract bounding boxes
+            detections = []
+            for result in results:
+                detections.extend(extract_detections(result, model, frame, imgsz))
+            detect_span.set(detections=len(detections))
         
         log_message(f"✅ {model_name} found {len(detections)} objects", 'success')
         for i, det in enumerate(detections):
@@ -129,16 +291,180 @@ def run_yolo_detection(model, image_path, model_name, device):
         
     except Exception as e:
         log_message(f"❌ {model_name} detection failed: {e}", 'error')
-        return []
+        return FailedResult()
+
+def iter_batches(items, batch_size):
+    """Yield consecutive chunks of items; the last chunk may be smaller"""
+    batch_size = max(1, int(batch_size))
+    for start in range(0, len(items), batch_size):
+        yield items[start:start + batch_size]
+
+def stack_letterboxed(frames, imgsz=YOLO_IMGSZ):
+    """Stack the frames' cached letterboxed tensors into one NCHW batch"""
+    import torch
+    
+    return torch.cat([frame.letterbox_tensor(imgsz) for frame in frames])
+
+def run_yolo_detection_batch(model, frames, model_name, device, batch_size=8, imgsz=YOLO_IMGSZ):
+    """Run YOLO detection on decoded ImageFrames in batches
+    
+    Returns one detection list per input frame, in input order, with the
+    same dict layout as run_yolo_detection.
+    """
+    all_detections = []
+    
+    for batch in iter_batches(frames, batch_size):
+        try:
+            # Letterboxed frames share one shape, so a batch is one forward pass
+            with span('detect_batch', model=model_name, images=len(batch)):
+                results = model(stack_letterboxed(batch, imgsz), verbose=False)
+                for frame, result in zip(batch, results):
+                    all_detections.append(extract_detections(result, model, frame, imgsz))
+        except Exception as e:
+            log_message(f"❌ {model_name} batch detection failed: {e}", 'error')
+            all_detections.extend(FailedResult() for _ in batch)
+    
+    total = sum(len(dets) for dets in all_detections)
+    log_message(f"✅ {model_name} found {total} objects in {len(frames)} images (batch size {batch_size})", 'success')
+    return all_detections
+
+def run_yolo_detection_sliced(model, frame, model_name, device, slice_size, overlap=0.2, nms_iou=0.5,
+                              batch_size=8, imgsz=YOLO_IMGSZ):
+    """Run YOLO detection on overlapping tiles of a decoded ImageFrame
+    
+    Each slice_size tile is letterboxed to imgsz on its own, so small
+    objects keep close to native resolution. The whole frame is detected
+    too, for objects larger than a tile. Tiles go through the model in
+    batches and their boxes are merged back with class-aware NMS.
+    """
+    windows = slice_windows(frame.width, frame.height, slice_size, overlap)
+    if len(windows) == 1:
+        return run_yolo_detection(model, frame, model_name, device, imgsz)
+    
+    log_message(f"🔍 Running {model_name} sliced detection on {frame.name} ({len(windows)} tiles of {slice_size}px)...", 'info')
+    tiles = [frame] + crop_tiles(frame, windows)
+    windows = [(0, 0, frame.width, frame.height)] + windows
+    
+    try:
+        with span('detect_sliced', model=model_name, image=frame.name, tiles=len(tiles)) as detect_span:
+            tile_detections = []
+            for batch in iter_batches(tiles, batch_size):
+                results = model(stack_letterboxed(batch, imgsz), verbose=False)
+                for tile, result in zip(batch, results):
+                    tile_detections.append(extract_detections(result, model, tile, imgsz))
+            
+            detections = merge_tile_detections(tile_detections, windows, nms_iou)
+            detect_span.set(raw_detections=sum(len(dets) for dets in tile_detections), detections=len(detections))
+        
+        log_message(f"✅ {model_name} found {len(detections)} objects", 'success')
+        for i, det in enumerate(detections):
+            log_message(f"   Object {i+1}: {det['class_name']} (conf: {det['confidence']:.3f})", 'info')
+        
+        return detections
+        
+    except Exception as e:
+        log_message(f"❌ {model_name} sliced detection failed: {e}", 'error')
+        return FailedResult()
+
+def run_cascade_detection(cascade, frames, args, device):
+    """Run the detector cascade on decoded frames, one detection list per frame
+    
+    Each tier uses the same detection mode as the plain detectors: sliced,
+    batched or one image at a time.
+    """
+    def detect(model, tier, tier_frames):
+        if args.slice_size:
+            return [run_yolo_detection_sliced(model, frame, tier, device, args.slice_size, args.slice_overlap,
+                                              args.slice_iou, args.slice_batch, args.imgsz) for frame in tier_frames]
+        if args.batch_size > 1:
+            return run_yolo_detection_batch(model, tier_frames, tier, device, args.batch_size, args.imgsz)
+        return [run_yolo_detection(model, frame, tier, device, args.imgsz) for frame in tier_frames]
+    
+    with span('detect_cascade', images=len(frames)):
+        return cascade.run(frames, detect)
+
+def log_cascade_summary(stats, output_dir):
+    """Print how many images escalated and save cascade_report.json"""
+    summary = stats.summary()
+    log_message(f"\n🪜 Cascade: {summary['escalated']}/{summary['images']} images escalated "
+                f"({summary['escalation_rate']:.0%}), {summary['detect_ms_per_image']:.1f} ms detection per image", 'info')
+    for tier, count in summary['final_tier'].items():
+        tier_ms = summary['tier_ms_per_image'].get(tier)
+        timing = f", {tier_ms:.1f} ms/image" if tier_ms is not None else ""
+        log_message(f"   {tier}: final for {count} images{timing}", 'info')
+    if summary['reasons']:
+        log_message("   Escalations: " + ", ".join(f"{reason} {count}" for reason, count in summary['reasons'].items()), 'info')
+    
+    os.makedirs(output_dir, exist_ok=True)
+    with open(os.path.join(output_dir, "cascade_report.json"), 'w') as f:
+        json.dump(summary, f, indent=2)
+    return summary
+
+def log_sam_policy_summary(sam_policy, output_dir):
+    """Print how many SAM2 prompts the policy skipped and save sam_policy_report.json"""
+    summary = sam_policy.summary()
+    log_message(f"\n🎭 SAM2 policy: {summary['prompted']}/{summary['detections']} detections prompted, "
+                f"{summary['skipped']} skipped ({summary['skip_rate']:.0%})", 'info')
+    if summary['reasons']:
+        log_message("   Skipped: " + ", ".join(f"{reason} {count}" for reason, count in summary['reasons'].items()), 'info')
+    
+    os.makedirs(output_dir, exist_ok=True)
+    with open(os.path.join(output_dir, "sam_policy_report.json"), 'w') as f:
+        json.dump(summary, f, indent=2)
+    return summary
+
+def benchmark_batch_sizes(models, image_paths, device, batch_sizes=(1, 4, 8, 16)):
+    """Measure YOLO throughput (images/sec) for each batch size"""
+    log_message("⏱️  Benchmarking batched YOLO inference...", 'info')
+    
+    frames = [ImageFrame.from_path(path) for path in image_paths]
+    report = {}
+    
+    for model_key, model_name in (('yolo11m', 'YOLO11m'), ('best_pt', 'best.pt')):
+        model = models[model_key]
+        
+        # Warm up once so the first batch size does not pay model setup cost
+        model(frames[0].letterbox_tensor(YOLO_IMGSZ), verbose=False)
+        
+        report[model_key] = {}
+        for batch_size in batch_sizes:
+            start = time.perf_counter()
+            for batch in iter_batches(frames, batch_size):
+                model(stack_letterboxed(batch), verbose=False)
+            elapsed = time.perf_counter() - start
+            
+            images_per_sec = len(frames) / elapsed if elapsed > 0 else 0.0
+            report[model_key][batch_size] = {
+                'images': len(frames),
+                'seconds': elapsed,
+                'images_per_sec': images_per_sec
+            }
+            log_message(f"   {model_name} batch={batch_size:>2}: {images_per_sec:.2f} images/sec "
+                        f"({elapsed:.2f}s for {len(frames)} images)", 'info')
+    
+    return report
 
-def run_sam_segmentation(sam_model, image_path, bounding_boxes, model_name, device):
-    """Run SAM2 segmentation using bounding boxes as prompts"""
+def get_sam_predictor(sam_model):
+    """Return the SAM model's predictor, creating it on first use"""
+    if sam_model.predictor is None:
+        predictor_class = sam_model.task_map['segment']['predictor']
+        overrides = dict(conf=0.25, task="segment", mode="predict", imgsz=1024, verbose=False)
+        sam_model.predictor = predictor_class(overrides=overrides, _callbacks=sam_model.callbacks)
+        sam_model.predictor.setup_model(model=sam_model.model, verbose=False)
+    return sam_model.predictor
+
+def run_sam_segmentation(sam_model, image, bounding_boxes, model_name, device, embedding_cache=None):
+    """Run SAM2 segmentation using bounding boxes as prompts
+    
+    With an embedding_cache, the image encoder runs once per distinct image
+    and every later prompt set on that image only runs the mask decoder.
+    """
     log_message(f"🎯 Running SAM2 segmentation with {len(bounding_boxes)} bounding boxes...", 'info')
     
     try:
-        # Load image
-        image = cv2.imread(image_path)
-        image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+        # Reuse the frame's decoded RGB buffer instead of reading the file again
+        frame = image if isinstance(image, ImageFrame) else ImageFrame.from_path(image)
+        image_rgb = frame.rgb
         
         # Convert bounding boxes to SAM format (x1, y1, x2, y2)
         boxes = []
@@ -150,32 +476,72 @@ def run_sam_segmentation(sam_model, image_path, bounding_boxes, model_name, devi
             log_message("⚠️  No bounding boxes provided for SAM2", 'warning')
             return []
         
-        # Run SAM2 segmentation
-        results = sam_model(image_rgb, bboxes=boxes, verbose=False)
+        # Run SAM2 segmentation: the image encoder runs in set_image, and the
+        # prompted call below only runs the mask decoder on those features
+        predictor = get_sam_predictor(sam_model)
+        features = embedding_cache.get(frame.content_hash) if embedding_cache is not None else None
+        if features is None:
+            with span('sam_encoder', image=frame.name):
+                predictor.set_image(image_rgb)
+            if embedding_cache is not None:
+                embedding_cache.put(frame.content_hash, predictor.features)
+        else:
+            log_message("♻️  Reusing cached SAM2 image embedding", 'info')
+            predictor.features = features
+        try:
+            with span('sam_decoder', image=frame.name, prompts=len(boxes)):
+                results = sam_model(image_rgb, bboxes=boxes, verbose=False)
+        finally:
+            # Never let this image's embedding leak into the next call
+            predictor.reset_image()
         
-        # Extract masks
+        # Extract masks; SAM2 returns one mask per box prompt, in prompt order.
+        # Each mask is cropped to its bounds on-device, so only the tile is
+        # copied to host memory instead of a full-frame float array.
         masks = []
-        for i, result in enumerate(results):
+        box_index = 0
+        for result in results:
             if hasattr(result, 'masks') and result.masks is not None:
-                mask = result.masks.data.cpu().numpy()
-                masks.append({
-                    'mask': mask,
-                    'bbox': bounding_boxes[i]['bbox'],
-                    'confidence': bounding_boxes[i]['confidence'],
-                    'class_name': bounding_boxes[i]['class_name']
-                })
+                mask_data = result.masks.data
+                for j in range(mask_data.shape[0]):
+                    if box_index >= len(bounding_boxes):
+                        break
+                    prompt = bounding_boxes[box_index]
+                    mask_entry = {
+                        'mask': MaskTile.from_tensor(mask_data[j]),
+                        'bbox': prompt['bbox'],
+                        'confidence': prompt['confidence'],
+                        'class_name': prompt['class_name']
+                    }
+                    if 'sources' in prompt:
+                        mask_entry['sources'] = prompt['sources']
+                    masks.append(mask_entry)
+                    box_index += 1
         
         log_message(f"✅ SAM2 generated {len(masks)} segmentation masks", 'success')
         return masks
         
     except Exception as e:
         log_message(f"❌ SAM2 segmentation failed: {e}", 'error')
-        return []
+        return FailedResult()
 
-def save_results(image_name, yolo_detections, sam_masks, output_dir):
-    """Save detection and segmentation results"""
+def save_results(image_name, yolo_detections, sam_masks, output_dir, mask_format='png'):
+    """Save detection and segmentation results
+    
+    mask_format 'png' writes one PNG per mask into <image>_masks/; 'rle' and
+    'packbits' write every mask of the image into one compact file.
+    """
     log_message(f"💾 Saving results for {image_name}...", 'info')
     
+    with span('save_results', image=image_name, masks=len(sam_masks), mask_format=mask_format):
+        write_result_files(image_name, yolo_detections, sam_masks, output_dir, mask_format)
+    
+    log_message(f"✅ Results saved to {output_dir}", 'success')
+
+def write_result_files(image_name, yolo_detections, sam_masks, output_dir, mask_format):
+    """Write the detections JSON and the masks in the requested format"""
+    import cv2
+    
     # Create output directory
     os.makedirs(output_dir, exist_ok=True)
     
@@ -185,77 +551,1098 @@ def save_results(image_name, yolo_detections, sam_masks, output_dir):
         json.dump(yolo_detections, f, indent=2)
     
     # Save segmentation masks
-    if sam_masks:
+    if sam_masks and mask_format != 'png':
+        write_masks(mask_file_path(output_dir, image_name, mask_format), sam_masks, mask_format)
+    elif sam_masks:
         mask_dir = os.path.join(output_dir, f"{image_name}_masks")
         os.makedirs(mask_dir, exist_ok=True)
         
         for i, mask_data in enumerate(sam_masks):
             mask_file = os.path.join(mask_dir, f"mask_{i+1}_{mask_data['class_name']}.png")
-            mask = (mask_data['mask'][0] * 255).astype(np.uint8)
+            mask = as_tile(mask_data['mask']).to_full().astype(np.uint8) * 255
             cv2.imwrite(mask_file, mask)
+
+def segment_and_save(models, image_name, frame, detections, model_key, model_name, step, device, output_dir,
+                     embedding_cache=None, write=None, mask_format='png', manifest=None, store=None, metrics=None):
+    """Run SAM2 with one detector's boxes and save the results
     
-    log_message(f"✅ Results saved to {output_dir}", 'success')
+    write(fn, *args) lets a caller hand the save off to another thread;
+    by default results are saved inline. With a results store, results are
+    appended to it instead of written as per-image files. Saved results are
+    recorded in the manifest, if one is given. With a metrics writer, the
+    in-memory masks are also measured into one summary record per image.
+    
+    With models['sam_policy'], only detections passing their class's rule
+    prompt SAM2; the saved detections are marked 'segmented' and each mask
+    names its detection by 'detection_index'.
+    
+    When detection or SAM2 failed nothing is saved or recorded, so the
+    image is processed again on the next run.
+    """
+    image_path = frame.path
+    frame_shape = (frame.height, frame.width)
+    sam_policy = models.get('sam_policy')
+    
+    def save(result_name, detections, sam_masks):
+        if store is not None:
+            with span('store_append', image=image_name, masks=len(sam_masks)):
+                store.append(image_name, model_key, detections, sam_masks)
+        else:
+            save_results(result_name, detections, sam_masks, output_dir, mask_format)
+        if metrics is not None:
+            with span('mask_metrics', image=image_name, masks=len(sam_masks)):
+                metrics.write(image_summary(image_name, model_key, detections, sam_masks, frame_shape))
+        if manifest is not None:
+            manifest.record(image_path, model_key, metrics=metrics is not None)
+    
+    if failed(detections):
+        log_message(f"⚠️  {model_name} detection failed, leaving {image_name} for the next run", 'warning')
+        return
+    
+    if detections:
+        prompt_indices = list(range(len(detections)))
+        if sam_policy is not None:
+            prompt_indices, skipped = sam_policy.select(detections)
+            detections = sam_policy.annotate(detections, skipped)
+            if skipped:
+                log_message(f"⏭️  SAM2 policy skipped {len(skipped)} of {len(detections)} {model_name} boxes", 'info')
+        
+        sam_masks = []
+        if prompt_indices:
+            log_message(f"{step} SAM2 Segmentation ({model_name} prompts)", 'info')
+            sam_masks = run_sam_segmentation(
+                models['sam2_b'], frame, [detections[i] for i in prompt_indices], 'SAM2_b', device, embedding_cache
+            )
+            if failed(sam_masks):
+                log_message(f"⚠️  SAM2 failed, leaving {image_name} {model_name} results for the next run", 'warning')
+                return
+            if sam_policy is not None:
+                for mask_data, index in zip(sam_masks, prompt_indices):
+                    mask_data['detection_index'] = index
+        if write is None:
+            save(f"{image_name}_{model_key}", detections, sam_masks)
+        else:
+            write(save, f"{image_name}_{model_key}", detections, sam_masks)
+    else:
+        log_message(f"⚠️  No {model_name} detections, skipping SAM2", 'warning')
+        if metrics is not None:
+            # Empty trays still get a record, with cv_quantity 0
+            metrics.write(image_summary(image_name, model_key, [], [], frame_shape))
+        if manifest is not None:
+            manifest.record(image_path, model_key, metrics=metrics is not None)
+
+def load_saved_detections(output_dir, image_name, result_key, store=None):
+    """Reload detections written by an earlier run, or None when none were saved"""
+    if store is not None:
+        saved = store.result(image_name, result_key)
+        return saved[0] if saved is not None else None
+    
+    detection_file = os.path.join(output_dir, f"{image_name}_{result_key}_detections.json")
+    if not os.path.exists(detection_file):
+        return None
+    with open(detection_file, 'r') as f:
+        return json.load(f)
+
+def load_saved_masks(output_dir, result_name, detections, mask_format):
+    """Reload the masks written for one result, each naming its detection by 'detection_index'
+    
+    PNG masks carry no index; they were written in prompt order, i.e. one
+    per detection not marked segmented=False.
+    """
+    import cv2
+    
+    if mask_format != 'png':
+        path = mask_file_path(output_dir, result_name, mask_format)
+        masks = read_masks(path) if os.path.exists(path) else []
+    else:
+        mask_dir = os.path.join(output_dir, f"{result_name}_masks")
+        names = os.listdir(mask_dir) if os.path.isdir(mask_dir) else []
+        names = sorted((name for name in names if name.endswith('.png')), key=lambda name: int(name.split('_')[1]))
+        masks = [{'mask': MaskTile.from_full(cv2.imread(os.path.join(mask_dir, name), cv2.IMREAD_GRAYSCALE))}
+                 for name in names]
+    
+    prompted = [i for i, det in enumerate(detections) if det.get('segmented', True)]
+    for mask_data, index in zip(masks, prompted):
+        mask_data.setdefault('detection_index', index)
+    return masks
+
+def backfill_metrics(frame, result_key, args, manifest, store, metrics):
+    """Write the metrics record of an up-to-date result from its saved detections and masks"""
+    if store is not None:
+        saved = store.result(frame.name, result_key)
+    else:
+        detections = load_saved_detections(args.output_dir, frame.name, result_key)
+        saved = None if detections is None else (
+            detections, load_saved_masks(args.output_dir, f"{frame.name}_{result_key}", detections, args.mask_format)
+        )
+    # Results without detections are recorded in the manifest but never written
+    detections, masks = saved if saved is not None else ([], [])
+    
+    log_message(f"📐 Measuring saved {result_key} masks", 'info')
+    with span('mask_metrics', image=frame.name, masks=len(masks)):
+        metrics.write(image_summary(frame.name, result_key, detections, masks, (frame.height, frame.width)))
+    manifest.record(frame.path, result_key, metrics=True)
+
+def process_frames(models, frames, args, device, embedding_cache=None, write=None, manifest=None, store=None,
+                   metrics=None):
+    """Run detection, segmentation and saving for a batch of decoded frames
+    
+    With a manifest, stages whose inputs are unchanged are skipped: an
+    up-to-date detection stage is reloaded from its JSON and only SAM2
+    re-runs, and a fully up-to-date result set is skipped entirely. Saved
+    detections that cannot be found are detected again.
+    """
+    detectors = active_detectors(args)
+    result_keys = ['fused'] if args.fuse else [model_key for model_key, _, _, _ in detectors]
+    plans = [manifest.plan(frame.path, result_keys) if manifest is not None else None for frame in frames]
+    
+    def stage_needed(index, model_key, stage):
+        result_key = 'fused' if args.fuse else model_key
+        return plans[index] is None or plans[index][result_key][stage]
+    
+    # Reload detections of up-to-date detect stages before batching, so a
+    # missing one can still join the batch to be detected again
+    saved = {}
+    for index, frame in enumerate(frames):
+        for result_key in result_keys:
+            if stage_needed(index, result_key, 'segment') and not stage_needed(index, result_key, 'detect'):
+                saved[index, result_key] = load_saved_detections(args.output_dir, frame.name, result_key, store)
+                if saved[index, result_key] is None:
+                    log_message(f"⚠️  No saved {result_key} detections for {frame.name}, detecting again", 'warning')
+    
+    def metrics_needed(index, result_key):
+        return metrics is not None and plans[index] is not None and plans[index][result_key]['metrics']
+    
+    def detect_needed(index, model_key):
+        result_key = 'fused' if args.fuse else model_key
+        return stage_needed(index, model_key, 'detect') or saved.get((index, result_key), []) is None
+    
+    # Batched detection, only for frames whose detection stage is stale; the
+    # cascade always sees all frames at once so each tier runs once per batch
+    batched = {}
+    for model_key, model_name, detect_step, _ in detectors:
+        if model_key != 'cascade' and (args.batch_size <= 1 or args.slice_size):
+            continue
+        indices = [i for i in range(len(frames)) if detect_needed(i, model_key)]
+        if indices:
+            log_message(f"\n{detect_step} {model_name} Detection ({len(indices)} images)", 'info')
+            if model_key == 'cascade':
+                batch_results = run_cascade_detection(models['cascade'], [frames[i] for i in indices], args, device)
+            else:
+                batch_results = run_yolo_detection_batch(models[model_key], [frames[i] for i in indices],
+                                                         model_name, device, args.batch_size,
+                                                         model_setting(args, model_key, 'imgsz'))
+            batched[model_key] = dict(zip(indices, batch_results))
+    
+    for index, frame in enumerate(frames):
+        with span('image', image=frame.name):
+            image_name = frame.name
+            log_message(f"\n🖼️  Processing: {image_name}", 'info')
+            log_message("-" * 30, 'info')
+            
+            # 1. - 4. Detect with each model, then segment its boxes (unless fusing)
+            detections = {}
+            for model_key, model_name, detect_step, segment_step in detectors:
+                if not stage_needed(index, model_key, 'segment'):
+                    if not args.fuse:
+                        log_message(f"⏭️  {model_name} results up to date, skipping", 'info')
+                        if metrics_needed(index, model_key):
+                            backfill_metrics(frame, model_key, args, manifest, store, metrics)
+                    continue
+                
+                if detect_needed(index, model_key):
+                    if model_key in batched:
+                        detections[model_key] = batched[model_key][index]
+                    elif args.slice_size:
+                        log_message(f"{detect_step} {model_name} Sliced Detection", 'info')
+                        detections[model_key] = run_yolo_detection_sliced(
+                            models[model_key], frame, model_name, device, args.slice_size,
+                            args.slice_overlap, args.slice_iou, args.slice_batch,
+                            model_setting(args, model_key, 'imgsz')
+                        )
+                    else:
+                        log_message(f"{detect_step} {model_name} Detection", 'info')
+                        detections[model_key] = run_yolo_detection(models[model_key], frame, model_name, device,
+                                                                   model_setting(args, model_key, 'imgsz'))
+                elif not args.fuse:
+                    log_message(f"♻️  Reusing saved {model_name} detections", 'info')
+                    detections[model_key] = saved[index, model_key]
+                
+                if not args.fuse:
+                    segment_and_save(models, image_name, frame, detections[model_key], model_key, model_name,
+                                     segment_step, device, args.output_dir, embedding_cache, write,
+                                     args.mask_format, manifest, store, metrics)
+            
+            # 4. Run SAM2 once with the fused boxes
+            if args.fuse:
+                if not stage_needed(index, 'fused', 'segment'):
+                    log_message("⏭️  Fused results up to date, skipping", 'info')
+                    if metrics_needed(index, 'fused'):
+                        backfill_metrics(frame, 'fused', args, manifest, store, metrics)
+                    frame.release_cache()
+                    continue
+                
+                if any(failed(dets) for dets in detections.values()):
+                    fused_detections = FailedResult()
+                elif detections:
+                    fused_detections = fuse_detections(
+                        {model_key: detections[model_key] for model_key, _, _, _ in detectors},
+                        method=args.fuse, iou_threshold=args.fuse_iou, class_agnostic=args.fuse_class_agnostic
+                    )
+                    log_message(f"🔗 Fused {sum(len(dets) for dets in detections.values())} boxes "
+                                f"into {len(fused_detections)} SAM2 prompts ({args.fuse})", 'info')
+                else:
+                    log_message("♻️  Reusing saved fused detections", 'info')
+                    fused_detections = saved[index, 'fused']
+                segment_and_save(models, image_name, frame, fused_detections,
+                                 'fused', 'fused', "4️⃣", device, args.output_dir, embedding_cache, write,
+                                 args.mask_format, manifest, store, metrics)
+            
+            frame.release_cache()
+
+def parse_ints(text):
+    """'1,4,8' -> [1, 4, 8]"""
+    return [int(item) for item in text.split(',') if item]
+
+def run_auto_tune(args, device):
+    """Sweep backend, input size, torch threads and batch size for best.pt and save the machine profile
+    
+    Timing runs on synthetic frames. The .jpg files in --input-dir, when
+    there are any, are detected with every backend and input size and
+    compared with PyTorch at the default size; without them the input size
+    is not tuned. The tuned input size and backend are applied to best.pt
+    only; threads and batch size apply to the whole run.
+    """
+    import torch
+    
+    best_pt_path = MODEL_PATHS['best_pt']
+    if not os.path.exists(best_pt_path):
+        log_message("❌ best.pt model not found, cannot auto-tune", 'error')
+        return None
+    
+    backends = [backend for backend in BACKENDS if backend_available(backend)]
+    threads = thread_candidates(os.cpu_count() or 1) if device == 'cpu' else [torch.get_num_threads()]
+    imgsz_values = args.tune_imgsz
+    reference_frames = calibration_frames(args.input_dir, limit=8) if os.path.isdir(args.input_dir) else []
+    if not reference_frames:
+        log_message(f"⚠️  No test images in {args.input_dir} to check detections against, "
+                    f"keeping the input size at {YOLO_IMGSZ}", 'warning')
+        imgsz_values = [YOLO_IMGSZ]
+    
+    log_message(f"🎛️  Auto-tuning best.pt: backends {backends}, input sizes {imgsz_values}, "
+                f"torch threads {threads}, batch sizes {args.tune_batch_sizes}", 'info')
+    tuner = AutoTuner(EnvironmentDetector(), args.latency_budget_ms)
+    with span('auto_tune'):
+        measurements = tuner.sweep(
+            load_model=lambda backend: load_yolo_model(best_pt_path, 'best.pt', backend, args.model_cache),
+            infer=lambda model, frames, imgsz: model(stack_letterboxed(frames, imgsz), verbose=False),
+            backends=backends,
+            imgsz_values=imgsz_values,
+            threads=threads,
+            batch_sizes=args.tune_batch_sizes,
+            detect=lambda model, frames, imgsz: run_yolo_detection_batch(model, frames, 'best.pt', device, 8, imgsz),
+            reference_frames=reference_frames,
+            reference={'backend': 'pytorch', 'imgsz': YOLO_IMGSZ}
+        )
+    
+    for measurement in measurements:
+        if 'error' in measurement:
+            log_message(f"⚠️  {measurement['backend']} backend failed to load: {measurement['error']}", 'warning')
+    
+    profile = tuner.profile(measurements)
+    if profile is None:
+        log_message("❌ Auto-tuning measured no usable configuration", 'error')
+        return None
+    
+    best = profile['best']
+    level = 'success' if profile['within_budget'] else 'warning'
+    thread_text = f"{best['torch_threads']} threads, " if best['torch_threads'] else ""
+    log_message(f"🏁 Best: {best['backend']} {best['imgsz']}px, {thread_text}"
+                f"batch {best['batch_size']}: {best['images_per_sec']:.2f} images/sec, "
+                f"{best['latency_ms']:.0f} ms per batch (budget {args.latency_budget_ms:.0f} ms)", level)
+    save_profile(args.profile, profile)
+    log_message(f"💾 Machine profile saved: {args.profile}", 'success')
+    return profile
+
+def load_machine_profile(args, device):
+    """Apply this machine's tuned settings, auto-tuning first when it has no valid profile
+    
+    Only called by the inference modes. Options given on the command line
+    win over the profile. The tuned thread count is for a single process,
+    so sharded runs keep splitting the CPU threads across workers.
+    """
+    if not args.no_profile:
+        apply_machine_profile(args, device)
+    if args.torch_threads and args.workers <= 1:
+        import torch
+        
+        torch.set_num_threads(args.torch_threads)
+
+def apply_machine_profile(args, device):
+    """Load (or tune) the machine profile and copy its settings onto args"""
+    profile = load_profile(args.profile, EnvironmentDetector().hardware_fingerprint())
+    if profile is None:
+        log_message(f"🎛️  No machine profile for this hardware at {args.profile}, auto-tuning first "
+                    f"(--no-profile to skip)", 'info')
+        profile = run_auto_tune(args, device)
+        if profile is None:
+            return
+    
+    settings = dict(profile['settings'])
+    if args.workers > 1:
+        settings.pop('torch_threads', None)
+    # The sweep only measured best.pt, so its input size and backend are not applied to other detectors
+    applied = apply_profile(args, settings, build_parser(), sys.argv[1:], 'best_pt')
+    if applied:
+        log_message("🎛️  Machine profile (tuned on best.pt): " +
+                    ", ".join(f"{name}={value}" for name, value in applied.items()), 'info')
+
+def log_pipeline_summary(summary):
+    """Print per-stage occupancy so the bottleneck stage is obvious"""
+    log_message(f"\n🧵 Pipeline stages ({summary['wall_seconds']:.2f}s wall time)", 'info')
+    for name, stage in summary['stages'].items():
+        log_message(f"   {name:<10} occupancy {stage['occupancy'] * 100:5.1f}% | "
+                    f"busy {stage['busy_seconds']:.2f}s | starved {stage['starved_seconds']:.2f}s | "
+                    f"blocked {stage['blocked_seconds']:.2f}s | items {stage['items']} "
+                    f"(workers: {stage['workers']}, errors: {stage['errors']})", 'info')
+    log_message(f"   Bottleneck: {summary['bottleneck']}", 'warning')
+    for error in summary['errors']:
+        log_message(f"❌ Pipeline {error}", 'error')
+
+def run_parity_check(image_paths, backend, device, iou_threshold=0.9, confidence_tolerance=0.05):
+    """Compare an exported backend's detections with the PyTorch checkpoints"""
+    log_message(f"⚖️  Parity check: {backend} vs pytorch", 'info')
+    reference = load_models(device, 'pytorch')
+    candidate = load_models(device, backend)
+    if not reference or not candidate:
+        log_message("❌ Failed to load models for parity check", 'error')
+        return None
+    
+    frames = [ImageFrame.from_path(path) for path in image_paths]
+    report = {}
+    for model_key, model_name in (('yolo11m', 'YOLO11m'), ('best_pt', 'best.pt')):
+        expected = run_yolo_detection_batch(reference[model_key], frames, model_name, device, 1)
+        actual = run_yolo_detection_batch(candidate[model_key], frames, f"{model_name} ({backend})", device, 1)
+        per_image = [compare_detections(ref, cand, iou_threshold, confidence_tolerance)
+                     for ref, cand in zip(expected, actual)]
+        passed = sum(result['passed'] for result in per_image)
+        report[model_key] = {'images': len(per_image), 'passed': passed, 'per_image': per_image}
+        
+        level = 'success' if passed == len(per_image) else 'warning'
+        log_message(f"   {model_name}: {passed}/{len(per_image)} images within tolerance "
+                    f"(IoU >= {iou_threshold}, confidence diff <= {confidence_tolerance})", level)
+        for frame, result in zip(frames, per_image):
+            if not result['passed']:
+                log_message(f"      {frame.name}: {result['matched']} matched of {result['reference']} reference / "
+                            f"{result['candidate']} {backend} boxes, max confidence diff "
+                            f"{result['max_confidence_diff']:.3f}", 'warning')
+    return report
+
+def run_quantization_report(image_paths, args, device):
+    """Compare INT8 best.pt and SAM2_b against FP32 for accuracy and speed"""
+    log_message("🔢 INT8 vs FP32 accuracy/speed report", 'info')
+    fp32 = load_models(device, args.backend)
+    int8 = load_models(device, args.backend, quantize=True, calibration_dir=args.input_dir)
+    if not fp32 or not int8:
+        log_message("❌ Failed to load models for quantization report", 'error')
+        return None
+    
+    totals = {'fp32_det_seconds': 0.0, 'int8_det_seconds': 0.0, 'fp32_sam_seconds': 0.0, 'int8_sam_seconds': 0.0}
+    images = []
+    for image_path in image_paths:
+        frame = ImageFrame.from_path(image_path)
+        
+        start = time.perf_counter()
+        fp32_dets = run_yolo_detection(fp32['best_pt'], frame, 'best.pt FP32', device)
+        totals['fp32_det_seconds'] += time.perf_counter() - start
+        start = time.perf_counter()
+        int8_dets = run_yolo_detection(int8['best_pt'], frame, 'best.pt INT8', device)
+        totals['int8_det_seconds'] += time.perf_counter() - start
+        
+        # Both SAM2 variants get the same FP32 prompts so only the segmenter differs
+        start = time.perf_counter()
+        fp32_masks = run_sam_segmentation(fp32['sam2_b'], frame, fp32_dets, 'SAM2_b FP32', device) if fp32_dets else []
+        totals['fp32_sam_seconds'] += time.perf_counter() - start
+        start = time.perf_counter()
+        int8_masks = run_sam_segmentation(int8['sam2_b'], frame, fp32_dets, 'SAM2_b INT8', device) if fp32_dets else []
+        totals['int8_sam_seconds'] += time.perf_counter() - start
+        
+        mask_ious = [as_tile(a['mask']).iou(as_tile(b['mask'])) for a, b in zip(fp32_masks, int8_masks)]
+        images.append({
+            'image': frame.name,
+            'fp32_detections': len(fp32_dets),
+            'int8_detections': len(int8_dets),
+            'fp32_mean_confidence': float(np.mean([d['confidence'] for d in fp32_dets])) if fp32_dets else None,
+            'int8_mean_confidence': float(np.mean([d['confidence'] for d in int8_dets])) if int8_dets else None,
+            'detection_parity': compare_detections(fp32_dets, int8_dets, iou_threshold=0.8, confidence_tolerance=0.1),
+            'mask_iou': mask_ious
+        })
+        frame.release_cache()
+    
+    all_ious = [iou for image in images for iou in image['mask_iou']]
+    summary = {
+        'images': len(images),
+        'fp32_detections': sum(image['fp32_detections'] for image in images),
+        'int8_detections': sum(image['int8_detections'] for image in images),
+        'detection_parity_rate': (sum(image['detection_parity']['passed'] for image in images) / len(images)
+                                  if images else 0.0),
+        'mean_mask_iou': float(np.mean(all_ious)) if all_ious else None,
+        'min_mask_iou': float(np.min(all_ious)) if all_ious else None,
+        'detector_speedup': totals['fp32_det_seconds'] / max(totals['int8_det_seconds'], 1e-9),
+        'sam_speedup': totals['fp32_sam_seconds'] / max(totals['int8_sam_seconds'], 1e-9),
+        **totals
+    }
+    
+    log_message(f"   best.pt: {summary['fp32_detections']} FP32 vs {summary['int8_detections']} INT8 detections, "
+                f"{summary['detection_parity_rate'] * 100:.0f}% images matching, "
+                f"{summary['detector_speedup']:.2f}x faster", 'info')
+    if all_ious:
+        log_message(f"   SAM2_b: mask IoU mean {summary['mean_mask_iou']:.3f} / min {summary['min_mask_iou']:.3f}, "
+                    f"{summary['sam_speedup']:.2f}x faster", 'info')
+    
+    os.makedirs(args.output_dir, exist_ok=True)
+    report_path = os.path.join(args.output_dir, "quantization_report.json")
+    with open(report_path, 'w') as f:
+        json.dump({'summary': summary, 'images': images}, f, indent=2)
+    log_message(f"✅ Quantization report saved to {report_path}", 'success')
+    return summary
+
+def decode_image(path):
+    """Decode one image file into a frame"""
+    with span('decode', image=os.path.basename(path)):
+        return ImageFrame.from_path(path)
+
+def run_images(models, image_paths, args, device, embedding_cache=None, manifest=None, store=None, metrics=None,
+               save_manifest=True):
+    """Process a list of image paths sequentially or through the streaming pipeline
+    
+    Sharded workers pass save_manifest=False: they return their manifest
+    copy and the parent merges and saves it once.
+    """
+    try:
+        if args.pipeline:
+            # Decode ahead on one thread, infer here, write results on a thread pool
+            pipeline = StreamingPipeline(
+                decode_fn=decode_image,
+                infer_fn=lambda frames, write: process_frames(models, frames, args, device, embedding_cache, write,
+                                                              manifest, store, metrics),
+                batch_size=args.batch_size,
+                prefetch=args.prefetch,
+                writer_workers=args.writer_threads,
+                write_queue_size=args.prefetch * 2
+            )
+            log_pipeline_summary(pipeline.run(image_paths))
+        else:
+            # Process images one batch at a time
+            for batch_paths in iter_batches(image_paths, args.batch_size):
+                # Decode each image once; every detector and SAM2 pass shares the frame
+                frames = []
+                for path in batch_paths:
+                    try:
+                        frames.append(decode_image(path))
+                    except (ValueError, OSError) as e:
+                        log_message(f"❌ Skipping {os.path.basename(path)}: {e}", 'error')
+                if frames:
+                    process_frames(models, frames, args, device, embedding_cache, manifest=manifest, store=store,
+                                   metrics=metrics)
+    finally:
+        # Keep what this run finished even if it stops early. The store's
+        # index must land before the manifest points at its rows
+        if store is not None:
+            store.flush()
+        if manifest is not None and save_manifest:
+            manifest.save()
+
+def create_embedding_cache(args):
+    """Build the SAM2 embedding cache requested on the command line"""
+    if args.sam_cache_size > 0:
+        return SamEmbeddingCache(args.sam_cache_size, args.sam_cache_mb * 1024 ** 2)
+    return None
+
+def store_root(args, worker_id=None):
+    """Results store directory; each sharded worker appends to its own"""
+    root = os.path.join(args.output_dir, "results_store")
+    return root if worker_id is None else f"{root}.worker{worker_id}"
+
+def metrics_path(args, worker_id=None):
+    """Mask metrics JSON-lines file; each sharded worker appends to its own"""
+    path = os.path.join(args.output_dir, METRICS_FILE)
+    if worker_id is None:
+        return path
+    stem, ext = os.path.splitext(path)
+    return f"{stem}.worker{worker_id}{ext}"
+
+def create_manifest(args):
+    """Load the results manifest unless --force asks for a full re-run"""
+    if args.force:
+        return None
+    
+    # Switching the results store on or off leaves the saved detections in the other backend
+    detect_config = {'backend': args.backend, 'quantize': args.quantize, 'imgsz': args.imgsz,
+                     'results_store': args.results_store}
+    if args.slice_size:
+        detect_config['slice'] = {'size': args.slice_size, 'overlap': args.slice_overlap, 'iou': args.slice_iou}
+    # Settings the machine profile tuned for one detector only; fused results depend on them too
+    tuned = {model_key: settings for model_key, settings in getattr(args, 'model_settings', {}).items() if settings}
+    model_configs = {model_key: dict(detect_config, **settings) for model_key, settings in tuned.items()}
+    fused_config = dict(detect_config, fuse=args.fuse, fuse_iou=args.fuse_iou, class_agnostic=args.fuse_class_agnostic,
+                        tuned=tuned)
+    
+    model_paths = dict(MODEL_PATHS)
+    dependencies = {}
+    cascade_detect_config = {}
+    if args.cascade:
+        # Cascade results depend on every tier's weights and on the escalation thresholds
+        cascade_config = load_cascade_config(args.models_config)
+        model_paths.update(cascade_weight_paths(cascade_config))
+        dependencies = {'cascade': cascade_config['tiers'], 'fused': cascade_config['tiers'] + ['best_pt']}
+        thresholds = {key: cascade_config[key] for key in ('min_confidence', 'conflict_iou', 'escalate_on_empty')}
+        cascade_detect_config['cascade'] = dict(detect_config, cascade=thresholds)
+        fused_config['cascade'] = thresholds
+    
+    segment_config = {'quantize': args.quantize, 'mask_format': args.mask_format, 'results_store': args.results_store}
+    if args.sam_policy:
+        sam_policy = load_sam_policy(args.models_config)
+        segment_config['sam_policy'] = {'default': sam_policy.default, 'classes': sam_policy.classes}
+    
+    return ResultManifest(
+        args.output_dir,
+        model_paths,
+        detect_config=dict({'*': detect_config, 'fused': fused_config}, **model_configs, **cascade_detect_config),
+        segment_config=segment_config,
+        dependencies=dependencies
+    )
+
+def pending_images(image_paths, args, manifest):
+    """Drop images whose results are all up to date in the manifest"""
+    if manifest is None:
+        return image_paths
+    
+    result_keys = ['fused'] if args.fuse else [model_key for model_key, _, _, _ in active_detectors(args)]
+    pending = [path for path in image_paths if not manifest.is_complete(path, result_keys, args.metrics)]
+    skipped = len(image_paths) - len(pending)
+    if skipped:
+        log_message(f"⏭️  {skipped} images already up to date, {len(pending)} to process (--force to redo)", 'info')
+    return pending
+
+def run_worker(worker_id, image_paths, args, torch_threads, manifest=None):
+    """Process one shard of images in a worker process with its own models"""
+    import torch
+    
+    torch.set_num_threads(torch_threads)
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        pass
+    
+    if args.trace:
+        # One trace file per worker process, next to the requested path
+        stem, ext = os.path.splitext(args.trace)
+        configure_tracing(f"{stem}.worker{worker_id}{ext}", args.trace_format)
+    
+    device = 'cuda' if torch.cuda.is_available() else 'cpu'
+    log_message(f"👷 Worker {worker_id}: {len(image_paths)} images, {torch_threads} torch threads", 'info')
+    
+    start = time.perf_counter()
+    models = load_models(device, args.backend, args.quantize, args.input_dir, args.model_cache,
+                         detector_backends(args))
+    if models and args.cascade:
+        models['cascade'] = load_cascade(models, args)
+    if models and args.sam_policy:
+        models['sam_policy'] = load_sam_policy(args.models_config)
+    load_seconds = time.perf_counter() - start
+    if not models or models.get('cascade', True) is None:
+        return {'worker_id': worker_id, 'images': 0, 'load_seconds': load_seconds,
+                'seconds': 0.0, 'torch_threads': torch_threads, 'error': 'Failed to load models'}
+    memory = memory_usage()
+    
+    start = time.perf_counter()
+    store = ResultsStore(store_root(args, worker_id)) if args.results_store else None
+    metrics = MetricsWriter(metrics_path(args, worker_id)) if args.metrics else None
+    run_images(models, image_paths, args, device, create_embedding_cache(args), manifest, store, metrics,
+               save_manifest=False)
+    seconds = time.perf_counter() - start
+    get_tracer().close()
+    
+    return {
+        'worker_id': worker_id,
+        'images': len(image_paths),
+        'load_seconds': load_seconds,
+        'rss_mb_after_load': memory['rss_mb'],
+        'pss_mb_after_load': memory['pss_mb'],
+        'seconds': seconds,
+        'images_per_sec': len(image_paths) / seconds if seconds > 0 else 0.0,
+        'torch_threads': torch_threads,
+        'manifest': manifest,
+        'cascade': models['cascade'].stats if args.cascade else None,
+        'sam_policy': models.get('sam_policy')
+    }
+
+def run_sharded(image_paths, args, manifest=None):
+    """Shard images across worker processes and return a merged run summary
+    
+    Each worker records into its own copy of the manifest; the copies are
+    merged and saved here once all workers finish.
+    """
+    workers = min(args.workers, len(image_paths))
+    detector = EnvironmentDetector()
+    torch_threads = args.torch_threads or detector.threads_per_worker(workers)
+    log_message(f"🧩 Sharding {len(image_paths)} images across {workers} workers "
+                f"({torch_threads} torch threads each)", 'info')
+    
+    if args.model_cache:
+        # Convert the checkpoints once here rather than in every worker at once
+        weight_paths = dict(MODEL_PATHS)
+        if args.cascade:
+            weight_paths.update(cascade_weight_paths(load_cascade_config(args.models_config)))
+        for model_key, weights_path in weight_paths.items():
+            if os.path.exists(weights_path):
+                build_cache(weights_path, 'sam' if model_key == 'sam2_b' else 'yolo', args.model_cache)
+    
+    # Interleaved shards keep per-worker load even when file sizes trend by name
+    shards = [image_paths[i::workers] for i in range(workers)]
+    
+    start = time.perf_counter()
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+        futures = [executor.submit(run_worker, i, shard, args, torch_threads, manifest)
+                   for i, shard in enumerate(shards)]
+        worker_results = []
+        for future in futures:
+            try:
+                worker_results.append(future.result())
+            except Exception as e:
+                log_message(f"❌ Worker failed: {e}", 'error')
+    wall_seconds = time.perf_counter() - start
+    
+    if args.results_store:
+        # Fold the workers' stores into the main one before the manifest refers to it
+        store = ResultsStore(store_root(args))
+        for result in worker_results:
+            if os.path.isdir(store_root(args, result['worker_id'])):
+                store.merge(store_root(args, result['worker_id']), remove=True)
+        store.flush()
+    
+    if args.metrics:
+        metrics = MetricsWriter(metrics_path(args))
+        for result in worker_results:
+            if os.path.exists(metrics_path(args, result['worker_id'])):
+                metrics.merge(metrics_path(args, result['worker_id']), remove=True)
+    
+    cascade_stats = None
+    sam_policy = None
+    for result in worker_results:
+        worker_manifest = result.pop('manifest', None)
+        if manifest is not None and worker_manifest is not None:
+            manifest.merge(worker_manifest)
+        worker_cascade = result.pop('cascade', None)
+        if worker_cascade is not None:
+            cascade_stats = cascade_stats or CascadeStats(worker_cascade.tiers)
+            cascade_stats.merge(worker_cascade)
+        worker_policy = result.pop('sam_policy', None)
+        if worker_policy is not None:
+            if sam_policy is None:
+                sam_policy = worker_policy
+            else:
+                sam_policy.merge(worker_policy)
+    if manifest is not None:
+        manifest.save()
+    
+    processed = sum(result['images'] for result in worker_results)
+    summary = {
+        'workers': workers,
+        'torch_threads_per_worker': torch_threads,
+        'images': processed,
+        'wall_seconds': wall_seconds,
+        'images_per_sec': processed / wall_seconds if wall_seconds > 0 else 0.0,
+        'worker_results': worker_results
+    }
+    
+    log_message("\n📈 Sharded run summary", 'info')
+    for result in worker_results:
+        if 'error' in result:
+            log_message(f"   Worker {result['worker_id']}: {result['error']}", 'error')
+        else:
+            log_message(f"   Worker {result['worker_id']}: {result['images']} images in {result['seconds']:.2f}s "
+                        f"({result['images_per_sec']:.2f} images/sec, model load {result['load_seconds']:.1f}s"
+                        f"{format_worker_memory(result)})", 'info')
+    log_message(f"   Aggregate: {processed} images in {wall_seconds:.2f}s "
+                f"({summary['images_per_sec']:.2f} images/sec)", 'success')
+    if cascade_stats is not None:
+        summary['cascade'] = log_cascade_summary(cascade_stats, args.output_dir)
+    if sam_policy is not None:
+        summary['sam_policy'] = log_sam_policy_summary(sam_policy, args.output_dir)
+    
+    os.makedirs(args.output_dir, exist_ok=True)
+    with open(os.path.join(args.output_dir, "run_summary.json"), 'w') as f:
+        json.dump(summary, f, indent=2)
+    
+    return summary
+
+def format_worker_memory(result):
+    """', RSS x MB / PSS y MB' for a worker result, empty where /proc is unavailable"""
+    if result.get('rss_mb_after_load') is None:
+        return ""
+    return f", RSS {result['rss_mb_after_load']:.0f} MB / PSS {result['pss_mb_after_load']:.0f} MB"
+
+def run_stream(models, args, device):
+    """Detect, track and segment a video file, camera or network stream
+    
+    YOLO runs every args.detect_every frames and the tracker propagates
+    boxes in between. SAM2 only runs for tracks that are new or whose box
+    moved enough that its IoU with the last segmented box drops below
+    args.sam_iou; every other track keeps its previous mask. Tracks the SAM
+    policy skips carry no mask and are counted apart from reused masks.
+    Live frames dropped because processing fell behind show up as gaps in
+    the frame index and are counted as dropped_frames.
+    """
+    detector_keys = ['yolo11m', 'best_pt'] if args.fuse else [args.stream_detector]
+    detector_names = {model_key: model_name for model_key, model_name, _, _ in DETECTORS}
+    tracker = BoxTracker(iou_threshold=args.track_iou, max_age=args.track_max_age,
+                         class_agnostic=args.fuse_class_agnostic)
+    
+    stream_name = os.path.splitext(os.path.basename(str(args.video).rstrip('/')))[0] or 'stream'
+    os.makedirs(args.output_dir, exist_ok=True)
+    tracks_path = os.path.join(args.output_dir, f"{stream_name}_tracks.jsonl")
+    
+    stats = {'frames': 0, 'dropped_frames': 0, 'detector_frames': 0, 'sam_calls': 0, 'segmented_prompts': 0,
+             'reused_masks': 0, 'skipped_prompts': 0, 'policy_skipped_tracks': 0}
+    sam_policy = models.get('sam_policy')
+    last_detected = None
+    last_frame_index = -1
+    start = time.perf_counter()
+    
+    log_message(f"🎥 Streaming {args.video}: detect every {args.detect_every} frames, "
+                f"re-segment below IoU {args.sam_iou}", 'info')
+    
+    with open(tracks_path, 'w') as tracks_file:
+        for frame_index, timestamp, frame in iter_video_frames(args.video, args.max_frames):
+            stats['dropped_frames'] += frame_index - last_frame_index - 1
+            last_frame_index = frame_index
+            with span('stream_frame', frame=frame_index):
+                detector_frame = last_detected is None or frame_index - last_detected >= args.detect_every
+                if detector_frame:
+                    per_model = {
+                        model_key: run_yolo_detection(models[model_key], frame, detector_names[model_key], device,
+                                                      model_setting(args, model_key, 'imgsz'))
+                        for model_key in detector_keys
+                    }
+                    if args.fuse:
+                        detections = fuse_detections(per_model, method=args.fuse, iou_threshold=args.fuse_iou,
+                                                     class_agnostic=args.fuse_class_agnostic)
+                    else:
+                        detections = per_model[args.stream_detector]
+                    tracker.update(detections, frame_index, frame.bgr.shape)
+                    last_detected = frame_index
+                    stats['detector_frames'] += 1
+                else:
+                    tracker.predict(frame_index, frame.bgr.shape)
+                
+                # SAM2 only for new tracks and tracks that moved
+                stale = tracker.needs_segmentation(args.sam_iou)
+                if stale and sam_policy is not None:
+                    # Tracks the policy skips count as segmented, without a mask, until they drift again
+                    prompt_indices, skipped = sam_policy.select([track.as_detection() for track in stale])
+                    for index in skipped:
+                        tracker.mark_segmented(stale[index], None, frame_index)
+                    stats['skipped_prompts'] += len(skipped)
+                    stale = [stale[index] for index in prompt_indices]
+                if stale:
+                    prompts = [track.as_detection() for track in stale]
+                    sam_masks = run_sam_segmentation(models['sam2_b'], frame, prompts, 'SAM2_b', device)
+                    for track, mask_data in zip(stale, sam_masks):
+                        tracker.mark_segmented(track, mask_data['mask'], frame_index)
+                    stats['sam_calls'] += 1
+                    stats['segmented_prompts'] += len(sam_masks)
+                    if args.save_stream_masks and sam_masks:
+                        save_results(f"{stream_name}_{frame.name}", prompts, sam_masks,
+                                     args.output_dir, args.mask_format)
+                for track in tracker.tracks:
+                    if track.segmented_at is not None and track.segmented_at < frame_index:
+                        # Earlier policy skips were marked segmented without a mask
+                        if track.mask is not None:
+                            stats['reused_masks'] += 1
+                        else:
+                            stats['policy_skipped_tracks'] += 1
+                
+                tracks_file.write(json.dumps({
+                    'frame': frame_index,
+                    'timestamp': timestamp,
+                    'detector_frame': detector_frame,
+                    'tracks': [
+                        {
+                            'track_id': track.track_id,
+                            'bbox': track.bbox.tolist(),
+                            'class_name': track.class_name,
+                            'confidence': track.confidence,
+                            'source': 'detected' if track.last_detected == frame_index else 'propagated',
+                            'mask_area': track.mask.area if track.mask is not None else None,
+                            'mask_frame': track.segmented_at
+                        }
+                        for track in tracker.tracks
+                    ]
+                }) + '\n')
+            
+            frame.release_cache()
+            stats['frames'] += 1
+            if stats['frames'] % 100 == 0:
+                elapsed = time.perf_counter() - start
+                log_message(f"🎞️  {stats['frames']} frames, {stats['frames'] / elapsed:.1f} FPS, "
+                            f"{len(tracker.tracks)} active tracks", 'info')
+    
+    elapsed = time.perf_counter() - start
+    summary = dict(stats, seconds=elapsed, fps=stats['frames'] / elapsed if elapsed > 0 else 0.0,
+                   tracks_created=tracker.next_id - 1, source=str(args.video))
+    with open(os.path.join(args.output_dir, f"{stream_name}_stream_summary.json"), 'w') as f:
+        json.dump(summary, f, indent=2)
+    
+    log_message(f"\n📈 Stream summary: {summary['frames']} frames at {summary['fps']:.1f} FPS "
+                f"({summary['dropped_frames']} dropped)", 'success')
+    log_message(f"   Detector frames: {summary['detector_frames']}, SAM2 calls: {summary['sam_calls']} "
+                f"({summary['segmented_prompts']} prompts, {summary['skipped_prompts']} skipped by policy, "
+                f"{summary['reused_masks']} masks reused, {summary['policy_skipped_tracks']} track frames "
+                f"without a mask by policy)", 'info')
+    log_message(f"   Tracks: {summary['tracks_created']} created, written to {tracks_path}", 'info')
+    return summary
+
+def build_parser():
+    """Command line options of the integration script"""
+    parser = argparse.ArgumentParser(description="MyCV-Platform YOLO + SAM Integration")
+    parser.add_argument('--input-dir', default="data/input/test_images",
+                        help="Directory with .jpg test images")
+    parser.add_argument('--output-dir', default="data/output/integration_results",
+                        help="Directory for detection and mask results")
+    parser.add_argument('--batch-size', type=int, default=1,
+                        help="Number of decoded images per YOLO forward pass (default: 1)")
+    parser.add_argument('--benchmark-batch', action='store_true',
+                        help="Report YOLO images/sec for batch sizes 1, 4, 8 and 16, then exit")
+    parser.add_argument('--fuse', choices=['nms', 'wbf'],
+                        help="Merge YOLO11m and best.pt boxes before a single SAM2 pass")
+    parser.add_argument('--fuse-iou', type=float, default=0.55,
+                        help="IoU above which boxes are treated as the same object (default: 0.55)")
+    parser.add_argument('--fuse-class-agnostic', action='store_true',
+                        help="Merge overlapping boxes even when the class names differ")
+    parser.add_argument('--cascade', action='store_true',
+                        help="Replace YOLO11m with the cheapest-first YOLO11 tier cascade from --models-config, "
+                             "escalating only ambiguous images (not in --video stream mode)")
+    parser.add_argument('--models-config', default="config/models.yaml",
+                        help="Model configuration with the cascade tiers and thresholds (default: config/models.yaml)")
+    parser.add_argument('--slice-size', type=int, default=0,
+                        help="Detect on overlapping tiles of this many pixels plus the whole image, "
+                             "for small objects in high-resolution images (default: 0, off)")
+    parser.add_argument('--slice-overlap', type=float, default=0.2,
+                        help="Fraction of --slice-size shared by neighbouring tiles (default: 0.2)")
+    parser.add_argument('--slice-iou', type=float, default=0.5,
+                        help="Overlap (intersection over the smaller box) above which tile detections "
+                             "are merged (default: 0.5)")
+    parser.add_argument('--slice-batch', type=int, default=8,
+                        help="Tiles per YOLO forward pass in sliced mode (default: 8)")
+    parser.add_argument('--imgsz', type=int, default=YOLO_IMGSZ,
+                        help=f"Square YOLO input size images are letterboxed to (default: {YOLO_IMGSZ})")
+    parser.add_argument('--backend', choices=BACKENDS, default='pytorch',
+                        help="YOLO inference backend; onnx/openvino export once next to the .pt (default: pytorch)")
+    parser.add_argument('--parity-check', action='store_true',
+                        help="Compare --backend detections against the PyTorch checkpoints, then exit")
+    parser.add_argument('--quantize', action='store_true',
+                        help="Use cached INT8 variants of best.pt and SAM2_b (CPU only, built on first use)")
+    parser.add_argument('--quantize-report', action='store_true',
+                        help="Compare INT8 against FP32 on the input images and write quantization_report.json")
+    parser.add_argument('--mask-format', choices=MASK_FORMATS, default='png',
+                        help="png: one PNG per mask; rle/packbits: one compact mask file per image (default: png)")
+    parser.add_argument('--results-store', action='store_true',
+                        help="Append results to a memory-mapped columnar store (results_store/) instead of "
+                             "per-image JSON and mask files")
+    parser.add_argument('--export-json', action='store_true',
+                        help="Export the results store back to per-image JSON (and --mask-format masks), then exit")
+    parser.add_argument('--sam-policy', action='store_true',
+                        help="Only prompt SAM2 with detections passing the per-class sam_policy rules in "
+                             "--models-config; the others keep their box without a mask")
+    parser.add_argument('--metrics', action='store_true',
+                        help=f"Measure each mask (area, perimeter, fill ratio, outline) and append one summary "
+                             f"record per image and model to {METRICS_FILE} for bulk ingestion")
+    parser.add_argument('--sam-cache-size', type=int, default=4,
+                        help="Max SAM2 image embeddings kept in memory, 0 disables the cache (default: 4)")
+    parser.add_argument('--sam-cache-mb', type=int, default=512,
+                        help="Memory bound for cached SAM2 embeddings in MB (default: 512)")
+    parser.add_argument('--pipeline', action='store_true',
+                        help="Overlap decode, inference and result writing in separate stages")
+    parser.add_argument('--prefetch', type=int, default=4,
+                        help="Decoded images buffered ahead of inference in pipeline mode (default: 4)")
+    parser.add_argument('--writer-threads', type=int, default=2,
+                        help="Threads writing results in pipeline mode (default: 2)")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Worker processes to shard the images across, each with its own models (default: 1)")
+    parser.add_argument('--torch-threads', type=int, default=0,
+                        help="Torch intra-op threads per worker (default: the machine profile's for a single "
+                             "process, else CPU threads split across workers)")
+    parser.add_argument('--model-cache', nargs='?', const=MODEL_CACHE_DIR,
+                        help="Load PyTorch checkpoints through memory-mapped copies in this directory, converted "
+                             f"on first use and shared by worker processes (default when given: {MODEL_CACHE_DIR})")
+    parser.add_argument('--auto-tune', action='store_true',
+                        help="Time best.pt over backends, input sizes, torch threads and batch sizes on synthetic "
+                             "frames, save the fastest setting within --latency-budget-ms as --profile, then exit")
+    parser.add_argument('--profile', default=MACHINE_PROFILE_PATH,
+                        help="Machine profile applied to image and video inference runs (input size and backend "
+                             "to best.pt only), tuned automatically when missing or made on other hardware; "
+                             "command line options override it "
+                             f"(default: {MACHINE_PROFILE_PATH})")
+    parser.add_argument('--no-profile', action='store_true',
+                        help="Neither load nor auto-tune the machine profile")
+    parser.add_argument('--latency-budget-ms', type=float, default=500.0,
+                        help="Auto-tune: slowest allowed YOLO batch in milliseconds (default: 500)")
+    parser.add_argument('--tune-batch-sizes', type=parse_ints, default=[1, 2, 4, 8],
+                        help="Auto-tune: batch sizes to try (default: 1,2,4,8)")
+    parser.add_argument('--tune-imgsz', type=parse_ints, default=[480, 640],
+                        help="Auto-tune: YOLO input sizes to try, checked against the default size on the "
+                             "--input-dir images (default: 480,640)")
+    parser.add_argument('--force', action='store_true',
+                        help="Re-run every image instead of skipping results recorded in manifest.json")
+    parser.add_argument('--video',
+                        help="Stream mode: a video file, camera index (0), /dev/videoN or rtsp:// URL")
+    parser.add_argument('--detect-every', type=int, default=5,
+                        help="Stream mode: run YOLO every N frames and track in between (default: 5)")
+    parser.add_argument('--stream-detector', choices=['yolo11m', 'best_pt'], default='best_pt',
+                        help="Stream mode: detector to track, unless --fuse merges both (default: best_pt)")
+    parser.add_argument('--sam-iou', type=float, default=0.85,
+                        help="Stream mode: re-run SAM2 for a track once its box IoU with the last "
+                             "segmented box falls below this (default: 0.85)")
+    parser.add_argument('--track-iou', type=float, default=0.3,
+                        help="Stream mode: IoU needed to match a detection to a track (default: 0.3)")
+    parser.add_argument('--track-max-age', type=int, default=30,
+                        help="Stream mode: frames a track survives without a detection (default: 30)")
+    parser.add_argument('--max-frames', type=int,
+                        help="Stream mode: stop after this many frames")
+    parser.add_argument('--save-stream-masks', action='store_true',
+                        help="Stream mode: save detections and masks for every frame SAM2 runs on")
+    parser.add_argument('--trace',
+                        help="Write per-stage timing/memory spans here (.json: Chrome trace, else JSON lines)")
+    parser.add_argument('--trace-format', choices=TRACE_FORMATS,
+                        help="Override the trace format implied by the --trace extension")
+    return parser
+
+def parse_args():
+    """Parse command line arguments"""
+    parser = build_parser()
+    args = parser.parse_args()
+    if args.video is not None and args.cascade:
+        parser.error("--cascade applies to image runs only and cannot be combined with --video")
+    return args
 
 def main():
     """Main function"""
+    args = parse_args()
+    
     log_message("🚀 MyCV-Platform YOLO + SAM Integration", 'info')
     log_message("=" * 50, 'info')
     
     # Check environment
     device = check_environment()
     
-    # Load models
-    models = load_models(device)
-    if not models:
-        log_message("❌ Failed to load models", 'error')
+    if args.trace and args.workers <= 1:
+        configure_tracing(args.trace, args.trace_format)
+        log_message(f"📝 Tracing stages to {args.trace}", 'info')
+    
+    if args.export_json:
+        exported = ResultsStore(store_root(args)).export_json(args.output_dir, args.mask_format)
+        log_message(f"📤 Exported {exported} results from {store_root(args)} to {args.output_dir}", 'success')
+        return
+    
+    if args.auto_tune:
+        run_auto_tune(args, device)
+        return
+    
+    if args.video is not None:
+        load_machine_profile(args, device)
+        models = load_models(device, args.backend, args.quantize, args.input_dir, args.model_cache,
+                         detector_backends(args))
+        if not models:
+            log_message("❌ Failed to load models", 'error')
+            return
+        if args.sam_policy:
+            models['sam_policy'] = load_sam_policy(args.models_config)
+        run_stream(models, args, device)
+        get_tracer().close()
         return
     
     # Get test images
-    test_images_dir = "data/input/test_images"
-    test_images = [f for f in os.listdir(test_images_dir) if f.endswith('.jpg')]
+    test_images_dir = args.input_dir
+    test_images = sorted(f for f in os.listdir(test_images_dir) if f.endswith('.jpg'))
     
     if not test_images:
         log_message("❌ No test images found", 'error')
         return
     
     log_message(f"📁 Found {len(test_images)} test images", 'info')
+    image_paths = [os.path.join(test_images_dir, name) for name in test_images]
     
-    # Process each image
-    for image_name in test_images:
-        image_path = os.path.join(test_images_dir, image_name)
-        log_message(f"\n🖼️  Processing: {image_name}", 'info')
-        log_message("-" * 30, 'info')
-        
-        # 1. Run YOLO11m detection
-        log_message("1️⃣ YOLO11m Detection", 'info')
-        yolo11m_detections = run_yolo_detection(models['yolo11m'], image_path, 'YOLO11m', device)
-        
-        # 2. Run SAM2 with YOLO11m bounding boxes
-        if yolo11m_detections:
-            log_message("2️⃣ SAM2 Segmentation (YOLO11m prompts)", 'info')
-            sam_yolo11m_masks = run_sam_segmentation(
-                models['sam2_b'], image_path, yolo11m_detections, 'SAM2_b', device
-            )
-            save_results(f"{image_name}_yolo11m", yolo11m_detections, sam_yolo11m_masks, "data/output/integration_results")
-        else:
-            log_message("⚠️  No YOLO11m detections, skipping SAM2", 'warning')
-        
-        # 3. Run best.pt detection
-        log_message("3️⃣ best.pt Detection", 'info')
-        best_pt_detections = run_yolo_detection(models['best_pt'], image_path, 'best.pt', device)
+    if args.quantize_report:
+        run_quantization_report(image_paths, args, device)
+        return
+    
+    if args.parity_check:
+        run_parity_check(image_paths, args.backend, device)
+        return
+    
+    if not args.benchmark_batch:
+        # Tuned settings are part of the manifest fingerprints, so apply them first
+        load_machine_profile(args, device)
         
-        # 4. Run SAM2 with best.pt bounding boxes
-        if best_pt_detections:
-            log_message("4️⃣ SAM2 Segmentation (best.pt prompts)", 'info')
-            sam_best_pt_masks = run_sam_segmentation(
-                models['sam2_b'], image_path, best_pt_detections, 'SAM2_b', device
-            )
-            save_results(f"{image_name}_best_pt", best_pt_detections, sam_best_pt_masks, "data/output/integration_results")
-        else:
-            log_message("⚠️  No best.pt detections, skipping SAM2", 'warning')
+        # Skip images whose inputs, models and settings match the last run
+        manifest = create_manifest(args)
+        image_paths = pending_images(image_paths, args, manifest)
+        if not image_paths:
+            log_message("✅ All results are up to date", 'success')
+            return
+    
+    if args.workers > 1 and not args.benchmark_batch:
+        # Each worker process loads its own models
+        run_sharded(image_paths, args, manifest)
+        log_message("\n🎉 Integration completed successfully!", 'success')
+        log_message(f"📊 Check '{args.output_dir}' for results", 'info')
+        return
+    
+    # Load models
+    models = load_models(device, args.backend, args.quantize, args.input_dir, args.model_cache,
+                         detector_backends(args))
+    if models and args.cascade:
+        models['cascade'] = load_cascade(models, args)
+    if models and args.sam_policy:
+        models['sam_policy'] = load_sam_policy(args.models_config)
+    if not models or models.get('cascade', True) is None:
+        log_message("❌ Failed to load models", 'error')
+        return
+    
+    if args.benchmark_batch:
+        benchmark_batch_sizes(models, image_paths, device)
+        return
+    
+    embedding_cache = create_embedding_cache(args)
+    
+    if args.slice_size:
+        log_message(f"🧩 Sliced detection mode: {args.slice_size}px tiles, {args.slice_overlap:.0%} overlap", 'info')
+    elif args.batch_size > 1:
+        log_message(f"📦 Batched detection mode: {args.batch_size} images per forward pass", 'info')
+    
+    store = ResultsStore(store_root(args)) if args.results_store else None
+    metrics = MetricsWriter(metrics_path(args)) if args.metrics else None
+    run_images(models, image_paths, args, device, embedding_cache, manifest, store, metrics)
+    
+    if embedding_cache is not None:
+        stats = embedding_cache.stats()
+        log_message(f"♻️  SAM2 embedding cache: {stats['hits']} hits, {stats['misses']} misses, "
+                    f"{stats['evictions']} evictions", 'info')
+    
+    if args.cascade:
+        log_cascade_summary(models['cascade'].stats, args.output_dir)
+    if args.sam_policy:
+        log_sam_policy_summary(models['sam_policy'], args.output_dir)
+    if metrics is not None:
+        log_message(f"📐 Mask metrics: {metrics.records} image records appended to {metrics.path}", 'info')
+    
+    get_tracer().close()
     
     log_message("\n🎉 Integration completed successfully!", 'success')
-    log_message("📊 Check 'data/output/integration_results' for results", 'info')
+    log_message(f"📊 Check '{args.output_dir}' for results", 'info')
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,174 @@
+"""Model server batching and HTTP API, run against a fake detector"""
+
+import json
+import threading
+import http.client
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+import pytest
+
+import model_server
+from model_server import InferenceService, RequestBatcher, make_server
+
+
+def fake_detection_batch(calls):
+    """Stands in for run_yolo_detection_batch: one box per frame, labelled with the frame's name"""
+    def run(model, frames, model_name, device, batch_size=8):
+        calls.append((model_name, [frame.name for frame in frames]))
+        return [[{'bbox': [0, 0, frame.width, frame.height], 'confidence': 0.9, 'class_name': frame.name,
+                  'model': model_name}] for frame in frames]
+    return run
+
+
+def encoded_image(value):
+    ok, data = cv2.imencode('.png', np.full((8, 8, 3), value, dtype=np.uint8))
+    assert ok
+    return data.tobytes()
+
+
+@pytest.fixture
+def server(monkeypatch, tmp_path):
+    calls = []
+    monkeypatch.setattr(model_server, 'run_yolo_detection_batch', fake_detection_batch(calls))
+    models = {'yolo11m': object(), 'best_pt': object(), 'sam2_b': object()}
+    service = InferenceService(models, 'cpu', window_ms=200, max_batch=8, sam_cache_size=0)
+    image_root = tmp_path / 'images'
+    image_root.mkdir()
+    httpd = make_server(service, '127.0.0.1', 0, image_roots=[str(image_root)])
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd, calls, image_root
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def post(httpd, path, body, content_type):
+    conn = http.client.HTTPConnection('127.0.0.1', httpd.server_address[1], timeout=30)
+    try:
+        conn.request('POST', path, body=body, headers={'Content-Type': content_type})
+        response = conn.getresponse()
+        return response.status, json.loads(response.read())
+    finally:
+        conn.close()
+
+
+def test_batcher_groups_concurrent_requests_and_keeps_order():
+    batches = []
+
+    def process_batch(requests):
+        batches.append(list(requests))
+        return [{'echo': request} for request in requests]
+
+    batcher = RequestBatcher(process_batch, window_ms=200, max_batch=8)
+    futures = [batcher.submit(i) for i in range(5)]
+    results = [future.result(timeout=10) for future in futures]
+
+    assert batches == [[0, 1, 2, 3, 4]]
+    assert [result['echo'] for result in results] == [0, 1, 2, 3, 4]
+    assert all(result['latency']['batch_size'] == 5 for result in results)
+
+
+def test_batcher_respects_max_batch():
+    batches = []
+
+    def process_batch(requests):
+        batches.append(list(requests))
+        return [{'echo': request} for request in requests]
+
+    batcher = RequestBatcher(process_batch, window_ms=200, max_batch=2)
+    futures = [batcher.submit(i) for i in range(5)]
+    assert [future.result(timeout=10)['echo'] for future in futures] == [0, 1, 2, 3, 4]
+    assert [len(batch) for batch in batches] == [2, 2, 1]
+
+
+def test_batcher_fails_every_request_of_a_failed_batch():
+    def process_batch(requests):
+        raise RuntimeError('model crashed')
+
+    batcher = RequestBatcher(process_batch, window_ms=50)
+    futures = [batcher.submit(i) for i in range(3)]
+    for future in futures:
+        with pytest.raises(RuntimeError, match='model crashed'):
+            future.result(timeout=10)
+
+
+def test_concurrent_detect_requests_are_batched_with_per_request_results(server):
+    httpd, calls, _ = server
+    names = [f"frame{i}" for i in range(4)]
+
+    def detect(index):
+        return post(httpd, f"/api/v1/detect?segment=0&name={names[index]}", encoded_image(index * 10), 'image/png')
+
+    with ThreadPoolExecutor(max_workers=len(names)) as pool:
+        responses = list(pool.map(detect, range(len(names))))
+
+    for name, (status, result) in zip(names, responses):
+        assert status == 200
+        assert result['image'] == name
+        for model_key, _ in model_server.DETECTORS:
+            assert [det['class_name'] for det in result['detections'][model_key]] == [name]
+        assert 'masks' not in result
+
+    # Each detector saw every frame exactly once, in fewer calls than requests
+    for _, model_name in model_server.DETECTORS:
+        model_calls = [frames for called, frames in calls if called == model_name]
+        assert len(model_calls) < len(names)
+        assert sorted(name for frames in model_calls for name in frames) == names
+
+
+def test_image_path_inside_image_root_is_served(server):
+    httpd, _, image_root = server
+    image_path = image_root / 'bottle.png'
+    image_path.write_bytes(encoded_image(50))
+
+    status, result = post(httpd, '/api/v1/detect?segment=0', json.dumps({'image_path': str(image_path)}),
+                          'application/json')
+    assert status == 200
+    assert result['image'] == 'bottle.png'
+
+
+@pytest.mark.parametrize('relative', ['../secret.png', 'link.png'])
+def test_image_path_outside_image_root_is_rejected(server, relative):
+    httpd, calls, image_root = server
+    secret = image_root.parent / 'secret.png'
+    secret.write_bytes(encoded_image(200))
+    (image_root / 'link.png').symlink_to(secret)
+
+    status, result = post(httpd, '/api/v1/detect', json.dumps({'image_path': str(image_root / relative)}),
+                          'application/json')
+    assert status == 403
+    assert 'error' in result
+    assert calls == []
+
+
+def test_image_path_is_rejected_without_image_roots():
+    service = InferenceService({'yolo11m': None, 'best_pt': None, 'sam2_b': None}, 'cpu', sam_cache_size=0)
+    httpd = make_server(service, '127.0.0.1', 0)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    try:
+        status, _ = post(httpd, '/api/v1/detect', json.dumps({'image_path': '/etc/passwd'}), 'application/json')
+    finally:
+        httpd.shutdown()
+        httpd.server_close()
+    assert status == 403
+
+
+def test_oversized_body_is_rejected_before_reading(monkeypatch):
+    calls = []
+    monkeypatch.setattr(model_server, 'run_yolo_detection_batch', fake_detection_batch(calls))
+    service = InferenceService({'yolo11m': None, 'best_pt': None, 'sam2_b': None}, 'cpu', sam_cache_size=0)
+    httpd = make_server(service, '127.0.0.1', 0, max_body_mb=1 / 1024)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    try:
+        status, result = post(httpd, '/api/v1/detect?segment=0', b'\0' * 2048, 'image/png')
+        small_status, _ = post(httpd, '/api/v1/detect?segment=0', encoded_image(0), 'image/png')
+    finally:
+        httpd.shutdown()
+        httpd.server_close()
+    assert status == 413
+    assert 'error' in result
+    assert small_status == 200
@@ -8,10 +8,49 @@ import os
 import cv2
 import numpy as np
 import json
-import matplotlib.pyplot as plt
+import argparse
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 from termcolor import colored
 
+from app.utils.mask_codec import MASK_FILE_SUFFIXES, read_masks
+from app.utils.mask_tile import MaskTile, as_tile
+from app.utils.results_store import INDEX_FILE, ResultsStore
+
+# Result name suffixes written by run_yolo_sam_integration.py
+RESULT_SETS = [
+    ('yolo11m', 'YOLO11m'),
+    ('cascade', 'Cascade'),
+    ('best_pt', 'best.pt'),
+    ('fused', 'Fused'),
+]
+
+VISUALIZATION_BACKENDS = ('opencv', 'matplotlib')
+
+# File extension per output image format
+IMAGE_FORMATS = {
+    'png': '.png',
+    'jpg': '.jpg',
+    'webp': '.webp'
+}
+
+# Mask overlay colors, cycled by mask index (label 0 is background)
+MASK_PALETTE = np.array([
+    (0, 0, 0),
+    (255, 0, 0),    # Red
+    (0, 255, 0),    # Green
+    (0, 0, 255),    # Blue
+    (255, 255, 0),  # Yellow
+    (255, 0, 255),  # Magenta
+    (0, 255, 255),  # Cyan
+], dtype=np.uint8)
+
+# Palette index for every possible label value, and one 256-entry LUT per channel
+LABEL_PALETTE_INDEX = np.concatenate([[0], np.arange(65535) % (len(MASK_PALETTE) - 1) + 1]).astype(np.uint8)
+PALETTE_CHANNEL_LUTS = [
+    np.pad(MASK_PALETTE[:, channel], (0, 256 - len(MASK_PALETTE))).astype(np.uint8) for channel in range(3)
+]
+
 def log_message(message, level='info'):
     """Print colored log message"""
     colors = {
@@ -28,16 +67,33 @@ def load_detection_results(json_file):
     with open(json_file, 'r') as f:
         return json.load(f)
 
+def find_mask_source(results_dir, result_name):
+    """Locate an image's masks: a compact mask file if present, else the PNG directory"""
+    for suffix in MASK_FILE_SUFFIXES.values():
+        mask_file = os.path.join(results_dir, f"{result_name}{suffix}")
+        if os.path.exists(mask_file):
+            return mask_file
+    return os.path.join(results_dir, f"{result_name}_masks")
+
 def load_segmentation_masks(mask_dir):
-    """Load segmentation masks from directory"""
+    """Load segmentation masks from a PNG directory or a compact mask file
+    
+    Every mask is returned as a MaskTile clipped to its pixels.
+    """
     masks = []
-    if os.path.exists(mask_dir):
+    if os.path.isfile(mask_dir):
+        for entry in read_masks(mask_dir):
+            masks.append({
+                'mask': entry['mask'],
+                'filename': f"mask_{entry['index'] + 1}_{entry['class_name']}"
+            })
+    elif os.path.exists(mask_dir):
         for mask_file in os.listdir(mask_dir):
             if mask_file.endswith('.png'):
                 mask_path = os.path.join(mask_dir, mask_file)
                 mask = cv2.imread(mask_path, cv2.IMREAD_GRAYSCALE)
                 masks.append({
-                    'mask': mask,
+                    'mask': MaskTile.from_full(mask),
                     'filename': mask_file
                 })
     return masks
@@ -64,118 +120,271 @@ def draw_bounding_boxes(image, detections, color=(0, 255, 0), thickness=2):
     
     return result_image
 
-def overlay_segmentation_masks(image, masks, alpha=0.5):
-    """Overlay segmentation masks on image"""
-    result_image = image.copy()
+def build_label_map(masks):
+    """Paint every mask into one label map covering only the masks' joint box
     
-    colors = [
-        (255, 0, 0),    # Red
-        (0, 255, 0),    # Green
-        (0, 0, 255),    # Blue
-        (255, 255, 0),  # Yellow
-        (255, 0, 255),  # Magenta
-        (0, 255, 255),  # Cyan
-    ]
+    Returns (labels, (x, y)) where labels[r, c] is 1 + the index of the
+    last mask covering frame pixel (x + c, y + r), or 0 for background.
+    Returns None when there are no mask pixels.
+    """
+    tiles = [as_tile(mask_data['mask']) for mask_data in masks]
+    tiles = [(index, tile) for index, tile in enumerate(tiles) if tile.tile.size]
+    if not tiles:
+        return None
     
-    for i, mask_data in enumerate(masks):
-        mask = mask_data['mask']
-        color = colors[i % len(colors)]
-        
-        # Create colored mask
-        colored_mask = np.zeros_like(image)
-        colored_mask[mask > 0] = color
-        
-        # Overlay mask
-        result_image = cv2.addWeighted(result_image, 1 - alpha, colored_mask, alpha, 0)
+    x1 = min(tile.x for _, tile in tiles)
+    y1 = min(tile.y for _, tile in tiles)
+    x2 = max(tile.x + tile.tile.shape[1] for _, tile in tiles)
+    y2 = max(tile.y + tile.tile.shape[0] for _, tile in tiles)
     
-    return result_image
+    labels = np.zeros((y2 - y1, x2 - x1), dtype=np.uint16)
+    for index, tile in tiles:
+        region = labels[tile.y - y1:tile.y - y1 + tile.tile.shape[0], tile.x - x1:tile.x - x1 + tile.tile.shape[1]]
+        region[tile.tile] = index + 1
+    return labels, (x1, y1)
 
-def create_visualization(image_path, yolo_detections, sam_masks, output_path):
-    """Create comprehensive visualization"""
-    # Load original image
-    image = cv2.imread(image_path)
-    image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+def blend_label_map(image, label_map, alpha=0.5):
+    """Blend palette colors into a copy of image wherever the label map is set"""
+    result_image = image.copy()
+    if label_map is None:
+        return result_image
     
-    # Create subplots
-    fig, axes = plt.subplots(2, 2, figsize=(15, 12))
-    fig.suptitle(f'YOLO + SAM2 Results: {os.path.basename(image_path)}', fontsize=16)
+    labels, (x, y) = label_map
     
-    # Original image
-    axes[0, 0].imshow(image_rgb)
-    axes[0, 0].set_title('Original Image')
-    axes[0, 0].axis('off')
+    # Label -> palette index -> color, as lookup tables over the whole map
+    palette_index = np.take(LABEL_PALETTE_INDEX, labels)
+    colors = cv2.merge([cv2.LUT(palette_index, channel_lut) for channel_lut in PALETTE_CHANNEL_LUTS])
     
+    # One blend over the masks' joint box, copied back only where a mask is;
+    # overlapping masks never stack
+    region = result_image[y:y + labels.shape[0], x:x + labels.shape[1]]
+    blended = np.ascontiguousarray(region)
+    cv2.copyTo(cv2.addWeighted(region, 1 - alpha, colors, alpha, 0), (labels > 0).view(np.uint8), blended)
+    region[...] = blended
+    return result_image
+
+def overlay_segmentation_masks(image, masks, alpha=0.5):
+    """Overlay segmentation masks on image"""
+    return blend_label_map(image, build_label_map(masks), alpha)
+
+def render_panels(image_rgb, yolo_detections, sam_masks):
+    """The four (title, RGB image) panels: original, boxes, masks, combined"""
     # YOLO detections
     yolo_image = draw_bounding_boxes(image_rgb, yolo_detections, color=(0, 255, 0))
-    axes[0, 1].imshow(yolo_image)
-    axes[0, 1].set_title(f'YOLO Detections ({len(yolo_detections)} objects)')
-    axes[0, 1].axis('off')
+    
+    # One label map serves both mask panels
+    label_map = build_label_map(sam_masks) if sam_masks else None
     
     # SAM2 segmentation
     if sam_masks:
-        sam_image = overlay_segmentation_masks(image_rgb, sam_masks)
-        axes[1, 0].imshow(sam_image)
-        axes[1, 0].set_title(f'SAM2 Segmentation ({len(sam_masks)} masks)')
+        sam_panel = (f'SAM2 Segmentation ({len(sam_masks)} masks)', blend_label_map(image_rgb, label_map))
     else:
-        axes[1, 0].imshow(image_rgb)
-        axes[1, 0].set_title('SAM2 Segmentation (No masks)')
-    axes[1, 0].axis('off')
+        sam_panel = ('SAM2 Segmentation (No masks)', image_rgb)
     
     # Combined result
-    combined_image = yolo_image.copy()
-    if sam_masks:
-        combined_image = overlay_segmentation_masks(combined_image, sam_masks)
-    axes[1, 1].imshow(combined_image)
-    axes[1, 1].set_title('Combined Result')
-    axes[1, 1].axis('off')
+    combined_image = blend_label_map(yolo_image, label_map) if sam_masks else yolo_image
+    
+    return [
+        ('Original Image', image_rgb),
+        (f'YOLO Detections ({len(yolo_detections)} objects)', yolo_image),
+        sam_panel,
+        ('Combined Result', combined_image)
+    ]
+
+def title_bar(text, width, height, font_scale):
+    """White strip with centered black text"""
+    bar = np.full((height, width, 3), 255, dtype=np.uint8)
+    (text_width, text_height), _ = cv2.getTextSize(text, cv2.FONT_HERSHEY_SIMPLEX, font_scale, 1)
+    origin = (max(0, (width - text_width) // 2), (height + text_height) // 2)
+    cv2.putText(bar, text, origin, cv2.FONT_HERSHEY_SIMPLEX, font_scale, (0, 0, 0), 1, cv2.LINE_AA)
+    return bar
+
+def compose_canvas(title, panels, max_panel_width=960):
+    """Lay the panels out 2x2 under a title, all in one RGB array"""
+    height, width = panels[0][1].shape[:2]
+    scale = min(1.0, max_panel_width / width)
+    panel_size = (max(1, round(width * scale)), max(1, round(height * scale)))
+    bar_height = max(24, panel_size[0] // 30)
+    font_scale = bar_height / 40
+    
+    tiles = []
+    for panel_title, image in panels:
+        if scale < 1.0:
+            image = cv2.resize(image, panel_size, interpolation=cv2.INTER_AREA)
+        tiles.append(np.vstack([title_bar(panel_title, panel_size[0], bar_height, font_scale), image]))
+    
+    grid = np.vstack([np.hstack(tiles[:2]), np.hstack(tiles[2:])])
+    header = title_bar(title, grid.shape[1], bar_height * 3 // 2, font_scale * 1.4)
+    return np.vstack([header, grid])
+
+def imwrite_params(output_path, quality=90, png_compression=3):
+    """cv2.imwrite options for the codec implied by the file extension"""
+    extension = os.path.splitext(output_path)[1].lower()
+    if extension in ('.jpg', '.jpeg'):
+        return [cv2.IMWRITE_JPEG_QUALITY, quality]
+    if extension == '.webp':
+        return [cv2.IMWRITE_WEBP_QUALITY, quality]
+    if extension == '.png':
+        return [cv2.IMWRITE_PNG_COMPRESSION, png_compression]
+    return []
+
+def save_canvas_opencv(title, panels, output_path, quality=90, png_compression=3):
+    """Write the 2x2 panels as one image with cv2, no figure rasterization"""
+    canvas = cv2.cvtColor(compose_canvas(title, panels), cv2.COLOR_RGB2BGR)
+    if not cv2.imwrite(output_path, canvas, imwrite_params(output_path, quality, png_compression)):
+        raise IOError(f"Could not write visualization: {output_path}")
+
+def save_figure_matplotlib(title, panels, output_path):
+    """Original 15x12 inch matplotlib figure (matplotlib imported only here)"""
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    
+    # Create subplots
+    fig, axes = plt.subplots(2, 2, figsize=(15, 12))
+    fig.suptitle(title, fontsize=16)
+    
+    for ax, (panel_title, image) in zip(axes.flat, panels):
+        ax.imshow(image)
+        ax.set_title(panel_title)
+        ax.axis('off')
     
     plt.tight_layout()
     plt.savefig(output_path, dpi=150, bbox_inches='tight')
-    plt.close()
+    plt.close(fig)
+
+def create_visualization(image_path, yolo_detections, sam_masks, output_path, backend='matplotlib',
+                         quality=90, png_compression=3):
+    """Create comprehensive visualization
+    
+    backend 'matplotlib' renders the original figure; 'opencv' composes the
+    panels into one array and writes it headless with the codec implied by
+    output_path. quality applies to JPEG/WebP output of the opencv backend.
+    """
+    # Load original image
+    image = cv2.imread(image_path)
+    image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+    
+    title = f'YOLO + SAM2 Results: {os.path.basename(image_path)}'
+    panels = render_panels(image_rgb, yolo_detections, sam_masks)
+    
+    if backend == 'matplotlib':
+        save_figure_matplotlib(title, panels, output_path)
+    else:
+        save_canvas_opencv(title, panels, output_path, quality, png_compression)
+
+# Results stores opened by this process, reused across jobs
+_open_stores = {}
+
+def open_store(root):
+    if root not in _open_stores:
+        _open_stores[root] = ResultsStore(root)
+    return _open_stores[root]
+
+def render_job(job):
+    """Load one result set from disk and visualize it (runs in a worker process)"""
+    if 'store_root' in job:
+        detections, masks = open_store(job['store_root']).result(job['image_name'], job['result_key'])
+    else:
+        detections = load_detection_results(job['result_json'])
+        masks = load_segmentation_masks(job['mask_source'])
+    create_visualization(job['image_path'], detections, masks, job['output_path'],
+                         job['backend'], job['quality'], job['png_compression'])
+    return job
+
+def init_render_worker():
+    # Parallelism comes from the process pool; keep OpenCV single-threaded per worker
+    cv2.setNumThreads(1)
+
+def parse_args():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description="MyCV-Platform results visualization")
+    parser.add_argument('--input-dir', default="data/input/test_images",
+                        help="Directory with the original .jpg images")
+    parser.add_argument('--results-dir', default="data/output/integration_results",
+                        help="Directory with detection and mask results")
+    parser.add_argument('--output-dir', default="data/output/visualizations",
+                        help="Directory for visualization images")
+    parser.add_argument('--backend', choices=VISUALIZATION_BACKENDS, default='matplotlib',
+                        help="matplotlib: original figure; opencv: compose panels with cv2, no matplotlib needed "
+                             "(default: matplotlib)")
+    parser.add_argument('--format', choices=sorted(IMAGE_FORMATS), default='png',
+                        help="Output image format (default: png)")
+    parser.add_argument('--quality', type=int, default=90,
+                        help="JPEG/WebP quality 0-100 for the opencv backend (default: 90)")
+    parser.add_argument('--png-compression', type=int, default=3,
+                        help="PNG compression level 0-9 for the opencv backend (default: 3)")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Worker processes rendering visualizations (default: 1)")
+    return parser.parse_args()
 
 def main():
     """Main function"""
+    args = parse_args()
+    
     log_message("🎨 MyCV-Platform Results Visualization", 'info')
     log_message("=" * 50, 'info')
     
     # Get test images
-    test_images_dir = "data/input/test_images"
-    results_dir = "data/output/integration_results"
-    output_dir = "data/output/visualizations"
+    test_images_dir = args.input_dir
+    results_dir = args.results_dir
+    output_dir = args.output_dir
     
     os.makedirs(output_dir, exist_ok=True)
     
     test_images = [f for f in os.listdir(test_images_dir) if f.endswith('.jpg')]
     
+    # Results written with --results-store come from the columnar store
+    store_root = os.path.join(results_dir, "results_store")
+    store = ResultsStore(store_root) if os.path.exists(os.path.join(store_root, INDEX_FILE)) else None
+    stored_results = set(store.results()) if store is not None else set()
+    
+    jobs = []
     for image_name in test_images:
-        log_message(f"🖼️  Processing: {image_name}", 'info')
-        
         image_path = os.path.join(test_images_dir, image_name)
         base_name = image_name.replace('.jpg', '')
         
-        # Process YOLO11m results
-        yolo11m_json = os.path.join(results_dir, f"{image_name}_yolo11m_detections.json")
-        yolo11m_masks_dir = os.path.join(results_dir, f"{image_name}_yolo11m_masks")
-        
-        if os.path.exists(yolo11m_json):
-            yolo11m_detections = load_detection_results(yolo11m_json)
-            yolo11m_masks = load_segmentation_masks(yolo11m_masks_dir)
-            
-            output_path = os.path.join(output_dir, f"{base_name}_yolo11m_visualization.png")
-            create_visualization(image_path, yolo11m_detections, yolo11m_masks, output_path)
-            log_message(f"✅ YOLO11m visualization saved: {output_path}", 'success')
-        
-        # Process best.pt results
-        best_pt_json = os.path.join(results_dir, f"{image_name}_best_pt_detections.json")
-        best_pt_masks_dir = os.path.join(results_dir, f"{image_name}_best_pt_masks")
-        
-        if os.path.exists(best_pt_json):
-            best_pt_detections = load_detection_results(best_pt_json)
-            best_pt_masks = load_segmentation_masks(best_pt_masks_dir)
+        # Process each result set: per-model runs and the fused run
+        for result_key, result_label in RESULT_SETS:
+            result_json = os.path.join(results_dir, f"{image_name}_{result_key}_detections.json")
+            job = {
+                'image_name': image_name,
+                'result_key': result_key,
+                'result_label': result_label,
+                'image_path': image_path,
+                'output_path': os.path.join(
+                    output_dir, f"{base_name}_{result_key}_visualization{IMAGE_FORMATS[args.format]}"
+                ),
+                'backend': args.backend,
+                'quality': args.quality,
+                'png_compression': args.png_compression
+            }
             
-            output_path = os.path.join(output_dir, f"{base_name}_best_pt_visualization.png")
-            create_visualization(image_path, best_pt_detections, best_pt_masks, output_path)
-            log_message(f"✅ best.pt visualization saved: {output_path}", 'success')
+            if (image_name, result_key) in stored_results:
+                job['store_root'] = store_root
+                jobs.append(job)
+            elif os.path.exists(result_json):
+                job['result_json'] = result_json
+                job['mask_source'] = find_mask_source(results_dir, f"{image_name}_{result_key}")
+                jobs.append(job)
+    
+    log_message(f"🖼️  {len(jobs)} visualizations to render ({args.backend}, {args.workers} workers)", 'info')
+    
+    if args.workers > 1 and len(jobs) > 1:
+        with ProcessPoolExecutor(max_workers=min(args.workers, len(jobs)), initializer=init_render_worker) as executor:
+            futures = [executor.submit(render_job, job) for job in jobs]
+            for job, future in zip(jobs, futures):
+                try:
+                    future.result()
+                    log_message(f"✅ {job['image_name']} {job['result_label']} visualization saved: "
+                                f"{job['output_path']}", 'success')
+                except Exception as e:
+                    log_message(f"❌ {job['image_name']} {job['result_label']} visualization failed: {e}", 'error')
+    else:
+        for job in jobs:
+            log_message(f"🖼️  Processing: {job['image_name']} ({job['result_label']})", 'info')
+            render_job(job)
+            log_message(f"✅ {job['result_label']} visualization saved: {job['output_path']}", 'success')
     
     log_message("🎉 Visualization completed!", 'success')
     log_message(f"📊 Check '{output_dir}' for visualization images", 'info')